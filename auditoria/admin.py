@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import RegistroAuditoria
+
+
+@admin.register(RegistroAuditoria)
+class RegistroAuditoriaAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "usuario", "accion", "modelo", "objeto_id", "descripcion")
+    list_filter = ("accion", "modelo")
+    search_fields = ("usuario", "objeto_id")
+    date_hierarchy = "fecha"
+
+    # Es un registro: no se edita a mano
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
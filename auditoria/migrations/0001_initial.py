@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:04
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('usuario', models.CharField(max_length=150, verbose_name='Usuario')),
+                ('accion', models.CharField(choices=[('creado', 'Creado'), ('editado', 'Editado'), ('borrado', 'Borrado')], max_length=10, verbose_name='Accion')),
+                ('modelo', models.CharField(max_length=50, verbose_name='Modelo')),
+                ('objeto_id', models.CharField(max_length=50, verbose_name='Id')),
+                ('descripcion', models.CharField(blank=True, max_length=200, verbose_name='Descripcion')),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+            ],
+            options={
+                'verbose_name': 'Registro de auditoria',
+                'verbose_name_plural': 'Registros de auditoria',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['usuario', '-fecha'], name='auditoria_r_usuario_c145f1_idx'), models.Index(fields=['modelo', '-fecha'], name='auditoria_r_modelo_571d67_idx'), models.Index(fields=['-fecha'], name='auditoria_r_fecha_3f9d37_idx')],
+            },
+        ),
+    ]
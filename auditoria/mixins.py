@@ -0,0 +1,25 @@
+from . import registro as auditoria
+
+
+class AuditoriaAdminMixin:
+    """
+    Para los ``ModelAdmin``: lo que se crea, edita o borra desde el admin de
+    Django queda en la auditoria igual que desde las vistas (con los campos
+    que cambiaron), incluidos los borrados masivos de la accion "Eliminar".
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        auditoria.registrar(request.user, "editado" if change else "creado", obj, auditoria.cambios(form))
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        auditoria.registrar(request.user, "borrado", obj, pk=pk)
+
+    def delete_queryset(self, request, queryset):
+        # delete() le saca el pk a cada objeto: se guardan antes
+        objetos = [(obj, obj.pk) for obj in queryset]
+        super().delete_queryset(request, queryset)
+        for obj, pk in objetos:
+            auditoria.registrar(request.user, "borrado", obj, pk=pk)
@@ -0,0 +1,39 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class RegistroAuditoria(models.Model):
+    """Quien creo, edito o borro un producto, cliente o venta (ver ``auditoria.registro``)."""
+
+    ACCIONES = [
+        ("creado", "Creado"),
+        ("editado", "Editado"),
+        ("borrado", "Borrado"),
+    ]
+
+    # La hora de la accion, no la de la escritura del lote
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+    # Username como en MovimientoStock: queda aunque se borre el usuario
+    usuario = models.CharField("Usuario", max_length=150)
+    accion = models.CharField("Accion", max_length=10, choices=ACCIONES)
+    # app_label.modelo, ej. "productos.producto"
+    modelo = models.CharField("Modelo", max_length=50)
+    objeto_id = models.CharField("Id", max_length=50)
+    descripcion = models.CharField("Descripcion", max_length=200, blank=True)
+    # Los campos que cambiaron con su valor nuevo (o lo que corresponda a la accion)
+    datos = models.JSONField("Datos", default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        verbose_name = 'Registro de auditoria'
+        verbose_name_plural = 'Registros de auditoria'
+        ordering = ["-fecha", "-id"]
+        # Los filtros de la pantalla: por usuario, por modelo o solo por fecha
+        indexes = [
+            models.Index(fields=["usuario", "-fecha"]),
+            models.Index(fields=["modelo", "-fecha"]),
+            models.Index(fields=["-fecha"]),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y %H:%M} {self.usuario} {self.accion} {self.modelo} #{self.objeto_id}"
@@ -0,0 +1,146 @@
+"""
+Registro de auditoria sin sumar escrituras al request.
+
+``registrar`` solo agrega el registro a una lista en memoria del proceso (si
+hay una transaccion abierta, recien cuando hace commit: lo que se deshace no
+queda registrado). Un hilo de fondo la vacia con un ``bulk_create`` cada
+``AUDITORIA["INTERVALO"]`` segundos, o antes si se juntan ``LOTE`` registros.
+
+- Al terminar el proceso (el worker recibe SIGTERM y sale) ``atexit`` frena el
+  hilo, espera a que termine el lote que estaba escribiendo y escribe lo que
+  quedaba.
+- Si la base no responde los registros vuelven a la lista y se reintenta en
+  la proxima pasada; pasando ``MAXIMO`` se descartan los mas viejos (con un
+  aviso en el log) para no quedarse sin memoria.
+- Un proceso que muere de golpe (SIGKILL, OOM) pierde como mucho los
+  ultimos segundos.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+
+from .models import RegistroAuditoria
+
+logger = logging.getLogger(__name__)
+
+
+def config(clave, defecto):
+    return getattr(settings, "AUDITORIA", {}).get(clave, defecto)
+
+
+def _valor(valor):
+    # Lo que no entiende DjangoJSONEncoder: relaciones por id y archivos por nombre
+    if isinstance(valor, Model):
+        return valor.pk
+    if isinstance(valor, QuerySet):
+        return [objeto.pk for objeto in valor]
+    if hasattr(valor, "read"):
+        return getattr(valor, "name", str(valor))
+    return valor
+
+
+def cambios(form, campos=None):
+    """{campo: valor nuevo} de los campos que el usuario cambio en ``form``."""
+    campos = form.changed_data if campos is None else campos
+    return {campo: _valor(form.cleaned_data.get(campo)) for campo in campos}
+
+
+class Buffer:
+    def __init__(self):
+        self.registros = []
+        self.lock = threading.Lock()
+        self.hay_lote = threading.Event()
+        self.parar = threading.Event()
+        self.hilo = None
+
+    def agregar(self, registro):
+        with self.lock:
+            self.registros.append(registro)
+            lleno = len(self.registros) >= config("LOTE", 500)
+        self.iniciar()
+        if lleno:
+            self.hay_lote.set()
+
+    def iniciar(self):
+        # El hilo arranca con el primer registro: los comandos que no auditan nada no lo crean
+        if self.hilo is not None:
+            return
+        with self.lock:
+            if self.hilo is not None:
+                return
+            self.hilo = threading.Thread(target=self._correr, name="auditoria", daemon=True)
+            self.hilo.start()
+            atexit.register(self.cerrar)
+
+    def _correr(self):
+        while not self.parar.is_set():
+            self.hay_lote.wait(config("INTERVALO", 2))
+            self.hay_lote.clear()
+            self.vaciar()
+            # Conexion propia de este hilo: se cierra si quedo vieja o rota
+            close_old_connections()
+
+    def cerrar(self, espera=10):
+        """Frena el hilo y escribe lo pendiente (al salir del proceso).
+
+        El hilo puede tener un lote ya sacado de la lista y todavia sin
+        escribir: si no se lo espera, el interprete lo corta y ese lote se
+        pierde.
+        """
+        self.parar.set()
+        self.hay_lote.set()
+        if self.hilo is not None:
+            self.hilo.join(espera)
+        self.vaciar()
+
+    def vaciar(self):
+        """Escribe todo lo pendiente, en lotes de ``LOTE``. Devuelve cuantos se escribieron."""
+        with self.lock:
+            pendientes, self.registros = self.registros, []
+        escritos = 0
+        lote = config("LOTE", 500)
+        for inicio in range(0, len(pendientes), lote):
+            try:
+                RegistroAuditoria.objects.bulk_create(pendientes[inicio:inicio + lote])
+            except Exception:
+                logger.exception("No se pudo escribir la auditoria, se reintenta")
+                self._devolver(pendientes[inicio:])
+                connection.close()
+                break
+            escritos += len(pendientes[inicio:inicio + lote])
+        return escritos
+
+    def _devolver(self, registros):
+        with self.lock:
+            self.registros[:0] = registros
+            sobran = len(self.registros) - config("MAXIMO", 10000)
+            if sobran > 0:
+                del self.registros[:sobran]
+        if sobran > 0:
+            logger.warning("Se descartaron %s registros de auditoria", sobran)
+
+
+buffer = Buffer()
+
+
+def registrar(usuario, accion, objeto, datos=None, pk=None):
+    """Anota que ``usuario`` (User o username) hizo ``accion`` sobre ``objeto``.
+
+    No escribe en la base: el registro se guarda en el proximo lote. Para un
+    objeto ya borrado (``delete()`` le saca el pk) se pasa ``pk``.
+    """
+    registro = RegistroAuditoria(
+        fecha=timezone.now(),
+        usuario=getattr(usuario, "username", usuario) or "Sistema",
+        accion=accion,
+        modelo=objeto._meta.label_lower,
+        objeto_id=str(objeto.pk if pk is None else pk),
+        descripcion=str(objeto)[:200],
+        datos=datos or {},
+    )
+    transaction.on_commit(lambda: buffer.agregar(registro))
@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.shortcuts import redirect
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.generic import TemplateView
+
+from inventario.context_processors import es_admin
+from inventario.mixins import LecturaReplicaMixin
+from .models import RegistroAuditoria
+
+MODELOS = [
+    ("productos.producto", "Productos"),
+    ("clientes.cliente", "Clientes"),
+    ("ventas.venta", "Ventas"),
+]
+
+
+class AdministradoresPermissionMixin(UserPassesTestMixin):
+    # Solo superusuarios y el grupo 'administradores'
+
+    def test_func(self):
+        return es_admin(self.request.user)
+
+    def handle_no_permission(self):
+        if self.request.user.is_authenticated:
+            messages.error(self.request, "La auditoria es solo para administradores.")
+            return redirect('home')
+        return super().handle_no_permission()
+
+
+class RegistroAuditoriaListView(LoginRequiredMixin, AdministradoresPermissionMixin, LecturaReplicaMixin, TemplateView):
+    template_name = "auditoria/registro_list.html"
+    login_url = 'account_login'
+    paginate_by = 50
+
+    def get_filtros(self):
+        get = self.request.GET
+        return {
+            "usuario": get.get("usuario", "").strip(),
+            "modelo": get.get("modelo", ""),
+            "accion": get.get("accion", ""),
+            "desde": parse_date(get.get("desde") or ""),
+            "hasta": parse_date(get.get("hasta") or ""),
+        }
+
+    def get_queryset(self, filtros):
+        # Cada filtro cae en uno de los indices (usuario, -fecha), (modelo, -fecha) o (-fecha)
+        registros = RegistroAuditoria.objects.all()
+        if filtros["usuario"]:
+            registros = registros.filter(usuario=filtros["usuario"])
+        if filtros["modelo"]:
+            registros = registros.filter(modelo=filtros["modelo"])
+        if filtros["accion"]:
+            registros = registros.filter(accion=filtros["accion"])
+        if filtros["desde"]:
+            registros = registros.filter(fecha__gte=timezone.make_aware(datetime.combine(filtros["desde"], time.min)))
+        if filtros["hasta"]:
+            fin = datetime.combine(filtros["hasta"] + timedelta(days=1), time.min)
+            registros = registros.filter(fecha__lt=timezone.make_aware(fin))
+        return registros.order_by("-fecha", "-id")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filtros = self.get_filtros()
+        try:
+            pagina = max(int(self.request.GET.get("page", 1)), 1)
+        except ValueError:
+            pagina = 1
+
+        # Una fila de mas para saber si hay pagina siguiente sin COUNT(*) sobre toda la tabla
+        inicio = (pagina - 1) * self.paginate_by
+        registros = list(self.get_queryset(filtros)[inicio:inicio + self.paginate_by + 1])
+        context["registros"] = registros[:self.paginate_by]
+        context["pagina"] = pagina
+        context["hay_siguiente"] = len(registros) > self.paginate_by
+        context["filtros"] = filtros
+        context["modelos"] = MODELOS
+        context["acciones"] = RegistroAuditoria.ACCIONES
+        # Los filtros para los links de paginacion
+        parametros = self.request.GET.copy()
+        parametros.pop("page", None)
+        context["parametros"] = parametros.urlencode()
+        return context
@@ -4,7 +4,6 @@ from django.db import models
 import os
 import uuid
 from django.core.exceptions import ValidationError
-from PIL import Image
 from django.utils import timezone
 
 from django.db import models
@@ -6,6 +6,8 @@ from .views import (
     ClienteCreateView,
     ClienteUpdateView,
     ClienteDeleteView,
+    ClienteVentasView,
+    ClienteAutocompletarView,
 )
 
 app_name = "clientes"
@@ -13,7 +15,9 @@ app_name = "clientes"
 urlpatterns = [
     path("", ClienteListView.as_view(), name="cliente_list"),
     path("nuevo/", ClienteCreateView.as_view(), name="cliente_create"),
+    path("autocompletar/", ClienteAutocompletarView.as_view(), name="cliente_autocompletar"),
     path("<int:pk>/", ClienteDetailView.as_view(), name="cliente_detail"),
     path("<int:pk>/editar/", ClienteUpdateView.as_view(), name="cliente_update"),
     path("<int:pk>/eliminar/", ClienteDeleteView.as_view(), name="cliente_delete"),
+    path("<int:pk>/ventas/", ClienteVentasView.as_view(), name="cliente_ventas"),
 ]
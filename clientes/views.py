@@ -1,13 +1,17 @@
 from django.shortcuts import render, redirect, get_object_or_404
 # clientes/views.py
+from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models.deletion import ProtectedError
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, Q
 from .models import Cliente
 from .forms import ClienteForm
+from reportes.cubos import resumen_cliente
+from auditoria import registro as auditoria
+from inventario.mixins import AutocompletarMixin, LecturaReplicaMixin
 
 class VentasPermissionMixin(UserPassesTestMixin):
    # esto es para acceder solo a usuarioso de grupo ventas , usuarios del grupo administradores o susperusuarios
@@ -30,7 +34,7 @@ class VentasPermissionMixin(UserPassesTestMixin):
         return super().handle_no_permission()
 
 
-class ClienteListView(LoginRequiredMixin, VentasPermissionMixin,ListView):
+class ClienteListView(LoginRequiredMixin, VentasPermissionMixin, LecturaReplicaMixin, ListView):
     model = Cliente
     template_name = "clientes/cliente_list.html"
     context_object_name = "clientes"
@@ -49,12 +53,57 @@ class ClienteListView(LoginRequiredMixin, VentasPermissionMixin,ListView):
  
         return queryset.order_by('nombre')
 
+class ClienteAutocompletarView(AutocompletarMixin, LecturaReplicaMixin, View):
+    grupos = ("ventas", "administradores")
+    campos = ("id", "nombre", "apellido", "numero_documento")
+
+    def get_queryset(self, q):
+        return Cliente.objects.filter(
+            Q(nombre__icontains=q) | Q(apellido__icontains=q) | Q(numero_documento__startswith=q)
+        ).order_by("apellido", "nombre")
+
+
 class ClienteDetailView(LoginRequiredMixin, VentasPermissionMixin,DetailView):
     model = Cliente
     template_name = "clientes/cliente_detail.html"
     context_object_name = "cliente"
     login_url = 'account_login'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # El resumen sale de reportes, no de recorrer cliente.ventas.all()
+        context["resumen"], context["top_productos"] = resumen_cliente(self.object)
+        return context
+
+
+class ClienteVentasView(LoginRequiredMixin, VentasPermissionMixin, DetailView):
+    """Una pagina del historial de compras, se carga aparte desde el detalle."""
+
+    model = Cliente
+    template_name = "clientes/_cliente_ventas.html"
+    context_object_name = "cliente"
+    login_url = 'account_login'
+    paginate_by = 10
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            pagina = max(int(self.request.GET.get("page", 1)), 1)
+        except ValueError:
+            pagina = 1
+
+        # Pedimos una fila de mas para saber si hay pagina siguiente sin hacer COUNT(*)
+        inicio = (pagina - 1) * self.paginate_by
+        ventas = list(
+            self.object.ventas
+            .order_by("-fecha")
+            .only("id", "codigo", "fecha", "total", "cliente_id")[inicio:inicio + self.paginate_by + 1]
+        )
+        context["ventas"] = ventas[:self.paginate_by]
+        context["pagina"] = pagina
+        context["hay_siguiente"] = len(ventas) > self.paginate_by
+        return context
+
 
 class ClienteCreateView(LoginRequiredMixin, VentasPermissionMixin,CreateView):
     model = Cliente
@@ -65,7 +114,9 @@ class ClienteCreateView(LoginRequiredMixin, VentasPermissionMixin,CreateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Cliente creado exitosamente")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        auditoria.registrar(self.request.user, "creado", self.object, auditoria.cambios(form))
+        return response
 
 
 class ClienteUpdateView(LoginRequiredMixin, VentasPermissionMixin,UpdateView):
@@ -77,7 +128,9 @@ class ClienteUpdateView(LoginRequiredMixin, VentasPermissionMixin,UpdateView):
 
     def form_valid(self, form):
         messages.success(self.request, "Cliente actualizado exitosamente")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        auditoria.registrar(self.request.user, "editado", self.object, auditoria.cambios(form))
+        return response
 
 
 class ClienteDeleteView(LoginRequiredMixin, VentasPermissionMixin, DeleteView):
@@ -92,7 +145,9 @@ class ClienteDeleteView(LoginRequiredMixin, VentasPermissionMixin, DeleteView):
 
         try:
             # Intentamos borrar normalmente
+            pk = self.object.pk
             response = super().post(request, *args, **kwargs)
+            auditoria.registrar(request.user, "borrado", self.object, pk=pk)
             messages.success(request, "Cliente eliminado exitosamente")
             return response
 
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+
+def es_admin(user):
+    # Superusuarios y el grupo 'administradores' (tablero, auditoria)
+    return user.is_superuser or user.groups.filter(name="administradores").exists()
+
+
+def roles(request):
+    """``es_admin`` para la barra de navegacion de todas las paginas.
+
+    Es perezoso: la consulta de grupos se hace solo si el template lo usa.
+    """
+    return {"es_admin": SimpleLazyObject(lambda: request.user.is_authenticated and es_admin(request.user))}
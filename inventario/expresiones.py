@@ -0,0 +1,32 @@
+from django.db.models import Expression, F
+
+
+class SegunId(Expression):
+    """
+    ``CASE <campo> WHEN id THEN valor ... END`` armado desde un dict {id: valor}.
+
+    Es lo mismo que ``Case(*(When(campo=id, then=Value(valor)) ...))`` pero
+    Django no tiene que resolver un When (con su Q y su lookup) por id: con
+    miles de filas en un UPDATE armar la consulta tardaba mas que correrla.
+    Los ids que no estan en el dict quedan en NULL, se usa con un
+    ``filter(campo__in=valores)`` delante.
+    """
+
+    def __init__(self, campo, valores, output_field):
+        super().__init__(output_field=output_field)
+        self.campo = F(campo)
+        self.valores = valores
+
+    def get_source_expressions(self):
+        return [self.campo]
+
+    def set_source_expressions(self, exprs):
+        (self.campo,) = exprs
+
+    def as_sql(self, compiler, connection):
+        columna, params = compiler.compile(self.campo)
+        params = list(params)
+        for pk, valor in self.valores.items():
+            params += [pk, self.output_field.get_db_prep_value(valor, connection)]
+        cuando = " ".join(["WHEN %s THEN %s"] * len(self.valores))
+        return f"CASE {columna} {cuando} END", params
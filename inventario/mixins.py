@@ -0,0 +1,138 @@
+import hashlib
+import time
+
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.shortcuts import redirect, resolve_url
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .replica import CLAVE_SESION, en_replica, usar_primario
+
+
+def calcular_etag(user, request, partes):
+    # La pagina muestra el usuario en la barra, el ETag depende de quien la pide
+    clave = "|".join(str(p) for p in (user.pk, request.get_full_path(), *partes))
+    return hashlib.md5(clave.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+class CondicionalMixin:
+    """
+    GET condicional (ETag / Last-Modified) para vistas basadas en clases.
+
+    Las vistas definen ``get_etag_partes`` y/o ``get_last_modified`` con
+    consultas baratas (un values_list o un aggregate). Si el navegador ya
+    tiene la version actual se responde 304 sin armar el contexto ni
+    renderizar la plantilla. Va despues de los mixins de login y permisos,
+    asi el chequeo de acceso se hace igual que siempre.
+    """
+
+    def get_etag_partes(self, request, *args, **kwargs):
+        return None
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def _get_etag(self, request, *args, **kwargs):
+        # Con mensajes pendientes hay que renderizar para mostrarlos
+        if len(messages.get_messages(request)):
+            return None
+        partes = self.get_etag_partes(request, *args, **kwargs)
+        if partes is None:
+            return None
+        return calcular_etag(request.user, request, partes)
+
+    def _get_last_modified(self, request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return None
+        return self.get_last_modified(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        vista = condition(
+            etag_func=self._get_etag,
+            last_modified_func=self._get_last_modified,
+        )(super().get)
+        response = vista(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class LecturaReplicaMixin:
+    """
+    Vistas de solo lectura que pueden leer de la replica (ver inventario.replica).
+
+    Si el usuario acaba de guardar algo se queda en la base principal, asi
+    ve su venta o su cambio aunque la replica venga atrasada. Va despues de
+    los mixins de login y permisos.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._dispatch_async(request, *args, **kwargs)
+        if request.method not in ("GET", "HEAD") or usar_primario(request):
+            return super().dispatch(request, *args, **kwargs)
+        with en_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Los querysets del contexto se evaluan al renderizar la plantilla,
+            # que Django hace despues de dispatch: lo forzamos aca adentro
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+            return response
+
+    async def _dispatch_async(self, request, *args, **kwargs):
+        # En vistas async la sesion se lee con la API async (aget)
+        primario_hasta = await request.session.aget(CLAVE_SESION, 0)
+        if request.method not in ("GET", "HEAD") or primario_hasta > time.time():
+            return await super().dispatch(request, *args, **kwargs)
+        with en_replica():
+            return await super().dispatch(request, *args, **kwargs)
+
+
+class PermisoAsyncMixin:
+    """
+    Login y permisos por grupo para vistas async.
+
+    Hace lo mismo que LoginRequiredMixin + los mixins de permisos de cada
+    app, pero sin tocar la BD en forma sync (``request.auser()`` y
+    ``aexists``), que en una vista async no se puede.
+    """
+    login_url = 'account_login'
+    grupos = ()
+    mensaje_sin_permiso = "No tenés permiso para acceder aqui"
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url(self.login_url))
+        if not (user.is_superuser or await user.groups.filter(name__in=self.grupos).aexists()):
+            return self.sin_permiso(request)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def sin_permiso(self, request):
+        messages.error(request, self.mensaje_sin_permiso)
+        return redirect("home")
+
+
+class AutocompletarMixin(PermisoAsyncMixin):
+    """
+    Busqueda async para autocompletar: ``?q=texto`` devuelve un JSON chico
+    con los primeros ``limite`` resultados. Las vistas definen ``campos`` y
+    ``get_queryset(q)``.
+    """
+    campos = ()
+    limite = 10
+    minimo = 2
+
+    def get_queryset(self, q):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        q = request.GET.get("q", "").strip()
+        if len(q) < self.minimo:
+            return JsonResponse({"resultados": []})
+        queryset = self.get_queryset(q).values(*self.campos)[:self.limite]
+        return JsonResponse({"resultados": [fila async for fila in queryset]})
+
+    def sin_permiso(self, request):
+        return JsonResponse({"error": "Sin permiso"}, status=403)
@@ -0,0 +1,120 @@
+"""
+Lecturas en la replica de la base.
+
+Las vistas de solo lectura pesadas (listados con busqueda, el grafico de
+ventas, reportes, exportaciones y PDFs) leen de la base configurada en
+``settings.BASE_REPLICA["ALIAS"]`` y dejan la principal para las ventas.
+Todo lo demas (y cualquier escritura) sigue yendo a ``default``.
+
+Para no mostrar datos viejos justo despues de guardar algo (la replica
+puede venir atrasada), cada POST exitoso marca la sesion y durante
+``PRIMARIO_TRAS_ESCRITURA`` segundos ese usuario lee de la principal.
+"""
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CLAVE_SESION = "db_primario_hasta"
+
+# Local de asgiref: sirve igual en vistas sync y async (como las conexiones de Django)
+_estado = Local()
+
+
+def alias_replica():
+    alias = getattr(settings, "BASE_REPLICA", {}).get("ALIAS")
+    return alias if alias in connections.databases else None
+
+
+@contextmanager
+def en_replica():
+    """Las lecturas de este bloque van a la replica (si hay una configurada)."""
+    anterior = getattr(_estado, "replica", False)
+    _estado.replica = True
+    try:
+        yield
+    finally:
+        _estado.replica = anterior
+
+
+def leyendo_replica():
+    return getattr(_estado, "replica", False)
+
+
+def iterar_en_replica(iterable):
+    # Para respuestas en streaming: el cuerpo se genera despues de que la
+    # vista ya devolvio, hay que volver a entrar en la replica al iterarlo
+    with en_replica():
+        yield from iterable
+
+
+async def aiterar_en_replica(iterable):
+    # Lo mismo para los iteradores async de las vistas async
+    with en_replica():
+        async for parte in iterable:
+            yield parte
+
+
+def usar_primario(request):
+    return request.session.get(CLAVE_SESION, 0) > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not getattr(_estado, "replica", False):
+            return None
+        # Dentro de una transaccion en la principal se lee lo que ella ve
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Es la misma base, una copia de la otra
+        return True
+
+
+class PrimarioTrasEscrituraMiddleware:
+    """Despues de un POST/PUT/DELETE que salio bien, la sesion lee de la principal un rato.
+
+    Sirve sync y async: bajo ASGI las vistas async no pasan por un hilo por
+    culpa de este middleware (la sesion se escribe con ``aset``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _marcar(self, request, response):
+        return (
+            request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+            and hasattr(request, "session")
+            and alias_replica()
+        )
+
+    def _hasta(self):
+        return time.time() + settings.BASE_REPLICA.get("PRIMARIO_TRAS_ESCRITURA", 10)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._marcar(request, response):
+            request.session[CLAVE_SESION] = self._hasta()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._marcar(request, response):
+            await request.session.aset(CLAVE_SESION, self._hasta())
+        return response
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
     'productos',
     'clientes',
     'ventas',
+    'reportes',
+    'auditoria',
 
 
 
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'inventario.replica.PrimarioTrasEscrituraMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware'
 ]
@@ -69,12 +72,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventario.context_processors.roles',
+            ],
+            # Templates compilados una vez por proceso (el autoreload de
+            # runserver limpia este cache cuando se edita un template)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
@@ -98,6 +109,36 @@ DATABASES = {
     }
 }
 
+# Replica de solo lectura para listados, reportes y PDFs (ver inventario/replica.py).
+# Si no se configura todo lee y escribe en 'default'.
+if os.environ.get("POSTGRES_REPLICA_HOST"):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get("POSTGRES_REPLICA_HOST"),
+        'PORT': os.environ.get("POSTGRES_REPLICA_PORT", DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['inventario.replica.ReplicaRouter']
+
+BASE_REPLICA = {
+    "ALIAS": "replica",
+    # Segundos que un usuario lee de la principal despues de guardar algo
+    "PRIMARIO_TRAS_ESCRITURA": int(os.environ.get("REPLICA_PRIMARIO_SEGUNDOS", 10)),
+}
+
+
+# Cache (fragmentos de templates, etc.)
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventario',
+        'TIMEOUT': 3600,
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -170,3 +211,92 @@ ACCOUNT_AUTHENTICATION_METHOD = "username"
 ACCOUNT_EMAIL_REQUIRED = False
 ACCOUNT_EMAIL_VERIFICATION = "none"
 ACCOUNT_USERNAME_REQUIRED = True
+
+# Alertas de stock bajo: el comando despachar_alertas manda un resumen por
+# intervalo a cada sink de la lista
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+ALERTAS_STOCK = {
+    "SINKS": [
+        "productos.alertas.InboxSink",
+        "productos.alertas.EmailSink",
+    ],
+    "INTERVALO": 300,
+    "EMAILS": [e for e in os.environ.get("ALERTAS_EMAILS", "").split(",") if e],
+    "WEBHOOK_URL": os.environ.get("ALERTAS_WEBHOOK_URL"),
+}
+
+# Comprobante en PDF de las ventas (ventas.comprobantes): HtmlComprobante
+# usa la plantilla ventas/venta_pdf.html con xhtml2pdf, ReportlabComprobante
+# lo dibuja directo y es bastante mas rapido (medir_comprobantes)
+COMPROBANTE_PDF = {
+    "BACKEND": os.environ.get("COMPROBANTE_PDF_BACKEND", "ventas.comprobantes.HtmlComprobante"),
+}
+
+# Indice SKU -> producto en memoria de cada proceso (productos.indice_sku),
+# para el endpoint productos/escanear/ de los lectores de codigo de barras
+INDICE_SKU = {
+    # Cada cuantos segundos, como mucho, se traen los productos modificados
+    "REFRESCO": 2,
+    # Cada refresco vuelve a leer estos segundos para atras (transacciones largas)
+    "SOLAPAMIENTO": 10,
+    # Recarga completa, para enterarse de los borrados hechos en otros procesos
+    "RECARGA": 300,
+}
+
+# Registro de auditoria en lotes (auditoria.registro)
+AUDITORIA = {
+    # Segundos entre escrituras del hilo de fondo
+    "INTERVALO": 2,
+    # Registros por bulk_create; al juntarse un lote se escribe sin esperar
+    "LOTE": 500,
+    # Pendientes que se guardan en memoria si la base no responde
+    "MAXIMO": 10000,
+}
+
+# Indicadores de la pagina de inicio (reportes.tablero)
+TABLERO = {
+    # Segundos entre recalculos de actualizar_tablero --loop
+    "INTERVALO": 60,
+    # Segundos que cada proceso guarda el tablero en cache
+    "CACHE": 15,
+    "TOP": 5,
+}
+
+# Productos fraccionados (productos.fracciones)
+STOCK_FRACCIONADO = {
+    # Segundos entre consolidaciones de rebalancear_stock --loop: es lo que
+    # pueden ir atrasados sus totales (se muestra junto al stock)
+    "INTERVALO": 5,
+}
+
+# Outbox de eventos (productos.eventos) y el comando publicar_eventos
+EVENTOS = {
+    "SINKS": [
+        sink for sink in os.environ.get("EVENTOS_SINKS", "productos.eventos.ArchivoSink").split(",") if sink
+    ],
+    "ARCHIVO": os.environ.get("EVENTOS_ARCHIVO", str(BASE_DIR / "eventos.jsonl")),
+    "WEBHOOK_URL": os.environ.get("EVENTOS_WEBHOOK_URL"),
+    # Eventos por lote y segundos entre pasadas con --loop
+    "LOTE": 500,
+    "INTERVALO": 5,
+    # Segundos que se frena el offset en un id faltante (transaccion sin commit)
+    "ESPERA_HUECO": 30,
+    # Segundos que se sigue buscando un id salteado; despues se da por deshecho
+    "OLVIDAR_HUECO": 3600,
+    # Dias que se guardan los eventos ya entregados a todos los sinks
+    "RETENER_DIAS": 7,
+}
+
+# Perfilado a pedido de ventas, movimientos y ajustes de stock (productos.perfilado):
+# se perfila a los usuarios del grupo GRUPO y a los staff que mandan el header
+PERFILADO = {
+    "GRUPO": "perfilado",
+    "HEADER": "X-Perfilar",
+    # Perfiles que se guardan; los mas viejos se borran
+    "GUARDAR": int(os.environ.get("PERFILADO_GUARDAR", 50)),
+    # Consultas con detalle por perfil (las demas solo se cuentan)
+    "SQL_MAXIMO": 500,
+    # Segundos que cada proceso recuerda quienes estan en el grupo
+    "CACHE": 30,
+}
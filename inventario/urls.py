@@ -58,6 +58,12 @@ urlpatterns = [
 
     # Ventas con namespace
     path('ventas/', include(('ventas.urls', 'ventas'), namespace='ventas')),
+
+    # Reportes con namespace
+    path('reportes/', include(('reportes.urls', 'reportes'), namespace='reportes')),
+
+    # Auditoria (solo administradores)
+    path('auditoria/', include(('auditoria.urls', 'auditoria'), namespace='auditoria')),
 ]
 
 if settings.DEBUG:
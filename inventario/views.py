@@ -2,6 +2,9 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from reportes import tablero
+from .context_processors import es_admin
+
 class HomeView(LoginRequiredMixin, TemplateView):
     template_name = "home.html"
     login_url = "account_login"
@@ -10,11 +13,13 @@ class HomeView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
-        context["es_admin"] = (
-            user.is_superuser
-            or user.groups.filter(name="administradores").exists()
-        )
+        context["es_admin"] = es_admin(user)
         context["es_stock"] = user.groups.filter(name="stock").exists()
         context["es_ventas"] = user.groups.filter(name="ventas").exists()
 
+        if context["es_admin"]:
+            # Una lectura de la fila precalculada (o del cache), nunca agregados
+            context["tablero"] = tablero.leer()
+            context["tablero_atrasado"] = tablero.atrasado(context["tablero"])
+
         return context
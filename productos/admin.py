@@ -1,3 +1,94 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 
-# Register your models here.
+from auditoria.mixins import AuditoriaAdminMixin
+from .models import AlertaStock, Deposito, Notificacion, PerfilOperacion, StockDeposito
+
+
+@admin.register(Deposito)
+class DepositoAdmin(AuditoriaAdminMixin, admin.ModelAdmin):
+    list_display = ("nombre", "direccion", "principal", "activo")
+    list_filter = ("activo",)
+
+
+@admin.register(StockDeposito)
+class StockDepositoAdmin(admin.ModelAdmin):
+    # Solo lectura: el stock se mueve con movimientos, ajustes y transferencias
+    list_display = ("producto", "deposito", "cantidad")
+    list_filter = ("deposito",)
+    search_fields = ("producto__nombre", "producto__sku")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(AuditoriaAdminMixin, admin.ModelAdmin):
+    list_display = ("producto", "stock", "stock_minimo", "fecha", "enviada")
+    list_filter = ("enviada",)
+
+
+@admin.register(Notificacion)
+class NotificacionAdmin(AuditoriaAdminMixin, admin.ModelAdmin):
+    list_display = ("asunto", "fecha", "leida")
+    list_filter = ("leida",)
+
+
+@admin.register(PerfilOperacion)
+class PerfilOperacionAdmin(admin.ModelAdmin):
+    # Los perfiles los guarda productos.perfilado, aca solo se miran
+    list_display = ("fecha", "operacion", "usuario", "status", "duracion_ms", "consultas", "tiempo_sql_ms")
+    list_filter = ("operacion", "usuario")
+    fields = (
+        "operacion", "ruta", "usuario", "fecha", "status",
+        "duracion_ms", "consultas", "tiempo_sql_ms", "descarga", "funciones", "linea_sql",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/prof/",
+                self.admin_site.admin_view(self.descargar),
+                name="productos_perfiloperacion_prof",
+            ),
+        ] + super().get_urls()
+
+    def descargar(self, request, pk):
+        perfil = get_object_or_404(PerfilOperacion, pk=pk)
+        response = HttpResponse(bytes(perfil.datos), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="perfil_{perfil.operacion}_{perfil.pk}.prof"'
+        return response
+
+    @admin.display(description="cProfile")
+    def descarga(self, obj):
+        url = reverse("admin:productos_perfiloperacion_prof", args=[obj.pk])
+        return format_html('<a href="{}">Descargar .prof</a> (snakeviz, pstats)', url)
+
+    @admin.display(description="Funciones (acumulado)")
+    def funciones(self, obj):
+        return format_html('<pre style="font-size: 11px">{}</pre>', obj.estadisticas)
+
+    @admin.display(description="Consultas SQL")
+    def linea_sql(self, obj):
+        filas = format_html_join(
+            "",
+            "<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>",
+            ((c["inicio_ms"], c["duracion_ms"], c["base"], c["sql"]) for c in obj.sql),
+        )
+        return format_html(
+            "<table><tr><th>Inicio (ms)</th><th>Duracion (ms)</th><th>Base</th><th>SQL</th></tr>{}</table>",
+            filas,
+        )
@@ -0,0 +1,155 @@
+"""
+Alertas de stock bajo.
+
+Cada vez que una vista cambia el stock de un producto llama a
+``registrar_cambio_stock`` con el stock que tenia antes. Si el producto
+cruza el umbral de ``stock_minimo`` (estaba bien y ahora quedo bajo) se
+guarda una ``AlertaStock`` pendiente; solo se mira la fila que cambió.
+
+El comando ``despachar_alertas`` junta todas las pendientes en un unico
+resumen por intervalo y lo manda por los sinks configurados en
+``settings.ALERTAS_STOCK["SINKS"]``, asi una rafaga de ventas genera una
+sola notificacion y no cientos.
+"""
+import json
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import AlertaStock, Notificacion
+
+logger = logging.getLogger(__name__)
+
+
+def cruzo_umbral(producto, stock_anterior):
+    # Solo cuenta el paso de "stock ok" a "stock bajo", no cada venta
+    # que se hace con el producto ya por debajo del minimo
+    return stock_anterior >= producto.stock_minimo > producto.stock
+
+
+def registrar_cambio_stock(producto, stock_anterior):
+    if not cruzo_umbral(producto, stock_anterior):
+        return None
+    return AlertaStock.objects.create(
+        producto=producto,
+        stock=producto.stock,
+        stock_minimo=producto.stock_minimo,
+    )
+
+
+def registrar_cambios_stock(cambios):
+    """Version por lotes para operaciones masivas.
+
+    ``cambios`` es una lista de tuplas (producto_id, stock_anterior,
+    stock_nuevo, stock_minimo); se insertan todas las alertas juntas.
+    """
+    alertas = [
+        AlertaStock(producto_id=producto_id, stock=nuevo, stock_minimo=minimo)
+        for producto_id, anterior, nuevo, minimo in cambios
+        if anterior >= minimo > nuevo
+    ]
+    return AlertaStock.objects.bulk_create(alertas, batch_size=1000)
+
+
+class BaseSink:
+    def enviar(self, asunto, mensaje, alertas):
+        raise NotImplementedError
+
+
+class EmailSink(BaseSink):
+    # Usa el EMAIL_BACKEND del proyecto (en desarrollo es el de consola)
+    def enviar(self, asunto, mensaje, alertas):
+        destinatarios = settings.ALERTAS_STOCK.get("EMAILS", [])
+        if destinatarios:
+            send_mail(asunto, mensaje, None, destinatarios)
+
+
+class WebhookSink(BaseSink):
+    def enviar(self, asunto, mensaje, alertas):
+        url = settings.ALERTAS_STOCK.get("WEBHOOK_URL")
+        if not url:
+            return
+        payload = {
+            "asunto": asunto,
+            "alertas": [
+                {
+                    "producto_id": a.producto_id,
+                    "producto": a.producto.nombre,
+                    "stock": a.stock,
+                    "stock_minimo": a.stock_minimo,
+                    "fecha": a.fecha.isoformat(),
+                }
+                for a in alertas
+            ],
+        }
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+class InboxSink(BaseSink):
+    def enviar(self, asunto, mensaje, alertas):
+        Notificacion.objects.create(asunto=asunto, mensaje=mensaje)
+
+
+def get_sinks():
+    return [import_string(path)() for path in settings.ALERTAS_STOCK.get("SINKS", [])]
+
+
+def armar_resumen(alertas):
+    asunto = f"Stock bajo en {len(alertas)} producto(s)"
+    lineas = [
+        f"- {a.producto.nombre}: stock {a.stock} (minimo {a.stock_minimo})"
+        for a in alertas
+    ]
+    return asunto, "\n".join(lineas)
+
+
+def despachar_alertas(sinks=None):
+    """Marca como enviadas las alertas pendientes y manda un resumen con ellas.
+
+    Las alertas se marcan en una transaccion corta y los sinks se llaman
+    despues del commit: mientras se manda el email o el webhook no queda
+    ninguna fila bloqueada (ni las alertas ni los productos, que las ventas
+    necesitan). Si un sink falla se registra en el log y los demas igual
+    reciben el resumen; ese resumen no se reintenta, asi ningun sink lo
+    recibe dos veces.
+
+    Devuelve la cantidad de alertas incluidas en el resumen.
+    """
+    sinks = get_sinks() if sinks is None else sinks
+
+    with transaction.atomic():
+        # of=("self",): el JOIN con producto es para el resumen, no hay que bloquearlo
+        pendientes = list(
+            AlertaStock.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .filter(enviada=False)
+            .select_related("producto")
+        )
+        if not pendientes:
+            return 0
+        AlertaStock.objects.filter(pk__in=[a.pk for a in pendientes]).update(enviada=True)
+
+    # Si un producto cruzo varias veces en el intervalo alcanza con la ultima
+    por_producto = {}
+    for alerta in pendientes:
+        por_producto[alerta.producto_id] = alerta
+    alertas = list(por_producto.values())
+
+    asunto, mensaje = armar_resumen(alertas)
+    for sink in sinks:
+        try:
+            sink.enviar(asunto, mensaje, alertas)
+        except Exception:
+            logger.exception("No se pudo mandar el resumen de alertas por %s", type(sink).__name__)
+
+    return len(alertas)
@@ -0,0 +1,203 @@
+"""
+Conteo fisico de inventario.
+
+Las cantidades contadas se cargan de un CSV (``sku,cantidad``) o de un lote
+de lecturas del scanner (un SKU por linea, cada lectura suma 1). Cada conteo
+es de un deposito: las diferencias contra el stock de ese deposito se
+calculan con una sola consulta y al aplicar el conteo se insertan todos los
+``MovimientoStock`` juntos y se actualiza el stock con un UPDATE por lote,
+en una sola transaccion que solo bloquea los productos con diferencias.
+"""
+import csv
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import eventos
+from .alertas import registrar_cambios_stock
+from .fracciones import consolidar, igualar_a_deposito
+from .models import ConteoInventario, Deposito, ItemConteo, MovimientoStock, Producto, StockDeposito
+
+LOTE = 1000
+
+
+def leer_cantidades(lineas):
+    """Devuelve un Counter sku -> cantidad a partir de lineas de CSV o del scanner."""
+    cantidades = Counter()
+    for numero, fila in enumerate(csv.reader(lineas)):
+        fila = [valor.strip() for valor in fila]
+        if not fila or not fila[0]:
+            continue
+        sku = fila[0]
+        if len(fila) == 1:
+            cantidades[sku] += 1
+            continue
+        try:
+            cantidad = int(fila[1])
+        except ValueError:
+            if numero == 0:
+                continue  # encabezado
+            raise ValueError(f"Cantidad invalida en la linea {numero + 1}: {fila[1]!r}")
+        if cantidad < 0:
+            raise ValueError(f"Cantidad negativa en la linea {numero + 1}: {fila[1]!r}")
+        cantidades[sku] += cantidad
+    return cantidades
+
+
+@transaction.atomic
+def crear_conteo(cantidades, usuario, motivo="", deposito=None):
+    conteo = ConteoInventario.objects.create(
+        usuario=usuario, motivo=motivo, deposito=deposito or Deposito.get_principal()
+    )
+
+    skus = list(cantidades)
+    ids = {}
+    for inicio in range(0, len(skus), LOTE):
+        ids.update(
+            Producto.objects.filter(sku__in=skus[inicio:inicio + LOTE]).values_list("sku", "id")
+        )
+
+    ItemConteo.objects.bulk_create(
+        (
+            ItemConteo(conteo=conteo, producto_id=ids[sku], cantidad=cantidad)
+            for sku, cantidad in cantidades.items()
+            if sku in ids
+        ),
+        batch_size=LOTE,
+    )
+
+    desconocidos = [sku for sku in skus if sku not in ids]
+    if desconocidos:
+        conteo.skus_desconocidos = "\n".join(desconocidos)
+        conteo.save(update_fields=["skus_desconocidos"])
+    return conteo
+
+
+def diferencias(conteo):
+    """Items del conteo cuya cantidad no coincide con el stock del deposito (una sola consulta)."""
+    en_deposito = StockDeposito.objects.filter(
+        deposito_id=conteo.deposito_id, producto=OuterRef("producto")
+    ).values("cantidad")[:1]
+    return (
+        conteo.items
+        .annotate(
+            sku=F("producto__sku"),
+            nombre=F("producto__nombre"),
+            stock=Coalesce(Subquery(en_deposito), 0),
+            diferencia=F("cantidad") - F("stock"),
+        )
+        .exclude(diferencia=0)
+        .order_by("producto__nombre")
+    )
+
+
+def aplicar_conteo(conteo, usuario):
+    """Aplica el conteo. Devuelve la cantidad de productos cuyo stock cambio."""
+    with transaction.atomic():
+        conteo = ConteoInventario.objects.select_for_update().get(pk=conteo.pk)
+        if conteo.estado != "abierto":
+            raise ValueError("El conteo ya fue aplicado")
+
+        contados = dict(conteo.items.values_list("producto_id", "cantidad"))
+        deposito = conteo.deposito or Deposito.get_principal()
+
+        # Bloqueamos solo las filas contadas, y solo durante esta transaccion.
+        # Primero el deposito y despues el producto, y en orden de id, como en
+        # Producto.mover_stock y depositos.mover_varios (si no, un conteo y una
+        # venta grande se pueden trabar entre si)
+        ids_contados = sorted(contados)
+        # Los fraccionados se consolidan antes (quedan bloqueadas sus fracciones),
+        # asi StockDeposito tiene su stock real
+        fraccionados = list(
+            Producto.objects.filter(pk__in=ids_contados, fracciones__gt=0).order_by("pk").values_list("pk", flat=True)
+        )
+        consolidar(fraccionados)
+        en_deposito = {}
+        for inicio in range(0, len(ids_contados), LOTE):
+            en_deposito.update(
+                StockDeposito.objects.select_for_update()
+                .filter(deposito=deposito, producto_id__in=ids_contados[inicio:inicio + LOTE])
+                .order_by("producto_id")
+                .values_list("producto_id", "cantidad")
+            )
+        diferencia = {
+            producto_id: cantidad - en_deposito.get(producto_id, 0)
+            for producto_id, cantidad in contados.items()
+            if cantidad != en_deposito.get(producto_id, 0)
+        }
+
+        # Las alertas miran el total del producto: (id, total antes, total despues, minimo)
+        cambios = []
+        ids = sorted(diferencia)
+        for inicio in range(0, len(ids), LOTE):
+            bloqueados = (
+                Producto.objects.select_for_update()
+                .filter(pk__in=ids[inicio:inicio + LOTE])
+                .order_by("pk")
+                .values_list("id", "stock", "stock_minimo")
+            )
+            for producto_id, stock, stock_minimo in bloqueados:
+                cambios.append((producto_id, stock, stock + diferencia[producto_id], stock_minimo))
+
+        ahora = timezone.now()
+        motivo = conteo.motivo or f"Conteo de inventario #{conteo.pk}"
+        movimientos = MovimientoStock.objects.bulk_create(
+            (
+                MovimientoStock(
+                    producto_id=producto_id,
+                    deposito=deposito,
+                    tipo="entrada" if nuevo > anterior else "salida",
+                    cantidad=abs(nuevo - anterior),
+                    motivo=motivo,
+                    fecha=ahora,
+                    usuario=usuario,
+                )
+                for producto_id, anterior, nuevo, _ in cambios
+            ),
+            batch_size=LOTE,
+        )
+        eventos.movimientos(movimientos)
+
+        # UPDATE ... SET cantidad = (cantidad contada) por lote en el deposito;
+        # los productos que no tenian fila en el deposito se insertan
+        contado = ItemConteo.objects.filter(conteo=conteo, producto=OuterRef("producto")).values("cantidad")[:1]
+        existentes = [producto_id for producto_id in ids if producto_id in en_deposito]
+        for inicio in range(0, len(existentes), LOTE):
+            StockDeposito.objects.filter(
+                deposito=deposito, producto_id__in=existentes[inicio:inicio + LOTE]
+            ).update(cantidad=Subquery(contado))
+        StockDeposito.objects.bulk_create(
+            (
+                StockDeposito(deposito=deposito, producto_id=producto_id, cantidad=contados[producto_id])
+                for producto_id in ids
+                if producto_id not in en_deposito
+            ),
+            batch_size=LOTE,
+        )
+
+        # El total de los productos contados se recalcula desde sus depositos;
+        # fecha_actualizacion se setea a mano porque update() no pasa por auto_now
+        total = (
+            StockDeposito.objects.filter(producto=OuterRef("pk"))
+            .values("producto")
+            .annotate(total=Sum("cantidad"))
+            .values("total")
+        )
+        for inicio in range(0, len(ids), LOTE):
+            Producto.objects.filter(pk__in=ids[inicio:inicio + LOTE]).update(
+                stock=Subquery(total),
+                version=F("version") + 1,
+                fecha_actualizacion=ahora,
+            )
+
+        igualar_a_deposito(deposito, fraccionados)
+        registrar_cambios_stock(cambios)
+
+        conteo.estado = "aplicado"
+        conteo.fecha_aplicado = ahora
+        conteo.save(update_fields=["estado", "fecha_aplicado"])
+
+    return len(cambios)
@@ -1,5 +1,6 @@
 from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Layout, Submit, Row, Column
+from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+from django.template import Template
 
 class BaseFormHelper(FormHelper):
     def __init__(self, *args, **kwargs):
@@ -9,3 +10,12 @@ class BaseFormHelper(FormHelper):
         self.label_class = "col-md-3 col-form-label"
         self.field_class = "col-md-9"
         self.render_required_fields = "True"
+
+
+class CachedHTML(HTML):
+    # crispy compila el Template del HTML en cada render; aca se compila una vez
+    def render(self, form, context, template_pack=None, **kwargs):
+        template = getattr(self, "_template", None)
+        if template is None:
+            template = self._template = Template(str(self.html))
+        return template.render(context)
@@ -0,0 +1,143 @@
+"""
+Stock por deposito.
+
+Cada producto tiene una fila ``StockDeposito`` por deposito donde tiene
+mercaderia y ``Producto.stock`` guarda el total. Los dos se mueven juntos y
+en forma incremental (``Producto.mover_stock``), nunca se suma el stock de
+todos los depositos para mostrar un producto ni para validar una venta.
+"""
+from django.db import transaction
+from django.db.models import Exists, F, IntegerField, OuterRef
+from django.utils import timezone
+
+from inventario.expresiones import SegunId
+
+from . import eventos
+from .fracciones import stock_fraccionado
+from .models import Deposito, MovimientoStock, Producto, StockDeposito, StockInsuficiente
+
+
+def transferir(producto, origen, destino, cantidad, usuario, motivo=""):
+    """Pasa ``cantidad`` de un deposito a otro. El total del producto no cambia.
+
+    Registra la salida del origen y la entrada al destino como dos
+    ``MovimientoStock``. Levanta ``StockInsuficiente`` si en el origen no alcanza.
+    """
+    if origen == destino:
+        raise ValueError("El deposito de origen y el de destino son el mismo")
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Las dos filas se tocan siempre en orden de deposito: dos transferencias
+        # cruzadas (A->B y B->A) no se bloquean entre si
+        for deposito in sorted((origen, destino), key=lambda d: d.pk):
+            producto.mover_en_deposito(deposito, -cantidad if deposito == origen else cantidad)
+
+        # El total es el mismo pero el producto cambio: version y cache
+        Producto.objects.filter(pk=producto.pk).update(
+            version=F("version") + 1,
+            fecha_actualizacion=ahora,
+        )
+        eventos.movimientos(MovimientoStock.objects.bulk_create([
+            MovimientoStock(
+                producto=producto, deposito=origen, tipo="salida", cantidad=cantidad,
+                motivo=motivo or f"Transferencia a {destino}", fecha=ahora, usuario=usuario,
+            ),
+            MovimientoStock(
+                producto=producto, deposito=destino, tipo="entrada", cantidad=cantidad,
+                motivo=motivo or f"Transferencia desde {origen}", fecha=ahora, usuario=usuario,
+            ),
+        ]))
+    producto.refresh_from_db(fields=["version", "fecha_actualizacion"])
+
+
+def mover_varios(deposito, cantidades):
+    """Suma (o resta, con cantidades negativas) stock de muchos productos a la vez.
+
+    ``cantidades`` es {producto_id: cantidad}. Es lo mismo que llamar a
+    ``Producto.mover_stock`` por cada uno pero con las mismas consultas sean 2
+    o 1000 productos: se bloquean las filas del deposito y despues las de los
+    productos (en orden de id, como las ventas de a una) y se actualizan con un
+    UPDATE con CASE por tabla. Si algun producto no alcanza levanta
+    ``StockInsuficiente`` con ese producto y no se mueve nada (hay que
+    llamarla dentro de una transaccion).
+
+    Devuelve (producto_id, stock anterior, stock nuevo, minimo) de los que
+    cambiaron en las filas de totales, para ``registrar_cambios_stock``.
+    """
+    cantidades = {pk: cantidad for pk, cantidad in cantidades.items() if cantidad}
+    fraccionados = list(
+        Producto.objects.filter(pk__in=cantidades, fracciones__gt=0).order_by("pk")
+    )
+    # Los fraccionados (pocos, los de promocion) van por sus fracciones de a uno,
+    # que se bloquean antes que las filas del deposito
+    for producto in fraccionados:
+        producto.mover_stock(cantidades.pop(producto.pk), deposito)
+    if not cantidades:
+        return []
+
+    filas = StockDeposito.objects.filter(deposito=deposito, producto_id__in=cantidades)
+    en_deposito = dict(
+        filas.select_for_update().order_by("producto_id").values_list("producto_id", "cantidad")
+    )
+    for pk, cantidad in cantidades.items():
+        if en_deposito.get(pk, 0) + cantidad < 0:
+            raise StockInsuficiente(Producto.objects.get(pk=pk))
+    if en_deposito:
+        filas.update(cantidad=F("cantidad") + SegunId("producto_id", {pk: cantidades[pk] for pk in en_deposito}, IntegerField()))
+    StockDeposito.objects.bulk_create(
+        StockDeposito(deposito=deposito, producto_id=pk, cantidad=cantidad)
+        for pk, cantidad in cantidades.items()
+        if pk not in en_deposito
+    )
+
+    productos = Producto.objects.filter(pk__in=cantidades)
+    antes = list(
+        productos.select_for_update().order_by("pk").values_list("pk", "stock", "stock_minimo")
+    )
+    # fecha_actualizacion a mano porque update() no pasa por auto_now
+    productos.update(
+        stock=F("stock") + SegunId("pk", cantidades, IntegerField()),
+        version=F("version") + 1,
+        fecha_actualizacion=timezone.now(),
+    )
+    return [(pk, stock, stock + cantidades[pk], minimo) for pk, stock, minimo in antes]
+
+
+def stock_por_producto(deposito, productos):
+    """Stock en ``deposito`` de cada producto pedido, en una consulta por el indice unico.
+
+    Para los productos fraccionados se suman sus fracciones (una consulta
+    mas, solo si hay alguno), porque ``StockDeposito`` puede venir atrasado.
+    """
+    disponible = dict(
+        StockDeposito.objects
+        .filter(deposito=deposito, producto__in=productos)
+        .values_list("producto_id", "cantidad")
+    )
+    fraccionados = [producto for producto in productos if producto.fracciones]
+    if fraccionados:
+        disponible.update(dict.fromkeys((producto.pk for producto in fraccionados), 0))
+        disponible.update(stock_fraccionado(deposito, fraccionados))
+    return disponible
+
+
+def sincronizar_depositos(using=None):
+    """Pasa al deposito principal el stock de los productos que no tienen filas por deposito.
+
+    Es para datos cargados por fuera de ``Producto.save`` (ej. ``inicializar_bd``).
+    """
+    principal = Deposito.get_principal(using=using)
+    sin_stock = (
+        Producto.objects.db_manager(using)
+        .filter(~Exists(StockDeposito.objects.db_manager(using).filter(producto=OuterRef("pk"))))
+        .exclude(stock=0)
+        .values_list("id", "stock")
+    )
+    return len(StockDeposito.objects.db_manager(using).bulk_create(
+        (
+            StockDeposito(deposito=principal, producto_id=producto_id, cantidad=stock)
+            for producto_id, stock in sin_stock.iterator()
+        ),
+        batch_size=1000,
+    ))
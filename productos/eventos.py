@@ -0,0 +1,309 @@
+"""
+Eventos de stock, productos y ventas para otros sistemas (ERP, tienda online).
+
+Cada cambio inserta un ``Evento`` en la misma transaccion (outbox): si la
+venta o el movimiento se deshace, el evento tambien. El comando
+``publicar_eventos`` los lee en orden de id y los manda por lotes a los
+sinks de ``settings.EVENTOS["SINKS"]``; cada sink tiene su ``OffsetEventos``
+con el ultimo id entregado, asi los consumidores reciben los cambios sin
+consultar las tablas de ventas o productos.
+
+Tipos y datos:
+
+- ``venta.creada``: la venta y sus items. Es lo que descuenta stock (una
+  venta no genera ``MovimientoStock``).
+- ``venta.devolucion``: lo acreditado; la mercaderia que vuelve llega
+  ademas como ``stock.movimiento`` de entrada.
+- ``stock.movimiento``: entradas y salidas (movimientos, ajustes, conteos,
+  transferencias, devoluciones).
+- ``producto.creado`` / ``producto.actualizado`` (solo los campos que
+  cambiaron) / ``producto.borrado``.
+
+La entrega es "al menos una vez": si el sink recibio el lote pero no se llego
+a guardar el offset, el lote se repite. El ``id`` del evento sirve para
+descartar repetidos. El orden es el de los ids salvo para una transaccion que
+tarda mas de ``ESPERA_HUECO`` en hacer commit: su evento llega despues, fuera
+de orden (ver ``_entregables``). Si tarda mas de ``OLVIDAR_HUECO`` se pierde.
+"""
+import json
+import logging
+import sys
+import urllib.request
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Evento, OffsetEventos
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_PRODUCTO = ("sku", "nombre", "descripcion", "precio", "stock", "stock_minimo", "imagen", "version")
+
+
+def config(clave, defecto=None):
+    return getattr(settings, "EVENTOS", {}).get(clave, defecto)
+
+
+def registrar(eventos):
+    """Inserta ``eventos`` (tuplas tipo, clave, datos) en una consulta."""
+    Evento.objects.bulk_create(
+        Evento(tipo=tipo, clave=str(clave), datos=datos) for tipo, clave, datos in eventos
+    )
+
+
+def _valor(valor):
+    # Los archivos (imagen) van por nombre; el resto lo resuelve DjangoJSONEncoder
+    return getattr(valor, "name", valor) if hasattr(valor, "storage") else valor
+
+
+def producto_guardado(producto, creado=False, campos=CAMPOS_PRODUCTO):
+    datos = {"id": producto.pk}
+    datos.update({campo: _valor(getattr(producto, campo)) for campo in campos})
+    registrar([("producto.creado" if creado else "producto.actualizado", producto.pk, datos)])
+
+
+def producto_borrado(pk, sku):
+    registrar([("producto.borrado", pk, {"id": pk, "sku": sku})])
+
+
+def movimientos(lista):
+    registrar(
+        (
+            "stock.movimiento",
+            movimiento.producto_id,
+            {
+                "id": movimiento.pk,
+                "producto_id": movimiento.producto_id,
+                "deposito_id": movimiento.deposito_id,
+                "tipo": movimiento.tipo,
+                "cantidad": movimiento.cantidad,
+                "motivo": movimiento.motivo,
+                "fecha": movimiento.fecha,
+                "usuario": movimiento.usuario,
+            },
+        )
+        for movimiento in lista
+    )
+
+
+def venta_creada(venta, items):
+    registrar([("venta.creada", venta.pk, {
+        "id": venta.pk,
+        "codigo": venta.codigo,
+        "cliente_id": venta.cliente_id,
+        "deposito_id": venta.deposito_id,
+        "fecha": venta.fecha,
+        "total": venta.total,
+        "items": [
+            {
+                "id": item.pk,
+                "producto_id": item.producto_id,
+                "cantidad": item.cantidad,
+                "precio_unitario": item.precio_unitario,
+                "subtotal": item.subtotal,
+            }
+            for item in items
+        ],
+    })])
+
+
+def devolucion(devolucion, items):
+    registrar([("venta.devolucion", devolucion.venta_id, {
+        "id": devolucion.pk,
+        "venta_id": devolucion.venta_id,
+        "deposito_id": devolucion.deposito_id,
+        "anulacion": devolucion.anulacion,
+        "total": devolucion.total,
+        "fecha": devolucion.fecha,
+        "items": [
+            {
+                "item_venta_id": item.item_venta_id,
+                "producto_id": item.producto_id,
+                "cantidad": item.cantidad,
+                "subtotal": item.subtotal,
+            }
+            for item in items
+        ],
+    })])
+
+
+def a_dict(evento):
+    return {
+        "id": evento.pk,
+        "tipo": evento.tipo,
+        "clave": evento.clave,
+        "fecha": evento.fecha,
+        "datos": evento.datos,
+    }
+
+
+def a_json(eventos):
+    return [json.dumps(a_dict(evento), cls=DjangoJSONEncoder, ensure_ascii=False) for evento in eventos]
+
+
+class BaseSink:
+    def publicar(self, eventos):
+        """Entrega el lote (en orden de id). Si falla tiene que levantar una excepcion."""
+        raise NotImplementedError
+
+
+class ArchivoSink(BaseSink):
+    # Un evento por linea (JSON lines), se agrega al final del archivo
+    def publicar(self, eventos):
+        with open(config("ARCHIVO"), "a", encoding="utf-8") as archivo:
+            archivo.write("".join(f"{linea}\n" for linea in a_json(eventos)))
+            archivo.flush()
+
+
+class WebhookSink(BaseSink):
+    # POST con el lote como lista JSON; cualquier respuesta que no sea 2xx es error
+    def publicar(self, eventos):
+        datos = f"[{','.join(a_json(eventos))}]".encode("utf-8")
+        request = urllib.request.Request(
+            config("WEBHOOK_URL"),
+            data=datos,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        urllib.request.urlopen(request, timeout=10).close()
+
+
+class StdoutSink(BaseSink):
+    def publicar(self, eventos):
+        sys.stdout.write("".join(f"{linea}\n" for linea in a_json(eventos)))
+        sys.stdout.flush()
+
+
+def get_sinks():
+    return {path: import_string(path)() for path in config("SINKS", [])}
+
+
+def _leer_huecos(huecos):
+    # {"desde-hasta": visto} -> [[desde, hasta, visto]]
+    rangos = []
+    for clave, visto in huecos.items():
+        desde, _, hasta = clave.partition("-")
+        rangos.append([int(desde), int(hasta or desde), datetime.fromisoformat(visto)])
+    return rangos
+
+
+def _sin_anotar(desde, hasta, rangos):
+    # Los tramos de desde..hasta que no cubre ningun rango
+    for inicio, fin, _ in sorted(rangos):
+        if fin < desde or inicio > hasta:
+            continue
+        if inicio > desde:
+            yield desde, inicio - 1
+        desde = max(desde, fin + 1)
+    if desde <= hasta:
+        yield desde, hasta
+
+
+def _quitar(rangos, pk):
+    # El evento llego: el rango que lo tenia se parte en dos
+    for rango in rangos:
+        desde, hasta, visto = rango
+        if desde <= pk <= hasta:
+            rangos.remove(rango)
+            rangos.extend(r for r in ([desde, pk - 1, visto], [pk + 1, hasta, visto]) if r[0] <= r[1])
+            return
+
+
+def _entregables(offset, lote):
+    """Eventos para mandar despues de ``offset`` y el nuevo estado del offset.
+
+    Los ids se asignan al insertar pero se ven al hacer commit: si falta un id
+    puede ser una transaccion que todavia no termino (un conteo largo, una
+    venta esperando un bloqueo) o una que se deshizo. Cada hueco se anota en
+    ``offset.huecos`` como un rango de ids con la hora en que se vio por
+    primera vez, asi un salto de un millon de ids (un rollback grande, ids
+    que se comio la secuencia) ocupa lo mismo que uno de un id:
+
+    - El offset no pasa un hueco hasta que lleva ``ESPERA_HUECO`` segundos
+      abierto (contado desde que se vio, no desde la fecha de los eventos
+      de al lado). Mientras tanto se entrega en orden.
+    - Despues el offset sigue pero el rango queda anotado y se vuelve a buscar
+      en cada pasada: si la transaccion hace commit mas tarde su evento se
+      entrega entonces, fuera de orden. Pasados ``OLVIDAR_HUECO`` segundos se
+      da por deshecho y se deja de buscar.
+
+    Devuelve (eventos, ultimo_id, huecos).
+    """
+    ahora = timezone.now()
+    espera = timedelta(seconds=config("ESPERA_HUECO", 30))
+    olvido = timedelta(seconds=config("OLVIDAR_HUECO", 3600))
+    rangos = [rango for rango in _leer_huecos(offset.huecos) if ahora - rango[2] < olvido]
+
+    # Los salteados que aparecieron (commit tardio)
+    salteados = Q()
+    for desde, hasta, _ in rangos:
+        if desde <= offset.ultimo_id:
+            salteados |= Q(pk__range=(desde, hasta))
+    tardios = list(Evento.objects.filter(salteados).order_by("pk")[:lote]) if salteados else []
+
+    siguientes = list(Evento.objects.filter(pk__gt=offset.ultimo_id).order_by("pk")[:lote])
+    eventos, ultimo_id = [], offset.ultimo_id
+    for evento in siguientes:
+        if evento.pk > ultimo_id + 1:
+            desde, hasta = ultimo_id + 1, evento.pk - 1
+            nuevos = list(_sin_anotar(desde, hasta, rangos))
+            rangos.extend([inicio, fin, ahora] for inicio, fin in nuevos)
+            if nuevos or any(
+                ahora - visto < espera for inicio, fin, visto in rangos if inicio <= hasta and fin >= desde
+            ):
+                break
+        eventos.append(evento)
+        ultimo_id = evento.pk
+
+    for evento in (*tardios, *siguientes):
+        _quitar(rangos, evento.pk)
+    return tardios + eventos, ultimo_id, {f"{desde}-{hasta}": visto.isoformat() for desde, hasta, visto in rangos}
+
+
+def _offset_inicial():
+    # Un sink nuevo empieza por el evento mas viejo que queda: los anteriores
+    # ya se purgaron y no hay que anotarlos como huecos
+    return (Evento.objects.aggregate(minimo=Min("pk"))["minimo"] or 1) - 1
+
+
+def publicar(sinks=None, lote=None):
+    """Manda a cada sink el siguiente lote de eventos. Devuelve {sink: cantidad}."""
+    sinks = get_sinks() if sinks is None else sinks
+    lote = lote or config("LOTE", 500)
+    entregados = {}
+    for nombre, sink in sinks.items():
+        OffsetEventos.objects.get_or_create(sink=nombre, defaults={"ultimo_id": _offset_inicial})
+        try:
+            with transaction.atomic():
+                # Con el offset bloqueado dos relays no mandan el mismo lote
+                offset = OffsetEventos.objects.select_for_update().get(sink=nombre)
+                eventos, ultimo_id, huecos = _entregables(offset, lote)
+                if eventos:
+                    sink.publicar(eventos)
+                    offset.fecha = timezone.now()
+                # Los huecos se guardan aunque no haya nada para mandar: la espera
+                # cuenta desde la primera vez que se vieron
+                if eventos or huecos != offset.huecos:
+                    offset.ultimo_id = ultimo_id
+                    offset.huecos = huecos
+                    offset.save(update_fields=["ultimo_id", "fecha", "huecos"])
+        except Exception:
+            # Un sink caido no frena a los demas; reintenta en la proxima pasada
+            logger.exception("No se pudieron publicar eventos en %s", nombre)
+            eventos = []
+        entregados[nombre] = len(eventos)
+    return entregados
+
+
+def purgar():
+    """Borra los eventos que ya recibieron todos los sinks y tienen mas de ``RETENER_DIAS``."""
+    entregado = OffsetEventos.objects.filter(sink__in=config("SINKS", [])).aggregate(minimo=Min("ultimo_id"))["minimo"]
+    if not entregado:
+        return 0
+    limite = timezone.now() - timedelta(days=config("RETENER_DIAS", 7))
+    return Evento.objects.filter(pk__lte=entregado, fecha__lt=limite).delete()[0]
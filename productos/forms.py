@@ -1,13 +1,98 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Producto, MovimientoStock
+from .models import Producto, MovimientoStock, Deposito
 from crispy_forms.layout import Layout, Row, Column, Submit, Reset, ButtonHolder, Field, Div, HTML
 from crispy_forms.bootstrap import AppendedText, PrependedText, FormActions
-from .crispy import BaseFormHelper
+from .crispy import BaseFormHelper, CachedHTML
 from crispy_forms.helper import FormHelper
+from functools import cache
+
+
+# Los helpers y layouts no dependen de la instancia del form: el dato del
+# producto se resuelve en el template con {{ form.producto }}. Asi se arman
+# una sola vez por proceso y no en cada request.
+STOCK_INFO_HTML = """
+{% if form.producto %}
+<div class="alert alert-info">
+    <strong>Producto:</strong> {{ form.producto.nombre }}<br>
+    <strong>Stock actual:</strong> {{ form.producto.stock }}
+</div>
+{% endif %}
+"""
+
+
+def deposito_field(**kwargs):
+    # Sin opcion vacia: queda elegido el primero, que es el deposito principal
+    kwargs.setdefault("label", "Depósito")
+    return forms.ModelChoiceField(
+        queryset=Deposito.objects.filter(activo=True),
+        empty_label=None,
+        **kwargs
+    )
+
+
+@cache
+def producto_helper():
+    helper = BaseFormHelper()
+    helper.layout = Layout(
+        Field("nombre"),
+        Field("descripcion"),
+        PrependedText("precio", "$", placeholder="0.00"),
+        Field("stock"),
+        Field("stock_minimo"),
+        Field("imagen"),
+        Field("version"),
+        ButtonHolder(
+            Submit("submit", "Guardar", css_class="btn btn-success"),
+            Reset("reset", "Limpiar", css_class="btn btn-outline-secondary"),
+            CachedHTML('<a href="{% url "productos:producto_list" %}" class="btn btn-secondary">Cancelar</a>')
+
+        )
+    )
+    return helper
+
+
+@cache
+def movimiento_helper():
+    helper = BaseFormHelper()
+    helper.layout = Layout(
+        CachedHTML(STOCK_INFO_HTML),
+        Field("deposito"),
+        Field("tipo"),
+        Field("cantidad"),
+        Field("motivo"),
+        ButtonHolder(
+            Submit("submit", "Registrar movimiento",
+            css_class="btn btn-success"),
+            CachedHTML('<a href="{{ request.META.HTTP_REFERER }}" ' \
+            'class="btn btn-secondary">Cancelar</a>')
+
+        )
+    )
+    return helper
+
+
+@cache
+def ajuste_helper():
+    helper = BaseFormHelper()
+    helper.layout = Layout(
+        CachedHTML(STOCK_INFO_HTML),
+        Field('deposito'),
+        Field('cantidad'),
+        Field('motivo'),
+        Field('version'),
+        ButtonHolder(
+            Submit('submit', 'Ajustar Stock', css_class='btn btn-warning'),
+            CachedHTML('<a href="{{ request.META.HTTP_REFERER }}" class="btn btn-secondary">Cancelar</a>')
+        )
+    )
+    return helper
 
 
 class ProductoForm(forms.ModelForm):
+    # Version de la fila que vio el usuario, para detectar ediciones concurrentes
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = Producto
         fields = ["sku","nombre", "descripcion", "precio", "stock", "stock_minimo", "imagen"]
@@ -24,22 +109,14 @@ class ProductoForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.helper = BaseFormHelper()
-    
-        self.helper.layout = Layout(
-            Field("nombre"),
-            Field("descripcion"),
-            PrependedText("precio", "$", placeholder="0.00"),
-            Field("stock"),
-            Field("stock_minimo"),
-            Field("imagen"),
-            ButtonHolder(
-                Submit("submit", "Guardar", css_class="btn btn-success"),
-                Reset("reset", "Limpiar", css_class="btn btn-outline-secondary"),
-                HTML('<a href="{% url "productos:producto_list" %}" class="btn btn-secondary">Cancelar</a>')
-
-            )
-        )
+        # El helper no guarda estado del form, se arma una sola vez por proceso
+        self.helper = producto_helper()
+        if self.instance.pk:
+            self.fields["version"].initial = self.instance.version
+            # El total sale del stock por deposito: se cambia con movimientos,
+            # ajustes o transferencias, no editando el producto
+            self.fields["stock"].disabled = True
+            self.fields["stock"].help_text = "Se modifica con movimientos, ajustes o transferencias entre depósitos."
      
     def clean_precio(self):
         precio = self.cleaned_data.get("precio")
@@ -65,9 +142,11 @@ class ProductoForm(forms.ModelForm):
 
 
 class MovimientoStockForm(forms.ModelForm):
+    deposito = deposito_field()
+
     class Meta:
         model = MovimientoStock
-        fields = ["tipo", "cantidad", "motivo"]
+        fields = ["deposito", "tipo", "cantidad", "motivo"]
         widgets = {
             "motivo": forms.Textarea(attrs={"rows": 3}),
         }
@@ -80,41 +159,26 @@ class MovimientoStockForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
        self.producto = kwargs.pop("producto", None)
        super().__init__(*args, **kwargs)
-       self.helper = BaseFormHelper()
-
-       stock_info = ""
-       if self.producto:
-           stock_info = f"""
-           <div class="alert alert-info">
-               <strong>Producto:</strong> {self.producto.nombre}<br>
-               <strong>Stock actual:</strong> {self.producto.stock}
-           </div>
-           """
-            
-           self.helper.layout = Layout(
-                HTML(stock_info),
-                Field("tipo"),
-                Field("cantidad"),
-                Field("motivo"),
-                ButtonHolder(
-                    Submit("submit", "Registrar movimiento", 
-                    css_class="btn btn-success"),
-                    HTML('<a href="{{ request.META.HTTP_REFERER }}" ' \
-                    'class="btn btn-secondary">Cancelar</a>')
-
-                )
-            )
+       self.helper = movimiento_helper()
+
     def clean_cantidad(self):
         cantidad = self.cleaned_data.get("cantidad")
         if cantidad <= 0:
            raise ValidationError("La cantidad debe ser mayor a cero")
-            
-        if self.producto and self.cleaned_data.get("tipo") == "salida":
-           if cantidad > self.producto.stock:
-               raise ValidationError(
-                  f"No hay suficiente stock. Disponible: {self.producto.stock}"
-    )
         return cantidad
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cantidad = cleaned_data.get("cantidad")
+        deposito = cleaned_data.get("deposito")
+        if self.producto and deposito and cantidad and cleaned_data.get("tipo") == "salida":
+           disponible = self.producto.stock_en(deposito)
+           if cantidad > disponible:
+               self.add_error(
+                  "cantidad",
+                  f"No hay suficiente stock en {deposito}. Disponible: {disponible}"
+               )
+        return cleaned_data
         
 
 class AjusteStockForm(forms.Form):
@@ -122,10 +186,11 @@ class AjusteStockForm(forms.Form):
     Formulario genérico para ajustar el stock de un producto.
     No se basa en un modelo, sino en una acción.
     """
+    deposito = deposito_field()
     cantidad = forms.IntegerField(
         min_value=0,
         label="Nuevo Stock",
-        help_text="Establece el nuevo valor de stock para el producto."
+        help_text="Establece el nuevo valor de stock del producto en el depósito."
     )
     motivo = forms.CharField(
         required=False,
@@ -133,33 +198,44 @@ class AjusteStockForm(forms.Form):
         label="Motivo del Ajuste",
         help_text="Explica por qué estás ajustando el stock (opcional)."
     )
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
 
     def __init__(self, *args, **kwargs):
         self.producto = kwargs.pop('producto', None)
         super().__init__(*args, **kwargs)
-        self.helper = BaseFormHelper()
-        
-        # Mostramos el stock actual para contexto del usuario
-        stock_info = ""
+        self.helper = ajuste_helper()
+
         if self.producto:
-            stock_info = f"""
-            <div class="alert alert-info">
-                <strong>Producto:</strong> {self.producto.nombre}<br>
-                <strong>Stock actual:</strong> {self.producto.stock}
-            </div>
-            """
             # Establecemos el valor inicial del campo 'cantidad' al stock actual
-            self.fields['cantidad'].initial = self.producto.stock
-        
-        self.helper.layout = Layout(
-            HTML(stock_info),
-            Field('cantidad'),
-            Field('motivo'),
-            ButtonHolder(
-                Submit('submit', 'Ajustar Stock', css_class='btn btn-warning'),
-                HTML('<a href="{{ request.META.HTTP_REFERER }}" class="btn btn-secondary">Cancelar</a>')
-            )
-        )
+            # del deposito que viene elegido (el principal)
+            self.fields['cantidad'].initial = self.producto.stock_en(Deposito.get_principal())
+            self.fields['version'].initial = self.producto.version
+
+class TransferenciaStockForm(forms.Form):
+    """Pasa stock de un producto de un depósito a otro."""
+    origen = deposito_field(label="Desde")
+    destino = deposito_field(label="Hacia")
+    cantidad = forms.IntegerField(min_value=1, label="Cantidad")
+    motivo = forms.CharField(required=False, max_length=200, label="Motivo (opcional)")
+
+    def __init__(self, *args, **kwargs):
+        self.producto = kwargs.pop('producto', None)
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        origen = cleaned_data.get("origen")
+        destino = cleaned_data.get("destino")
+        cantidad = cleaned_data.get("cantidad")
+        if origen and destino and origen == destino:
+            self.add_error("destino", "Elegí un depósito distinto al de origen")
+        elif self.producto and origen and cantidad:
+            disponible = self.producto.stock_en(origen)
+            if cantidad > disponible:
+                self.add_error("cantidad", f"No hay suficiente stock en {origen}. Disponible: {disponible}")
+        return cleaned_data
+
+
 class FiltroFormHelper(FormHelper):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -210,4 +286,29 @@ class FiltroProductosForm(forms.Form):
                 # Alineamos los elementos verticalmente al centro
                 css_class='form-row align-items-center'
             )
-        )
\ No newline at end of file
+        )
+
+class ConteoInventarioForm(forms.Form):
+    """
+    Carga de un conteo fisico: un CSV con sku,cantidad o las lecturas del
+    scanner pegadas (un SKU por linea).
+    """
+    archivo = forms.FileField(
+        required=False,
+        label="Archivo CSV",
+        help_text="Columnas: sku,cantidad (el encabezado es opcional)."
+    )
+    lecturas = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 6}),
+        label="Lecturas del scanner",
+        help_text="Un SKU por línea; cada lectura suma 1. También acepta sku,cantidad."
+    )
+    deposito = deposito_field(help_text="Depósito en el que se hizo el conteo.")
+    motivo = forms.CharField(required=False, max_length=200, label="Motivo")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("archivo") and not cleaned_data.get("lecturas"):
+            raise ValidationError("Subí un archivo o pegá las lecturas del scanner")
+        return cleaned_data
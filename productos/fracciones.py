@@ -0,0 +1,142 @@
+"""
+Stock fraccionado para productos con muchas ventas simultaneas.
+
+En una promocion cientos de ventas descuentan el mismo producto y todas
+esperan el bloqueo de la misma fila (``StockDeposito`` y ``Producto``). Un
+producto fraccionado reparte el stock de cada deposito en N filas
+``StockFraccion``: cada venta toma una fraccion libre que alcance (``SKIP
+LOCKED``) y no toca las filas de totales, asi hasta N ventas del producto
+avanzan a la vez.
+
+``consolidar`` (comando ``rebalancear_stock --loop``) suma las fracciones,
+las vuelve a repartir parejas y deja ``StockDeposito`` y ``Producto.stock``
+al dia; en el medio esos totales pueden ir atrasados unos segundos. Para
+validar una venta o calcular un ajuste se usa la suma de las fracciones.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .alertas import registrar_cambios_stock
+from .models import Producto, StockDeposito, StockFraccion
+
+
+def repartir(total, partes):
+    # 10 en 4 -> [3, 3, 2, 2]
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+
+@transaction.atomic
+def fraccionar(producto, fracciones):
+    """Reparte el stock de ``producto`` en ``fracciones`` filas por deposito (0 lo deshace)."""
+    if producto.fracciones:
+        consolidar([producto.pk])
+    # Las ventas en curso terminan antes de leer el stock de los depositos
+    depositos = list(
+        StockDeposito.objects.select_for_update()
+        .filter(producto=producto)
+        .order_by("deposito_id")
+        .values_list("deposito_id", "cantidad")
+    )
+    StockFraccion.objects.filter(producto=producto).delete()
+    StockFraccion.objects.bulk_create(
+        StockFraccion(deposito_id=deposito_id, producto=producto, numero=numero, cantidad=parte)
+        for deposito_id, cantidad in depositos
+        for numero, parte in enumerate(repartir(cantidad, fracciones) if fracciones else [])
+    )
+    Producto.objects.filter(pk=producto.pk).update(fracciones=fracciones)
+    producto.fracciones = fracciones
+
+
+def _consolidar_producto(producto_id):
+    # Orden de bloqueo: fracciones, depositos y producto, como una venta
+    fracciones = list(
+        StockFraccion.objects.select_for_update()
+        .filter(producto_id=producto_id)
+        .order_by("deposito_id", "numero")
+    )
+    por_deposito = {}
+    for fraccion in fracciones:
+        por_deposito.setdefault(fraccion.deposito_id, []).append(fraccion)
+
+    cambiadas = []
+    for deposito_id, filas in por_deposito.items():
+        total = sum(fila.cantidad for fila in filas)
+        for fila, parte in zip(filas, repartir(total, len(filas))):
+            if fila.cantidad != parte:
+                fila.cantidad = parte
+                cambiadas.append(fila)
+        if not StockDeposito.objects.filter(deposito_id=deposito_id, producto_id=producto_id).update(cantidad=total):
+            StockDeposito.objects.create(deposito_id=deposito_id, producto_id=producto_id, cantidad=total)
+    StockFraccion.objects.bulk_update(cambiadas, ["cantidad"])
+
+    anterior, minimo = (
+        Producto.objects.select_for_update().filter(pk=producto_id).values_list("stock", "stock_minimo").get()
+    )
+    total = StockDeposito.objects.filter(producto_id=producto_id).aggregate(total=Sum("cantidad"))["total"] or 0
+    if total != anterior:
+        Producto.objects.filter(pk=producto_id).update(
+            stock=total,
+            version=F("version") + 1,
+            fecha_actualizacion=timezone.now(),
+        )
+    return anterior, total, minimo
+
+
+def consolidar(productos=None):
+    """Pone al dia los totales de los productos fraccionados y empareja sus fracciones.
+
+    ``productos`` es una lista de ids (por defecto, todos los fraccionados).
+    Una transaccion corta por producto: las ventas de ese producto esperan
+    solo lo que tarda en repartirlo. Devuelve cuantos totales cambiaron.
+    """
+    if productos is None:
+        productos = Producto.objects.filter(fracciones__gt=0).values_list("pk", flat=True)
+    cambios = []
+    for producto_id in list(productos):
+        with transaction.atomic():
+            anterior, total, minimo = _consolidar_producto(producto_id)
+        if total != anterior:
+            cambios.append((producto_id, anterior, total, minimo))
+    registrar_cambios_stock(cambios)
+    return len(cambios)
+
+
+def stock_fraccionado(deposito, productos):
+    """Suma de las fracciones en ``deposito`` de cada producto pedido, en una consulta."""
+    return dict(
+        StockFraccion.objects.filter(deposito=deposito, producto__in=productos)
+        .values("producto_id")
+        .annotate(total=Sum("cantidad"))
+        .values_list("producto_id", "total")
+        .order_by()
+    )
+
+
+def igualar_a_deposito(deposito, productos):
+    """Reparte de nuevo las fracciones de ``deposito`` segun ``StockDeposito``.
+
+    Es para cuando se fija el stock del deposito por fuera de las fracciones
+    (aplicar un conteo). Las filas se actualizan en el lugar, asi una venta
+    que estaba esperando el bloqueo las sigue encontrando.
+    """
+    cantidades = dict(
+        StockDeposito.objects.filter(deposito=deposito, producto_id__in=productos)
+        .values_list("producto_id", "cantidad")
+    )
+    existentes = {}
+    for fraccion in StockFraccion.objects.select_for_update().filter(deposito=deposito, producto_id__in=productos):
+        existentes[(fraccion.producto_id, fraccion.numero)] = fraccion
+
+    cambiadas, nuevas = [], []
+    for producto_id, fracciones in Producto.objects.filter(pk__in=productos).values_list("pk", "fracciones"):
+        for numero, parte in enumerate(repartir(cantidades.get(producto_id, 0), fracciones)):
+            fraccion = existentes.get((producto_id, numero))
+            if fraccion is None:
+                nuevas.append(StockFraccion(deposito=deposito, producto_id=producto_id, numero=numero, cantidad=parte))
+            elif fraccion.cantidad != parte:
+                fraccion.cantidad = parte
+                cambiadas.append(fraccion)
+    StockFraccion.objects.bulk_update(cambiadas, ["cantidad"])
+    StockFraccion.objects.bulk_create(nuevas)
@@ -0,0 +1,92 @@
+"""
+Optimizacion de las imagenes de productos.
+
+``optimizar`` deja una imagen como se muestra en el sitio: como mucho
+``LADO_MAXIMO`` px de lado, rotada segun el EXIF, sin metadatos (EXIF con
+GPS, XMP, comentarios) y recomprimida. La usa ``Producto.achicar_imagen``
+al subir una imagen y el comando ``optimizar_imagenes`` para las que ya
+estaban en ``media/productos/``.
+
+Este modulo no toca la base ni importa modelos: el comando lo corre en un
+pool de procesos y cada proceso solo recibe rutas de archivo.
+"""
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageOps
+
+LADO_MAXIMO = 300
+
+# Si la imagen ya esta en tamaño y sin metadatos solo se reescribe si baja
+# al menos esto; asi correr el comando dos veces no recomprime de nuevo
+AHORRO_MINIMO = 0.10
+
+OPCIONES = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 6},
+}
+
+METADATOS = ("exif", "xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+
+
+def hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _tiene_metadatos(img):
+    return any(clave in img.info for clave in METADATOS)
+
+
+def optimizar(ruta, lado=LADO_MAXIMO, escribir=True):
+    """Optimiza la imagen en ``ruta`` (mismo nombre y formato).
+
+    Devuelve (bytes antes, bytes despues, hash sha256 del resultado). Con
+    ``escribir=False`` solo calcula cuanto quedaria, no toca el archivo.
+    """
+    antes = os.path.getsize(ruta)
+    with Image.open(ruta) as img:
+        formato = img.format
+        # Los GIF animados y formatos raros quedan como estan
+        if formato not in OPCIONES or getattr(img, "is_animated", False):
+            return antes, antes, hash_archivo(ruta)
+
+        tenia_metadatos = _tiene_metadatos(img)
+        nueva = ImageOps.exif_transpose(img)
+        achicada = nueva.width > lado or nueva.height > lado
+        if achicada:
+            nueva.thumbnail((lado, lado))
+        if formato == "JPEG" and nueva.mode not in ("RGB", "L"):
+            nueva = nueva.convert("RGB")
+
+        salida = io.BytesIO()
+        # Se guarda solo el perfil de color, el resto de img.info no pasa
+        icc = img.info.get("icc_profile")
+        nueva.save(salida, formato, **OPCIONES[formato], **({"icc_profile": icc} if icc else {}))
+
+    datos = salida.getvalue()
+    if not (achicada or tenia_metadatos or len(datos) <= antes * (1 - AHORRO_MINIMO)):
+        return antes, antes, hash_archivo(ruta)
+
+    if escribir:
+        # Archivo temporal en la misma carpeta y replace: nunca queda una imagen a medias
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+    return antes, len(datos), hashlib.sha256(datos).hexdigest()
+
+
+def procesar(args):
+    # Punto de entrada de cada proceso del pool: un error en una imagen
+    # (archivo roto, borrado a mitad de camino) no corta las demas
+    ruta, lado, escribir = args
+    try:
+        return ruta, optimizar(ruta, lado, escribir), None
+    except Exception as e:
+        return ruta, None, str(e)
@@ -0,0 +1,113 @@
+"""
+Indice en memoria SKU -> producto para los lectores de codigo de barras.
+
+Cada proceso tiene su propio diccionario ``{sku: (id, nombre, precio, stock)}``
+que se carga entero la primera vez que se usa. Despues, como mucho cada
+``INDICE_SKU["REFRESCO"]`` segundos, se traen solo los productos con
+``fecha_actualizacion`` reciente (todas las escrituras de producto, incluidos
+los ``update()`` de stock, la tocan), asi una busqueda casi nunca va a la base.
+
+- Las fechas las pone cada transaccion al escribir, no al hacer commit: por
+  eso cada refresco vuelve a leer los ultimos ``SOLAPAMIENTO`` segundos.
+- Un producto guardado o borrado en este proceso vence el indice al hacer
+  commit (``Producto.save`` / ``delete``), y la proxima busqueda refresca.
+- Los borrados de otros procesos no dejan fecha: cada ``RECARGA`` segundos
+  se vuelve a cargar todo.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Producto
+
+CAMPOS = ("id", "sku", "nombre", "precio", "stock", "fecha_actualizacion")
+
+
+def config(clave, defecto):
+    return getattr(settings, "INDICE_SKU", {}).get(clave, defecto)
+
+
+class IndiceSku:
+    def __init__(self):
+        self.por_sku = None
+        self.sku_de = {}
+        self.ultima = None
+        self.refrescado = 0.0
+        self.cargado = 0.0
+        self.lock = threading.Lock()
+
+    def vigente(self):
+        # Sin consultas: lo que mira la vista antes de decidir si va a la base
+        ahora = time.monotonic()
+        return (
+            self.por_sku is not None
+            and ahora - self.refrescado < config("REFRESCO", 2)
+            and ahora - self.cargado < config("RECARGA", 300)
+        )
+
+    def buscar(self, sku):
+        """Devuelve (id, nombre, precio, stock) o None, refrescando si hace falta."""
+        if not self.vigente():
+            self.refrescar()
+        return self.por_sku.get(sku)
+
+    async def abuscar(self, sku):
+        # Para vistas async: solo se sale del event loop si hay que ir a la base
+        if not self.vigente():
+            await sync_to_async(self.refrescar)()
+        return self.por_sku.get(sku)
+
+    def refrescar(self):
+        with self.lock:
+            # Otro hilo pudo haberlo hecho mientras se esperaba el lock
+            if self.vigente():
+                return
+            if self.por_sku is None or time.monotonic() - self.cargado >= config("RECARGA", 300):
+                self._cargar()
+            else:
+                self._aplicar_cambios()
+
+    def _cargar(self):
+        inicio = time.monotonic()
+        por_sku, sku_de, ultima = {}, {}, None
+        productos = Producto.objects.exclude(sku__isnull=True).exclude(sku="").values_list(*CAMPOS).order_by()
+        for pk, sku, nombre, precio, stock, fecha in productos:
+            por_sku[sku] = (pk, nombre, str(precio), stock)
+            sku_de[pk] = sku
+            ultima = fecha if ultima is None or fecha > ultima else ultima
+        # Se reemplaza el diccionario entero: las busquedas en curso siguen con el anterior
+        self.por_sku, self.sku_de, self.ultima = por_sku, sku_de, ultima
+        self.cargado = self.refrescado = inicio
+
+    def _aplicar_cambios(self):
+        inicio = time.monotonic()
+        productos = Producto.objects.values_list(*CAMPOS).order_by()
+        if self.ultima is not None:
+            desde = self.ultima - timedelta(seconds=config("SOLAPAMIENTO", 10))
+            productos = productos.filter(fecha_actualizacion__gte=desde)
+        for pk, sku, nombre, precio, stock, fecha in productos:
+            # Si le cambiaron el SKU (o se lo sacaron) se borra la entrada vieja
+            anterior = self.sku_de.get(pk)
+            if anterior is not None and anterior != sku:
+                self.por_sku.pop(anterior, None)
+                del self.sku_de[pk]
+            if sku:
+                self.por_sku[sku] = (pk, nombre, str(precio), stock)
+                self.sku_de[pk] = sku
+            self.ultima = fecha if self.ultima is None or fecha > self.ultima else self.ultima
+        self.refrescado = inicio
+
+    def vencer(self):
+        self.refrescado = 0.0
+
+    def quitar(self, pk):
+        with self.lock:
+            sku = self.sku_de.pop(pk, None)
+            if sku is not None and self.por_sku is not None:
+                self.por_sku.pop(sku, None)
+
+
+indice = IndiceSku()
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from productos.alertas import despachar_alertas
+
+
+class Command(BaseCommand):
+    help = "Envia un resumen con las alertas de stock bajo pendientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Queda corriendo y manda un resumen por intervalo",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=settings.ALERTAS_STOCK.get("INTERVALO", 300),
+            help="Segundos entre resumenes cuando se usa --loop",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            enviadas = despachar_alertas()
+            if enviadas:
+                self.stdout.write(f"Resumen enviado con {enviadas} alerta(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productos.fracciones import fraccionar
+from productos.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Reparte el stock de productos muy vendidos en varias filas por deposito "
+        "para que las ventas simultaneas no se esperen entre si (0 lo deshace)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("skus", nargs="+", help="SKUs de los productos")
+        parser.add_argument("--fracciones", type=int, default=8, help="Filas por deposito (0 = sin fraccionar)")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["fracciones"] <= 64:
+            raise CommandError("--fracciones tiene que estar entre 0 y 64")
+        productos = {p.sku: p for p in Producto.objects.filter(sku__in=options["skus"])}
+        faltan = [sku for sku in options["skus"] if sku not in productos]
+        if faltan:
+            raise CommandError(f"No existen los SKU: {', '.join(faltan)}")
+
+        for producto in productos.values():
+            fraccionar(producto, options["fracciones"])
+            self.stdout.write(f"{producto.sku}: {options['fracciones']} fraccion(es) por deposito")
@@ -0,0 +1,149 @@
+import csv
+import io
+from collections import defaultdict
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from productos.depositos import sincronizar_depositos
+
+# Con filas en cualquiera de estas tablas la base ya esta sembrada. Es una lista
+# fija (lo que trae backup.json y no crea el migrate) para no tener que leer el
+# fixture; una consulta barata por modelo, no depende del tamaño de los datos
+MODELOS_SEMBRADA = ("auth.user", "productos.producto", "clientes.cliente", "ventas.venta")
+
+# Tablas que ya trae cargadas el migrate (el Site por defecto). No cuentan para
+# decidir si la base esta sembrada y se guardan como en loaddata (update o insert).
+MODELOS_DE_MIGRATE = {"sites.site"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga los datos iniciales (backup.json) si la base esta vacia. "
+        "Usa COPY en Postgres e inserts por lotes en otros motores, todo "
+        "en una transaccion. Si la base ya tiene datos no hace nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture", nargs="?", default="backup.json")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.using = options["database"]
+        self.batch_size = options["batch_size"]
+        self.connection = connections[self.using]
+
+        # Se mira antes de abrir el fixture: en una base ya sembrada (cada arranque
+        # del contenedor) no se lee ni se deserializa nada
+        if any(apps.get_model(label).objects.using(self.using).exists() for label in MODELOS_SEMBRADA):
+            self.stdout.write("La base ya tiene datos, no se carga el fixture")
+            return
+
+        with open(options["fixture"], encoding="utf-8") as fixture:
+            objetos = list(serializers.deserialize("json", fixture, using=self.using))
+
+        por_modelo = defaultdict(list)
+        de_migrate = []
+        for objeto in objetos:
+            if objeto.object._meta.label_lower in MODELOS_DE_MIGRATE:
+                de_migrate.append(objeto)
+            else:
+                por_modelo[type(objeto.object)].append(objeto)
+
+        # Todo en la misma transaccion: si algo falla la base queda vacia y el
+        # proximo arranque vuelve a intentar, no queda sembrada a medias
+        with transaction.atomic(using=self.using):
+            for objeto in de_migrate:
+                objeto.save(using=self.using)
+
+            with self.connection.constraint_checks_disabled():
+                for model, lote in por_modelo.items():
+                    self.cargar(model, [o.object for o in lote])
+                    self.cargar_m2m(model, lote)
+
+            # Igual que loaddata: al final se validan las FKs de todo lo cargado
+            models = list(por_modelo)
+            through = [campo.remote_field.through for model in models for campo in model._meta.many_to_many]
+            self.connection.check_constraints(
+                table_names=[model._meta.db_table for model in models + through]
+            )
+            self.resetear_secuencias(models + through)
+
+            # El fixture trae solo el total de cada producto: va al deposito principal
+            sincronizar_depositos(using=self.using)
+
+            # Los agregados de reportes se calculan una sola vez, al sembrar la base
+            call_command("reconstruir_reportes", database=self.using, stdout=self.stdout)
+
+        self.stdout.write(f"Cargados {len(objetos)} objetos de {len(por_modelo) + bool(de_migrate)} modelos")
+
+    def cargar(self, model, instancias):
+        if not instancias:
+            return
+        # La pk solo se manda si viene en el fixture (las tablas m2m no la traen)
+        campos = [
+            f for f in model._meta.local_concrete_fields
+            if not (f.primary_key and instancias[0].pk is None)
+        ]
+        if self.connection.vendor == "postgresql":
+            self.copiar(model, campos, instancias)
+        else:
+            self.insertar(model, campos, instancias)
+
+    def insertar(self, model, campos, instancias):
+        # Insert por lotes en modo raw, como hace loaddata: se respetan los valores
+        # del fixture en campos auto_now/auto_now_add (ej. la fecha de las ventas),
+        # cosa que bulk_create no hace
+        manager = model._base_manager.using(self.using)
+        lote = min(
+            self.batch_size,
+            self.connection.ops.bulk_batch_size(campos, instancias) or self.batch_size,
+        )
+        for inicio in range(0, len(instancias), lote):
+            manager._insert(instancias[inicio:inicio + lote], fields=campos, raw=True, using=self.using)
+
+    def copiar(self, model, campos, instancias):
+        # COPY ... FROM STDIN en CSV; None viaja como \N para distinguirlo de ''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for instancia in instancias:
+            fila = []
+            for campo in campos:
+                valor = campo.get_db_prep_save(getattr(instancia, campo.attname), self.connection)
+                fila.append(r"\N" if valor is None else valor)
+            writer.writerow(fila)
+        buffer.seek(0)
+
+        quote = self.connection.ops.quote_name
+        columnas = ", ".join(quote(campo.column) for campo in campos)
+        sql = (
+            f"COPY {quote(model._meta.db_table)} ({columnas}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    def cargar_m2m(self, model, lote):
+        for campo in model._meta.many_to_many:
+            through = campo.remote_field.through
+            origen = f"{campo.m2m_field_name()}_id"
+            destino = f"{campo.m2m_reverse_field_name()}_id"
+            filas = [
+                through(**{origen: objeto.object.pk, destino: pk})
+                for objeto in lote
+                for pk in (objeto.m2m_data or {}).get(campo.name, [])
+            ]
+            self.cargar(through, filas)
+
+    def resetear_secuencias(self, models):
+        # Como cargamos con pk explicita hay que mover las secuencias (no-op en SQLite)
+        sentencias = self.connection.ops.sequence_reset_sql(no_style(), models)
+        if sentencias:
+            with self.connection.cursor() as cursor:
+                for sql in sentencias:
+                    cursor.execute(sql)
@@ -0,0 +1,82 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Lo que hace un worker al arrancar: setup, modelos, urls (y con ellas
+# todas las vistas). Al final imprime la memoria que quedo ocupada.
+ARRANQUE = """
+import json, resource, django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({"rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+# Se usan solo para PDFs e imagenes: no tienen que cargarse al arrancar
+PESADOS = ("xhtml2pdf", "reportlab", "pyhanko", "PIL")
+
+LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque de un worker en un proceso nuevo (python -X importtime): "
+        "tiempo de imports, memoria y modulos mas pesados. Con --maximo-ms / "
+        "--maximo-mb falla si se pasa, para correrlo en CI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=3, help="Se queda con la mejor medicion")
+        parser.add_argument("--top", type=int, default=10, help="Modulos mas pesados a listar")
+        parser.add_argument("--maximo-ms", type=float, help="Tope de tiempo de imports")
+        parser.add_argument("--maximo-mb", type=float, help="Tope de memoria (RSS maxima)")
+
+    def medir(self):
+        resultado = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", ARRANQUE],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if resultado.returncode:
+            raise CommandError(f"El arranque fallo:\n{resultado.stderr[-2000:]}")
+
+        # Solo las lineas sin sangria: el acumulado de cada import de primer nivel
+        modulos, cargados = {}, set()
+        for linea in resultado.stderr.splitlines():
+            m = LINEA.match(linea)
+            if not m:
+                continue
+            cargados.add(m.group(4).split(".")[0])
+            if not m.group(3):
+                modulos[m.group(4)] = int(m.group(2)) / 1000
+        rss_kb = json.loads(resultado.stdout.strip().splitlines()[-1])["rss_kb"]
+        return sum(modulos.values()), rss_kb / 1024, modulos, cargados
+
+    def handle(self, *args, **options):
+        mediciones = [self.medir() for _ in range(max(options["repeticiones"], 1))]
+        ms = min(m[0] for m in mediciones)
+        mb = min(m[1] for m in mediciones)
+        _, _, modulos, cargados = min(mediciones, key=lambda m: m[0])
+
+        self.stdout.write(f"Imports: {ms:.0f} ms  RSS: {mb:.1f} MB  ({len(mediciones)} corridas, la mejor)")
+        for nombre, tiempo in sorted(modulos.items(), key=lambda m: -m[1])[:options["top"]]:
+            self.stdout.write(f"  {tiempo:8.1f} ms  {nombre}")
+
+        errores = []
+        pesados = sorted(set(PESADOS) & cargados)
+        if pesados:
+            errores.append(f"se cargan al arrancar: {', '.join(pesados)}")
+        if options["maximo_ms"] is not None and ms > options["maximo_ms"]:
+            errores.append(f"imports {ms:.0f} ms > {options['maximo_ms']:.0f} ms")
+        if options["maximo_mb"] is not None and mb > options["maximo_mb"]:
+            errores.append(f"RSS {mb:.1f} MB > {options['maximo_mb']:.1f} MB")
+        if errores:
+            raise CommandError("; ".join(errores))
+        self.stdout.write(self.style.SUCCESS("OK"))
@@ -0,0 +1,150 @@
+import multiprocessing
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from clientes.models import Cliente
+from productos.fracciones import consolidar, fraccionar
+from productos.models import Deposito, Producto, StockDeposito, StockInsuficiente
+from ventas.carrito import guardar_venta
+from ventas.models import Venta
+
+SKU = "MEDIR-CONTENCION"
+STOCK = 1_000_000
+PRECIO = Decimal("10.00")
+
+
+def _latencia(segundos):
+    # Simula la ida y vuelta a la base de un servidor en otra maquina
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(segundos)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def _vendedor(corrida, numero, producto_id, cliente_id, duracion, latencia, resultados):
+    # Proceso hijo: conexion propia y ventas de a una unidad hasta que se acaba el tiempo
+    connections.close_all()
+    producto = Producto.objects.get(pk=producto_id)
+    cliente = Cliente.objects.get(pk=cliente_id)
+    deposito = Deposito.get_principal()
+    ok = fallas = 0
+    error = None
+    with connection.execute_wrapper(_latencia(latencia)):
+        fin = time.perf_counter() + duracion
+        while time.perf_counter() < fin:
+            # Venta.codigo es de 20 caracteres
+            venta = Venta(codigo=f"MC-{corrida}-{numero}-{ok + fallas}", cliente=cliente, deposito=deposito)
+            try:
+                # El mismo guardado que VentaCreateView y VentaCarritoView
+                guardar_venta(venta, [(producto, 1, PRECIO, PRECIO)], "medir_contencion")
+                ok += 1
+            except StockInsuficiente:
+                fallas += 1
+            except Exception as e:
+                # Un deadlock o un corte de la conexion cuenta como falla y se sigue
+                fallas += 1
+                error = error or f"{type(e).__name__}: {e}"
+                connections.close_all()
+    resultados.put((ok, fallas, error))
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuantas ventas por segundo entran cuando N procesos venden a la vez "
+        "el mismo SKU, sin fraccionar y con las fracciones que se pidan. Crea "
+        "ventas de verdad (codigo MC-...): correrlo sobre una copia de la base, "
+        "en Postgres (SQLite no soporta escrituras concurrentes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=32)
+        parser.add_argument("--duracion", type=float, default=10, help="Segundos por medicion")
+        parser.add_argument(
+            "--fracciones", type=int, nargs="+", default=[0, 4, 8, 16],
+            help="Fracciones a medir (0 = sin fraccionar)",
+        )
+        parser.add_argument(
+            "--latencia-ms", type=float, default=0,
+            help="Demora agregada a cada consulta, como si la base estuviera en otra maquina",
+        )
+
+    def preparar(self, procesos):
+        producto, _ = Producto.objects.get_or_create(
+            sku=SKU,
+            defaults={"nombre": "Producto para medir contencion", "descripcion": "medir_contencion", "precio": PRECIO},
+        )
+        # Un cliente por proceso, como en una promocion: los agregados por
+        # cliente no se comparten y lo que se mide es la fila del producto
+        clientes = [
+            Cliente.objects.get_or_create(
+                numero_documento=f"MC-{i:05d}",
+                defaults={"nombre": "Medicion", "apellido": f"Contencion {i}", "email": "medir@example.com"},
+            )[0].pk
+            for i in range(procesos)
+        ]
+        return producto, clientes
+
+    def medir(self, producto, clientes, fracciones, options):
+        # Mismo punto de partida en cada medicion: stock de sobra en el principal
+        fraccionar(producto, 0)
+        deposito = Deposito.get_principal()
+        if not StockDeposito.objects.filter(deposito=deposito, producto=producto).update(cantidad=STOCK):
+            StockDeposito.objects.create(deposito=deposito, producto=producto, cantidad=STOCK)
+        Producto.objects.filter(pk=producto.pk).update(stock=STOCK)
+        fraccionar(producto, fracciones)
+        vendidas_antes = Venta.objects.filter(items__producto=producto).count()
+
+        # fork: los hijos heredan Django ya inicializado; sin conexiones abiertas
+        connections.close_all()
+        contexto = multiprocessing.get_context("fork")
+        corrida = int(time.time()) % 100000
+        resultados = contexto.Queue()
+        procesos = [
+            contexto.Process(
+                target=_vendedor,
+                args=(corrida, i, producto.pk, clientes[i], options["duracion"], options["latencia_ms"] / 1000, resultados),
+            )
+            for i in range(options["procesos"])
+        ]
+        inicio = time.perf_counter()
+        for proceso in procesos:
+            proceso.start()
+        totales = [resultados.get() for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+        segundos = time.perf_counter() - inicio
+
+        consolidar([producto.pk])
+        producto.refresh_from_db()
+        vendidas = Venta.objects.filter(items__producto=producto).count() - vendidas_antes
+        ok = sum(ok for ok, _, _ in totales)
+        fallas = sum(fallas for _, fallas, _ in totales)
+        error = next((error for _, _, error in totales if error), None)
+        return ok / segundos, ok, fallas, producto.stock == STOCK - vendidas, error
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            raise CommandError("Con SQLite las ventas concurrentes fallan por bloqueo de la base: usar Postgres")
+        if any(not 0 <= fracciones <= 64 for fracciones in options["fracciones"]):
+            raise CommandError("--fracciones tiene que estar entre 0 y 64")
+        producto, clientes = self.preparar(options["procesos"])
+
+        self.stdout.write(
+            f"{options['procesos']} procesos, {options['duracion']:.0f} s por medicion, "
+            f"latencia {options['latencia_ms']:.1f} ms por consulta"
+        )
+        self.stdout.write(f"{'fracciones':>10} {'ventas/s':>10} {'ok':>8} {'fallas':>7}  stock")
+        try:
+            for fracciones in options["fracciones"]:
+                por_segundo, ok, fallas, consistente, error = self.medir(producto, clientes, fracciones, options)
+                self.stdout.write(
+                    f"{fracciones:>10} {por_segundo:>10.1f} {ok:>8} {fallas:>7}  "
+                    f"{'ok' if consistente else 'NO COINCIDE'}"
+                )
+                if error:
+                    self.stderr.write(f"  primera falla: {error}")
+        finally:
+            fraccionar(producto, 0)
@@ -0,0 +1,138 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from productos.imagenes import LADO_MAXIMO, procesar
+from productos.models import Producto
+
+CARPETA = "productos"
+
+
+class Command(BaseCommand):
+    help = (
+        "Optimiza en paralelo las imagenes de productos (tamaño, metadatos, "
+        "compresion), junta las repetidas en un solo archivo y borra las que "
+        "ya no usa ningun producto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Procesos del pool (por defecto uno por CPU)",
+        )
+        parser.add_argument("--lado", type=int, default=LADO_MAXIMO, help="Lado maximo en px")
+        parser.add_argument(
+            "--antiguedad",
+            type=int,
+            default=24,
+            help="Horas que tiene que tener un archivo sin usar para borrarlo "
+                 "(para no llevarse una imagen recien subida)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informa cuanto se ahorraria, no cambia nada",
+        )
+
+    def handle(self, *args, **options):
+        escribir = not options["dry_run"]
+        referenciadas = set(
+            Producto.objects.exclude(imagen="").exclude(imagen__isnull=True)
+            .values_list("imagen", flat=True).distinct()
+        )
+        rutas = {}
+        for nombre in referenciadas:
+            if default_storage.exists(nombre):
+                rutas[default_storage.path(nombre)] = nombre
+            else:
+                self.stderr.write(f"Falta el archivo {nombre}")
+
+        resultados = self.optimizar(rutas, options["procesos"], options["lado"], escribir)
+        ahorro = sum(antes - despues for antes, despues, _ in resultados.values())
+        optimizadas = sum(1 for antes, despues, _ in resultados.values() if despues < antes)
+        duplicadas, ahorro_duplicadas = self.deduplicar(resultados, escribir)
+        huerfanas, ahorro_huerfanas = self.borrar_huerfanas(
+            referenciadas, options["antiguedad"] * 3600, escribir
+        )
+
+        total = ahorro + ahorro_duplicadas + ahorro_huerfanas
+        prefijo = "[dry-run] " if not escribir else ""
+        self.stdout.write(
+            f"{prefijo}{len(resultados)} imagenes revisadas, {optimizadas} optimizadas "
+            f"({filesizeformat(ahorro)})\n"
+            f"{prefijo}{duplicadas} repetidas unificadas ({filesizeformat(ahorro_duplicadas)})\n"
+            f"{prefijo}{huerfanas} sin usar borradas ({filesizeformat(ahorro_huerfanas)})\n"
+            f"{prefijo}Total ahorrado: {filesizeformat(total)}"
+        )
+
+    def optimizar(self, rutas, procesos, lado, escribir):
+        # Devuelve {nombre: (bytes antes, bytes despues, hash)}
+        tareas = [(ruta, lado, escribir) for ruta in sorted(rutas)]
+        resultados = {}
+        if procesos > 1:
+            # Los procesos hijos no usan la base; que no hereden la conexion abierta
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                salida = list(pool.map(procesar, tareas, chunksize=16))
+        else:
+            salida = map(procesar, tareas)
+        for ruta, resultado, error in salida:
+            if error:
+                self.stderr.write(f"No se pudo procesar {rutas[ruta]}: {error}")
+            else:
+                resultados[rutas[ruta]] = resultado
+        return resultados
+
+    def deduplicar(self, resultados, escribir):
+        # Mismo contenido, mismo archivo: los productos pasan a apuntar al
+        # primero (por nombre) y el resto se borra
+        por_hash = defaultdict(list)
+        for nombre, (_, _, hash_) in resultados.items():
+            por_hash[hash_].append(nombre)
+
+        cantidad = ahorro = 0
+        for nombres in por_hash.values():
+            if len(nombres) < 2:
+                continue
+            queda, *repetidas = sorted(nombres)
+            cantidad += len(repetidas)
+            ahorro += sum(resultados[nombre][1] for nombre in repetidas)
+            if not escribir:
+                continue
+            # Cambia la imagen del producto: version y fecha (cache y ETags)
+            Producto.objects.filter(imagen__in=repetidas).update(
+                imagen=queda,
+                version=F("version") + 1,
+                fecha_actualizacion=timezone.now(),
+            )
+            for nombre in repetidas:
+                default_storage.delete(nombre)
+        return cantidad, ahorro
+
+    def borrar_huerfanas(self, referenciadas, antiguedad, escribir):
+        if not default_storage.exists(CARPETA):
+            return 0, 0
+        limite = time.time() - antiguedad
+        cantidad = ahorro = 0
+        for archivo in default_storage.listdir(CARPETA)[1]:
+            nombre = f"{CARPETA}/{archivo}"
+            if nombre in referenciadas:
+                continue
+            ruta = default_storage.path(nombre)
+            if os.path.getmtime(ruta) > limite:
+                continue
+            cantidad += 1
+            ahorro += os.path.getsize(ruta)
+            if escribir:
+                default_storage.delete(nombre)
+        return cantidad, ahorro
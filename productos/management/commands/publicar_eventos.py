@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from productos.eventos import get_sinks, publicar, purgar
+
+
+class Command(BaseCommand):
+    help = "Manda los eventos pendientes del outbox a los sinks de settings.EVENTOS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Queda corriendo y publica por intervalo",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=settings.EVENTOS.get("INTERVALO", 5),
+            help="Segundos entre pasadas cuando se usa --loop",
+        )
+        parser.add_argument("--lote", type=int, default=settings.EVENTOS.get("LOTE", 500))
+
+    def handle(self, *args, **options):
+        sinks = get_sinks()
+        while True:
+            entregados = publicar(sinks, options["lote"])
+            # El resumen va a stderr para no mezclarse con StdoutSink
+            for sink, cantidad in entregados.items():
+                if cantidad:
+                    self.stderr.write(f"{sink}: {cantidad} evento(s)")
+            borrados = purgar()
+            if borrados:
+                self.stderr.write(f"Se borraron {borrados} evento(s) ya entregados")
+            # Si algun lote salio lleno quedan mas: se sigue sin esperar
+            if max(entregados.values(), default=0) >= options["lote"]:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from productos.fracciones import consolidar
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida el stock de los productos fraccionados: actualiza el stock por "
+        "deposito y el total del producto y vuelve a repartir las fracciones parejas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Queda corriendo y consolida cada --intervalo segundos",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=settings.STOCK_FRACCIONADO["INTERVALO"],
+            help="Segundos entre consolidaciones cuando se usa --loop",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            cambiados = consolidar()
+            if cambiados:
+                self.stdout.write(f"Stock actualizado en {cambiados} producto(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
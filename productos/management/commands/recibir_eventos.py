@@ -0,0 +1,45 @@
+import json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor de prueba para WebhookSink: muestra los eventos que le llegan. "
+        "Solo para desarrollo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--puerto", type=int, default=8765)
+        parser.add_argument(
+            "--fallar",
+            action="store_true",
+            help="Contesta 503 a todo, para ver que el offset no avanza",
+        )
+
+    def handle(self, *args, **options):
+        comando = self
+
+        class Receptor(BaseHTTPRequestHandler):
+            def do_POST(self):
+                largo = int(self.headers.get("Content-Length", 0))
+                eventos = json.loads(self.rfile.read(largo) or b"[]")
+                if options["fallar"]:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                for evento in eventos:
+                    comando.stdout.write(f"#{evento['id']} {evento['tipo']} {evento['clave']}")
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        servidor = HTTPServer(("127.0.0.1", options["puerto"]), Receptor)
+        self.stdout.write(f"Escuchando en http://127.0.0.1:{options['puerto']}/ (Ctrl+C para salir)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0003_alter_producto_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=200, verbose_name='Asunto')),
+                ('mensaje', models.TextField(verbose_name='Mensaje')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('leida', models.BooleanField(default=False, verbose_name='Leida')),
+            ],
+            options={
+                'verbose_name': 'Notificacion',
+                'verbose_name_plural': 'Notificaciones',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(verbose_name='Stock al cruzar')),
+                ('stock_minimo', models.IntegerField(verbose_name='Stock minimo')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('enviada', models.BooleanField(default=False, verbose_name='Enviada')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+                'ordering': ['fecha'],
+                'indexes': [models.Index(fields=['enviada', 'fecha'], name='productos_a_enviada_736ab6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_notificacion_alertastock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['fecha'], name='productos_m_fecha_4cdfe4_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_movimientostock_productos_m_fecha_4cdfe4_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStockArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('salida', 'Salida'), ('ajuste', 'Ajuste')], max_length=50, verbose_name='Tipo')),
+                ('cantidad', models.IntegerField()),
+                ('motivo', models.CharField(blank=True, max_length=200, null=True, verbose_name='Motivo')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha')),
+                ('usuario', models.CharField(max_length=50, verbose_name='Usuario')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_archivados', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock archivado',
+                'verbose_name_plural': 'Movimientos de Stock archivados',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='productos_m_fecha_c9ceb9_idx')],
+            },
+        ),
+    ]
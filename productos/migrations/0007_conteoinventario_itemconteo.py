@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_movimientostockarchivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('usuario', models.CharField(max_length=50, verbose_name='Usuario')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('estado', models.CharField(choices=[('abierto', 'Abierto'), ('aplicado', 'Aplicado')], default='abierto', max_length=20, verbose_name='Estado')),
+                ('fecha_aplicado', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de aplicacion')),
+                ('skus_desconocidos', models.TextField(blank=True, verbose_name='SKUs desconocidos')),
+            ],
+            options={
+                'verbose_name': 'Conteo de Inventario',
+                'verbose_name_plural': 'Conteos de Inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemConteo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad contada')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='productos.conteoinventario')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Item de Conteo',
+                'verbose_name_plural': 'Items de Conteo',
+                'constraints': [models.UniqueConstraint(fields=('conteo', 'producto'), name='productos_conteo_producto_unico')],
+            },
+        ),
+    ]
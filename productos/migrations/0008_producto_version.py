@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_conteoinventario_itemconteo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_producto_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deposito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('direccion', models.CharField(blank=True, max_length=200, verbose_name='Direccion')),
+                ('principal', models.BooleanField(default=False, verbose_name='Principal')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+            ],
+            options={
+                'verbose_name': 'Deposito',
+                'verbose_name_plural': 'Depositos',
+                'ordering': ['-principal', 'nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='conteoinventario',
+            name='deposito',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='conteos', to='productos.deposito'),
+        ),
+        migrations.AddField(
+            model_name='movimientostock',
+            name='deposito',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='productos.deposito'),
+        ),
+        migrations.AddField(
+            model_name='movimientostockarchivado',
+            name='deposito',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.deposito'),
+        ),
+        migrations.CreateModel(
+            name='StockDeposito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('deposito', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocks', to='productos.deposito')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Stock por Deposito',
+                'verbose_name_plural': 'Stock por Deposito',
+                'indexes': [models.Index(fields=['deposito', 'cantidad'], name='productos_s_deposit_28dc03_idx')],
+                'constraints': [models.UniqueConstraint(fields=('deposito', 'producto'), name='productos_stock_deposito_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef
+
+
+def crear_deposito_principal(apps, schema_editor):
+    # Todo el stock que habia pasa al deposito principal
+    Deposito = apps.get_model("productos", "Deposito")
+    StockDeposito = apps.get_model("productos", "StockDeposito")
+    Producto = apps.get_model("productos", "Producto")
+    MovimientoStock = apps.get_model("productos", "MovimientoStock")
+    ConteoInventario = apps.get_model("productos", "ConteoInventario")
+    db = schema_editor.connection.alias
+
+    principal, _ = Deposito.objects.using(db).get_or_create(nombre="Principal", defaults={"principal": True})
+    sin_stock = Producto.objects.using(db).filter(
+        ~Exists(StockDeposito.objects.using(db).filter(producto=OuterRef("pk")))
+    ).exclude(stock=0)
+    StockDeposito.objects.using(db).bulk_create(
+        (
+            StockDeposito(deposito=principal, producto_id=producto_id, cantidad=stock)
+            for producto_id, stock in sin_stock.values_list("id", "stock").iterator()
+        ),
+        batch_size=1000,
+    )
+    MovimientoStock.objects.using(db).filter(deposito__isnull=True).update(deposito=principal)
+    ConteoInventario.objects.using(db).filter(deposito__isnull=True).update(deposito=principal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_deposito_conteoinventario_deposito_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_deposito_principal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_deposito_principal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilOperacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(max_length=50, verbose_name='Operacion')),
+                ('ruta', models.CharField(max_length=200, verbose_name='Ruta')),
+                ('usuario', models.CharField(max_length=150, verbose_name='Usuario')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('status', models.PositiveSmallIntegerField(null=True, verbose_name='Status')),
+                ('duracion_ms', models.FloatField(verbose_name='Duracion (ms)')),
+                ('consultas', models.PositiveIntegerField(verbose_name='Consultas')),
+                ('tiempo_sql_ms', models.FloatField(verbose_name='Tiempo en SQL (ms)')),
+                ('estadisticas', models.TextField(verbose_name='Funciones')),
+                ('sql', models.JSONField(default=list, verbose_name='Consultas SQL')),
+                ('datos', models.BinaryField(verbose_name='Perfil cProfile')),
+            ],
+            options={
+                'verbose_name': 'Perfil de operacion',
+                'verbose_name_plural': 'Perfiles de operaciones',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_perfiloperacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fracciones',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='StockFraccion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField(verbose_name='Numero')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Cantidad')),
+                ('deposito', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.deposito')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fracciones_stock', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Fraccion de stock',
+                'verbose_name_plural': 'Fracciones de stock',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'deposito', 'numero'), name='productos_stock_fraccion_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:55
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0012_stockfraccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OffsetEventos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sink', models.CharField(max_length=200, unique=True, verbose_name='Sink')),
+                ('ultimo_id', models.BigIntegerField(default=0, verbose_name='Ultimo evento entregado')),
+                ('fecha', models.DateTimeField(null=True, verbose_name='Ultima entrega')),
+            ],
+            options={
+                'verbose_name': 'Offset de eventos',
+                'verbose_name_plural': 'Offsets de eventos',
+            },
+        ),
+        migrations.CreateModel(
+            name='Evento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=40, verbose_name='Tipo')),
+                ('clave', models.CharField(max_length=50, verbose_name='Clave')),
+                ('datos', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Datos')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Evento',
+                'verbose_name_plural': 'Eventos',
+                'indexes': [models.Index(fields=['fecha'], name='productos_e_fecha_122501_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0013_eventos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offseteventos',
+            name='huecos',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Ids faltantes'),
+        ),
+    ]
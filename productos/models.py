@@ -1,11 +1,18 @@
 from django.db import models
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
+import logging
 import os
+import random
 import uuid
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from PIL import Image
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+
 def validate_image_size(image):
     filesize = image.file.size
     megabyte_limit = 5.0
@@ -18,6 +25,14 @@ def get_image_path(instance, filename):
     return os.path.join("productos", filename)
 
 
+class ConflictoVersion(Exception):
+    """El producto cambio desde que se leyo el formulario."""
+
+
+class StockInsuficiente(Exception):
+    """No hay stock para descontar la cantidad pedida."""
+
+
 class Producto(models.Model):
     """Model definition for Producto."""
 
@@ -40,6 +55,13 @@ class Producto(models.Model):
     )
     fecha_creacion = models.DateTimeField("Fecha de creacion", auto_now_add=True)
     fecha_actualizacion = models.DateTimeField("Fecha de actualizacion", auto_now=True)
+    # Numero de version de la fila: cada escritura lo incrementa. Los formularios
+    # lo mandan oculto y se guarda con compare-and-swap (ver guardar_cambios)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Productos con muchas ventas simultaneas: el stock de cada deposito se
+    # reparte en esta cantidad de filas StockFraccion (0 = sin fraccionar,
+    # ver productos.fracciones)
+    fracciones = models.PositiveSmallIntegerField(default=0, editable=False)
 
     
 
@@ -55,27 +77,294 @@ class Producto(models.Model):
                 """Unicode representation of Producto."""
                 return self.nombre
 
+    @property
+    def atraso_stock(self):
+        # Segundos que pueden ir atrasados stock y stock por deposito: los de
+        # un producto fraccionado los pone al dia rebalancear_stock
+        return settings.STOCK_FRACCIONADO["INTERVALO"] if self.fracciones else 0
+
     def save(self, *args, **kwargs):
-                super().save(*args, **kwargs)
+                from . import eventos
+
+                agregando = self._state.adding
+                update_fields = kwargs.get("update_fields")
+                # Solo se optimiza un archivo recien subido (el storage todavia no lo
+                # guardo), no la misma imagen cada vez que se edita el producto
+                imagen_nueva = self._imagen_nueva()
+                if self.pk and update_fields is None:
+                    self.version += 1
+                # El evento va en la misma transaccion que el cambio (outbox)
+                with transaction.atomic(using=kwargs.get("using") or router.db_for_write(Producto, instance=self)):
+                    super().save(*args, **kwargs)
+                    # El stock inicial de un producto nuevo entra al deposito principal
+                    if agregando and self.stock:
+                        StockDeposito.objects.using(self._state.db).create(
+                            deposito=Deposito.get_principal(using=self._state.db),
+                            producto=self,
+                            cantidad=self.stock,
+                        )
+                    campos = [campo for campo in eventos.CAMPOS_PRODUCTO if update_fields is None or campo in update_fields]
+                    if campos:
+                        eventos.producto_guardado(self, creado=agregando, campos=campos)
+                if imagen_nueva:
+                    self.achicar_imagen()
+                # El indice de SKU de este proceso refresca en la proxima busqueda
+                from .indice_sku import indice
+                transaction.on_commit(indice.vencer, using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+                from . import eventos
+                from .indice_sku import indice
+
+                pk = self.pk
+                with transaction.atomic(using=kwargs.get("using") or router.db_for_write(Producto, instance=self)):
+                    resultado = super().delete(*args, **kwargs)
+                    eventos.producto_borrado(pk, self.sku)
+                transaction.on_commit(lambda: indice.quitar(pk), using=self._state.db)
+                return resultado
 
+    def _imagen_nueva(self):
+                return bool(self.imagen) and not self.imagen._committed
+
+    def achicar_imagen(self):
+                # Misma optimizacion que el comando optimizar_imagenes.
+                # Pillow se importa aca, solo cuando se sube una imagen
+                from .imagenes import optimizar
 
                 if self.imagen:
                     try:
-                        img = Image.open(self.imagen.path)
-                        if img.height > 300 or img.width > 300:
-                            output_size = (300, 300)
-                            img.thumbnail(output_size)
-                            img.save(self.imagen.path)
-                    except Exception as e:
-                        print(f"Error al procesar la imagen {e}")
-        
-      
+                        optimizar(self.imagen.path)
+                    except Exception:
+                        logger.exception("Error al procesar la imagen %s", self.imagen.name)
+
+    def guardar_cambios(self, version, campos):
+        """Guarda solo ``campos`` si la fila sigue en ``version`` (compare-and-swap).
+
+        Es un UPDATE ... WHERE id = %s AND version = %s, sin bloquear la fila.
+        Si entre medio otra venta, movimiento o edicion la modifico no se
+        actualiza nada y se levanta ``ConflictoVersion``.
+        """
+        from . import eventos
+
+        imagen_nueva = "imagen" in campos and self._imagen_nueva()
+        valores = {}
+        for nombre in campos:
+            campo = self._meta.get_field(nombre)
+            # pre_save sube a storage la imagen nueva, igual que en save()
+            valores[campo.attname] = campo.pre_save(self, add=False)
+        ahora = timezone.now()
+        with transaction.atomic():
+            filas = Producto.objects.filter(pk=self.pk, version=version).update(
+                **valores,
+                version=F("version") + 1,
+                fecha_actualizacion=ahora,
+            )
+            if not filas:
+                raise ConflictoVersion(self)
+            self.version = version + 1
+            self.fecha_actualizacion = ahora
+            eventos.producto_guardado(self, campos=[*campos, "version"])
+        if imagen_nueva:
+            self.achicar_imagen()
+
+    def mover_stock(self, cantidad, deposito=None, version=None):
+        """Suma (o resta, con ``cantidad`` negativa) stock en un deposito.
+
+        Son dos UPDATE atomicos (stock = stock +/- cantidad), uno en el
+        deposito y otro en el total de ``Producto.stock``; no pisan lo que
+        hagan otras ventas al mismo tiempo y no dejan el deposito en
+        negativo: si no alcanza levanta ``StockInsuficiente``. Con
+        ``version`` el total se actualiza con compare-and-swap y si la fila
+        cambio se levanta ``ConflictoVersion``. Sin ``deposito`` se usa el
+        principal. Devuelve el stock total que habia antes, para las alertas.
+        """
+        deposito = deposito or Deposito.get_principal()
+        if self.fracciones:
+            return self._mover_fraccionado(cantidad, deposito, version)
+        try:
+            with transaction.atomic():
+                # Siempre primero la fila del deposito y despues la del producto,
+                # en el mismo orden que las transferencias, para no cruzar bloqueos
+                self.mover_en_deposito(deposito, cantidad)
+                filas = Producto.objects.filter(pk=self.pk, fracciones=0)
+                if version is not None:
+                    filas = filas.filter(version=version)
+                if not filas.update(
+                    stock=F("stock") + cantidad,
+                    version=F("version") + 1,
+                    fecha_actualizacion=timezone.now(),
+                ):
+                    raise ConflictoVersion(self)
+        except ConflictoVersion:
+            # Puede ser que lo hayan fraccionado despues de leer esta instancia
+            self.refresh_from_db(fields=["fracciones"])
+            if not self.fracciones:
+                raise
+            return self._mover_fraccionado(cantidad, deposito, version)
+        self.refresh_from_db(fields=["stock", "version", "fecha_actualizacion"])
+        return self.stock - cantidad
+
+    def _mover_fraccionado(self, cantidad, deposito, version):
+        # Solo se toca una fraccion: ni la fila del deposito ni la del producto,
+        # que es donde se encolaban todas las ventas. Los totales (y las
+        # alertas) los pone al dia productos.fracciones.consolidar
+        with transaction.atomic():
+            self.mover_en_fracciones(deposito, cantidad)
+            if version is not None and not Producto.objects.filter(pk=self.pk, version=version).update(
+                version=F("version") + 1,
+                fecha_actualizacion=timezone.now(),
+            ):
+                raise ConflictoVersion(self)
+        return self.stock
+
+    def mover_en_deposito(self, deposito, cantidad):
+        # Solo la fila del deposito; el total lo actualiza quien llama
+        if self.fracciones:
+            return self.mover_en_fracciones(deposito, cantidad)
+        filas = StockDeposito.objects.filter(deposito=deposito, producto=self)
+        if cantidad < 0:
+            filas = filas.filter(cantidad__gte=-cantidad)
+        if filas.update(cantidad=F("cantidad") + cantidad):
+            return
+        if cantidad < 0:
+            raise StockInsuficiente(self)
+        # Primera entrada del producto en este deposito
+        StockDeposito.objects.get_or_create(deposito=deposito, producto=self)
+        StockDeposito.objects.filter(deposito=deposito, producto=self).update(
+            cantidad=F("cantidad") + cantidad
+        )
+
+    def mover_en_fracciones(self, deposito, cantidad):
+        fracciones = StockFraccion.objects.filter(deposito=deposito, producto=self)
+        if cantidad >= 0:
+            # Las entradas van a cualquier fraccion, el rebalanceo las empareja
+            if fracciones.filter(numero=random.randrange(self.fracciones)).update(cantidad=F("cantidad") + cantidad):
+                return
+            # Primera entrada del producto en este deposito
+            StockFraccion.objects.bulk_create(
+                [StockFraccion(deposito=deposito, producto=self, numero=n) for n in range(self.fracciones)],
+                ignore_conflicts=True,
+            )
+            fracciones.filter(numero=0).update(cantidad=F("cantidad") + cantidad)
+            return
+
+        pedido = -cantidad
+        # Una fraccion que alcance y que no tenga tomada otra venta (SKIP LOCKED):
+        # con N fracciones hasta N ventas del mismo producto pasan a la vez
+        libre = (
+            fracciones.select_for_update(skip_locked=True)
+            .filter(cantidad__gte=pedido)
+            .order_by("?")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if libre and StockFraccion.objects.filter(pk=libre, cantidad__gte=pedido).update(
+            cantidad=F("cantidad") - pedido
+        ):
+            return
+        # Estan todas ocupadas: se espera solo a la venta que tiene una de ellas
+        if libre is None and fracciones.filter(
+            numero=random.randrange(self.fracciones), cantidad__gte=pedido
+        ).update(cantidad=F("cantidad") - pedido):
+            return
+
+        # Ninguna alcanza sola: se esperan todas (siempre en el mismo orden) y
+        # se descuenta de varias
+        filas = list(fracciones.select_for_update().order_by("numero").values_list("pk", "cantidad"))
+        if sum(disponible for _, disponible in filas) < pedido:
+            raise StockInsuficiente(self)
+        for pk, disponible in sorted(filas, key=lambda fila: -fila[1]):
+            tomar = min(disponible, pedido)
+            StockFraccion.objects.filter(pk=pk).update(cantidad=F("cantidad") - tomar)
+            pedido -= tomar
+            if not pedido:
+                break
+
+    def stock_en(self, deposito):
+        if self.fracciones:
+            return StockFraccion.objects.filter(deposito=deposito, producto=self).aggregate(
+                total=models.Sum("cantidad")
+            )["total"] or 0
+        return (
+            StockDeposito.objects.filter(deposito=deposito, producto=self)
+            .values_list("cantidad", flat=True)
+            .first()
+        ) or 0
 
     @property
     def necesita_repocision (self):
            return self.stock < self.stock_minimo
     
 
+class Deposito(models.Model):
+    """Deposito o sucursal con stock propio."""
+
+    nombre = models.CharField("Nombre", max_length=100, unique=True)
+    direccion = models.CharField("Direccion", max_length=200, blank=True)
+    principal = models.BooleanField("Principal", default=False)
+    activo = models.BooleanField("Activo", default=True)
+
+    class Meta:
+        verbose_name = 'Deposito'
+        verbose_name_plural = 'Depositos'
+        ordering = ["-principal", "nombre"]
+
+    def __str__(self):
+        return self.nombre
+
+    @classmethod
+    def get_principal(cls, using=None):
+        # El que se usa cuando no se elige deposito (la migracion crea uno)
+        depositos = cls.objects.db_manager(using)
+        return depositos.filter(principal=True).first() or depositos.order_by("pk").first()
+
+
+class StockDeposito(models.Model):
+    """Stock de un producto en un deposito. ``Producto.stock`` es la suma de estas filas."""
+
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="stocks")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="stocks")
+    cantidad = models.IntegerField("Cantidad", default=0)
+
+    class Meta:
+        verbose_name = 'Stock por Deposito'
+        verbose_name_plural = 'Stock por Deposito'
+        constraints = [
+            models.UniqueConstraint(fields=["deposito", "producto"], name="productos_stock_deposito_unico"),
+        ]
+        # Stock bajo por deposito: se recorre solo el deposito pedido
+        indexes = [models.Index(fields=["deposito", "cantidad"])]
+
+    def __str__(self):
+        return f"{self.producto} en {self.deposito}: {self.cantidad}"
+
+
+class StockFraccion(models.Model):
+    """Parte del stock de un producto fraccionado en un deposito.
+
+    Para esos productos el stock real del deposito es la suma de sus
+    fracciones; ``StockDeposito`` y ``Producto.stock`` se actualizan al
+    consolidar (ver ``productos.fracciones``).
+    """
+
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="+")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="fracciones_stock")
+    numero = models.PositiveSmallIntegerField("Numero")
+    cantidad = models.IntegerField("Cantidad", default=0)
+
+    class Meta:
+        verbose_name = 'Fraccion de stock'
+        verbose_name_plural = 'Fracciones de stock'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["producto", "deposito", "numero"], name="productos_stock_fraccion_unica"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto} en {self.deposito} #{self.numero}: {self.cantidad}"
+
+
 class MovimientoStock(models.Model):
     """Model definition for MODELNAME."""
     TIPO_CHOICES = [
@@ -89,6 +378,12 @@ class MovimientoStock(models.Model):
         on_delete=models.CASCADE,
         related_name='movimientos'
     )
+    deposito = models.ForeignKey(
+        Deposito,
+        on_delete=models.PROTECT,
+        related_name='movimientos',
+        null=True,
+    )
     
     tipo = models.CharField("Tipo", max_length=50, choices=TIPO_CHOICES)
     cantidad = models.IntegerField()
@@ -102,9 +397,182 @@ class MovimientoStock(models.Model):
         verbose_name = 'Movimiento de Stock'
         verbose_name_plural = 'Movimientos de Stock'
         ordering = ["-fecha"]
+        indexes = [models.Index(fields=["fecha"])]
 
     def __str__(self):
         """Unicode representation of MovimientoStock."""
         return f"{self.producto.nombre} - {self.tipo} - {self.cantidad}"
 
-          
+
+class ConteoInventario(models.Model):
+    """Sesion de conteo fisico: se cargan las cantidades contadas y se aplican juntas."""
+    ESTADO_CHOICES = [
+        ("abierto", "Abierto"),
+        ("aplicado", "Aplicado"),
+    ]
+
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+    usuario = models.CharField("Usuario", max_length=50)
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="conteos", null=True)
+    motivo = models.CharField("Motivo", max_length=200, blank=True)
+    estado = models.CharField("Estado", max_length=20, choices=ESTADO_CHOICES, default="abierto")
+    fecha_aplicado = models.DateTimeField("Fecha de aplicacion", null=True, blank=True)
+    skus_desconocidos = models.TextField("SKUs desconocidos", blank=True)
+
+    class Meta:
+        verbose_name = 'Conteo de Inventario'
+        verbose_name_plural = 'Conteos de Inventario'
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        return f"Conteo #{self.pk} ({self.get_estado_display()})"
+
+
+class ItemConteo(models.Model):
+    conteo = models.ForeignKey(ConteoInventario, on_delete=models.CASCADE, related_name="items")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    cantidad = models.IntegerField("Cantidad contada")
+
+    class Meta:
+        verbose_name = 'Item de Conteo'
+        verbose_name_plural = 'Items de Conteo'
+        constraints = [
+            models.UniqueConstraint(fields=["conteo", "producto"], name="productos_conteo_producto_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.cantidad}"
+
+
+class AlertaStock(models.Model):
+    """Cruce del umbral de stock minimo pendiente de notificar."""
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="alertas"
+    )
+    stock = models.IntegerField("Stock al cruzar")
+    stock_minimo = models.IntegerField("Stock minimo")
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+    enviada = models.BooleanField("Enviada", default=False)
+
+    class Meta:
+        verbose_name = 'Alerta de Stock'
+        verbose_name_plural = 'Alertas de Stock'
+        ordering = ["fecha"]
+        indexes = [models.Index(fields=["enviada", "fecha"])]
+
+    def __str__(self):
+        return f"{self.producto.nombre} - stock {self.stock} (min {self.stock_minimo})"
+
+
+class Notificacion(models.Model):
+    """Bandeja de entrada en la BD para los resumenes de alertas."""
+
+    asunto = models.CharField("Asunto", max_length=200)
+    mensaje = models.TextField("Mensaje")
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+    leida = models.BooleanField("Leida", default=False)
+
+    class Meta:
+        verbose_name = 'Notificacion'
+        verbose_name_plural = 'Notificaciones'
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        return self.asunto
+
+
+class MovimientoStockArchivado(models.Model):
+    """Movimiento de un periodo cerrado, movido por el comando archivar_historial."""
+
+    id = models.BigIntegerField(primary_key=True)
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='movimientos_archivados'
+    )
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="+", null=True)
+    tipo = models.CharField("Tipo", max_length=50, choices=MovimientoStock.TIPO_CHOICES)
+    cantidad = models.IntegerField()
+    motivo = models.CharField("Motivo", max_length=200, blank=True, null=True)
+    fecha = models.DateTimeField("Fecha")
+    usuario = models.CharField("Usuario", max_length=50)
+
+    class Meta:
+        verbose_name = 'Movimiento de Stock archivado'
+        verbose_name_plural = 'Movimientos de Stock archivados'
+        ordering = ["-fecha"]
+        indexes = [models.Index(fields=["fecha"])]
+
+    def __str__(self):
+        return f"{self.producto.nombre} - {self.tipo} - {self.cantidad} (archivado)"
+
+
+class PerfilOperacion(models.Model):
+    """Perfil (cProfile + consultas SQL) de una venta o movimiento de stock.
+
+    Se guardan solo cuando se piden (ver ``productos.perfilado``) y se
+    conservan los ultimos ``PERFILADO["GUARDAR"]``.
+    """
+
+    operacion = models.CharField("Operacion", max_length=50)
+    ruta = models.CharField("Ruta", max_length=200)
+    usuario = models.CharField("Usuario", max_length=150)
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+    status = models.PositiveSmallIntegerField("Status", null=True)
+    duracion_ms = models.FloatField("Duracion (ms)")
+    consultas = models.PositiveIntegerField("Consultas")
+    tiempo_sql_ms = models.FloatField("Tiempo en SQL (ms)")
+    estadisticas = models.TextField("Funciones")
+    sql = models.JSONField("Consultas SQL", default=list)
+    # Salida cruda de cProfile (pstats), para abrirla con snakeviz o similar
+    datos = models.BinaryField("Perfil cProfile")
+
+    class Meta:
+        verbose_name = 'Perfil de operacion'
+        verbose_name_plural = 'Perfiles de operaciones'
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        return f"{self.operacion} - {self.usuario} - {self.duracion_ms:.0f} ms"
+
+
+class Evento(models.Model):
+    """Cambio de stock, producto o venta para otros sistemas (outbox).
+
+    Se inserta en la misma transaccion que el cambio y ``publicar_eventos``
+    lo manda a los sinks en orden de id (ver ``productos.eventos``).
+    """
+
+    tipo = models.CharField("Tipo", max_length=40)
+    # Id de lo que cambio (producto, venta...): los consumidores pueden particionar por aca
+    clave = models.CharField("Clave", max_length=50)
+    datos = models.JSONField("Datos", encoder=DjangoJSONEncoder)
+    fecha = models.DateTimeField("Fecha", default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Evento'
+        verbose_name_plural = 'Eventos'
+        indexes = [models.Index(fields=["fecha"])]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} {self.clave}"
+
+
+class OffsetEventos(models.Model):
+    """Hasta que evento le entrego ``publicar_eventos`` a cada sink."""
+
+    sink = models.CharField("Sink", max_length=200, unique=True)
+    ultimo_id = models.BigIntegerField("Ultimo evento entregado", default=0)
+    fecha = models.DateTimeField("Ultima entrega", null=True)
+    # {"desde-hasta": cuando se vio el hueco por primera vez}, ver eventos._entregables
+    huecos = models.JSONField("Ids faltantes", default=dict, blank=True)
+
+    class Meta:
+        verbose_name = 'Offset de eventos'
+        verbose_name_plural = 'Offsets de eventos'
+
+    def __str__(self):
+        return f"{self.sink}: {self.ultimo_id}"
@@ -0,0 +1,178 @@
+"""
+Perfilado a pedido de las operaciones calientes (venta, movimiento, ajuste).
+
+Los metodos marcados con ``@perfilar("nombre")`` corren con cProfile y un
+``execute_wrapper`` que anota cada consulta SQL (cuando empezo, cuanto
+tardo, el SQL) solo si el request lo pide:
+
+- usuarios del grupo ``PERFILADO["GRUPO"]``, siempre;
+- usuarios staff que mandan el header ``PERFILADO["HEADER"]`` (``X-Perfilar: 1``).
+
+El resultado se guarda como ``PerfilOperacion`` (se ve en el admin) y la
+respuesta lleva el id en ``X-Perfil``. Para el resto de los requests el
+costo es mirar el header y buscar el usuario en los miembros del grupo, que
+se leen una vez cada ``PERFILADO["CACHE"]`` segundos por proceso (no es una
+consulta por request).
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+
+from .models import PerfilOperacion
+
+logger = logging.getLogger(__name__)
+
+FUNCIONES = 40
+CLAVE_CACHE = "perfilado:miembros"
+
+
+def config(clave, defecto=None):
+    return getattr(settings, "PERFILADO", {}).get(clave, defecto)
+
+
+def miembros_del_grupo():
+    """Ids de los usuarios del grupo de perfilado, desde el cache."""
+    grupo = config("GRUPO")
+    if not grupo:
+        return frozenset()
+    return cache.get_or_set(
+        CLAVE_CACHE,
+        lambda: frozenset(User.objects.filter(groups__name=grupo).values_list("pk", flat=True)),
+        config("CACHE", 30),
+    )
+
+
+def debe_perfilar(request):
+    # Se guarda en el request: la decision se toma una sola vez por pedido
+    if not hasattr(request, "_perfilar"):
+        user = request.user
+        header = config("HEADER", "X-Perfilar")
+        request._perfilar = user.is_authenticated and (
+            (user.is_staff and request.headers.get(header) == "1")
+            or user.pk in miembros_del_grupo()
+        )
+    return request._perfilar
+
+
+class Perfilador:
+    """cProfile + linea de tiempo de las consultas de todas las bases."""
+
+    def __init__(self, maximo_sql=500):
+        self.maximo_sql = maximo_sql
+        self.profile = cProfile.Profile()
+        self.consultas = []
+        self.cantidad = 0
+        self.tiempo_sql = 0.0
+
+    def _anotar(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.cantidad += 1
+            self.tiempo_sql += duracion
+            # Se cuentan todas, pero el detalle se guarda hasta maximo_sql
+            if len(self.consultas) < self.maximo_sql:
+                self.consultas.append({
+                    "inicio_ms": round((inicio - self.inicio) * 1000, 2),
+                    "duracion_ms": round(duracion * 1000, 2),
+                    "base": context["connection"].alias,
+                    "sql": sql if not many else f"{sql} (x{len(params)})",
+                })
+
+    def __enter__(self):
+        self.pila = ExitStack()
+        for conexion in connections.all():
+            self.pila.enter_context(conexion.execute_wrapper(self._anotar))
+        self.inicio = time.perf_counter()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Ya hay otro profiler activo (Python 3.12+): queda solo el SQL
+            self.profile = None
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile:
+            self.profile.disable()
+        self.duracion = time.perf_counter() - self.inicio
+        self.pila.close()
+
+    def estadisticas(self):
+        if not self.profile:
+            return ""
+        salida = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=salida)
+        stats.sort_stats("cumulative").print_stats(FUNCIONES)
+        return salida.getvalue()
+
+    def datos(self):
+        # Mismo formato que Profile.dump_stats()
+        if not self.profile:
+            return b""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+def guardar(perfilador, operacion, request, status):
+    perfil = PerfilOperacion.objects.create(
+        operacion=operacion,
+        ruta=request.get_full_path()[:200],
+        usuario=request.user.get_username(),
+        status=status,
+        duracion_ms=perfilador.duracion * 1000,
+        consultas=perfilador.cantidad,
+        tiempo_sql_ms=perfilador.tiempo_sql * 1000,
+        estadisticas=perfilador.estadisticas(),
+        sql=perfilador.consultas,
+        datos=perfilador.datos(),
+    )
+    # Se quedan los ultimos N, el resto se borra
+    n = config("GUARDAR", 50)
+    corte = list(PerfilOperacion.objects.order_by("-id").values_list("id", flat=True)[n:n + 1])
+    if corte:
+        PerfilOperacion.objects.filter(id__lte=corte[0]).delete()
+    return perfil
+
+
+def perfilar(operacion):
+    """Decorador para ``post`` de las vistas: cubre la validacion del form y el guardado."""
+
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(vista, *args, **kwargs):
+            request = vista.request
+            if not debe_perfilar(request):
+                return metodo(vista, *args, **kwargs)
+
+            perfilador = Perfilador(config("SQL_MAXIMO", 500))
+            response = None
+            try:
+                with perfilador:
+                    response = metodo(vista, *args, **kwargs)
+            finally:
+                # Se guarda aunque la operacion falle (status None), fuera de
+                # la transaccion de la vista
+                try:
+                    perfil = guardar(perfilador, operacion, request, getattr(response, "status_code", None))
+                except Exception:
+                    logger.exception("No se pudo guardar el perfil de %s", operacion)
+                    perfil = None
+            if perfil is not None:
+                response["X-Perfil"] = str(perfil.pk)
+            return response
+
+        return envoltura
+
+    return decorador
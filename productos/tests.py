@@ -1,3 +1,105 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .eventos import publicar
+from .models import ConflictoVersion, Evento, OffsetEventos, Producto
+
+
+class GuardarCambiosTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre="Tornillo", descripcion="Tornillo", sku="TOR-1",
+            precio=Decimal("10.00"), stock=10,
+        )
+
+    def test_guarda_los_campos_y_sube_la_version(self):
+        version = self.producto.version
+        self.producto.nombre = "Tornillo largo"
+        self.producto.guardar_cambios(version, ["nombre"])
+        self.assertEqual(self.producto.version, version + 1)
+        guardado = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((guardado.nombre, guardado.version), ("Tornillo largo", version + 1))
+
+    def test_solo_los_campos_pedidos(self):
+        self.producto.nombre = "Otro nombre"
+        self.producto.precio = Decimal("99.00")
+        self.producto.guardar_cambios(self.producto.version, ["precio"])
+        guardado = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((guardado.nombre, guardado.precio), ("Tornillo", Decimal("99.00")))
+
+    def test_conflicto_con_otra_edicion(self):
+        # Dos formularios abiertos con la misma version: gana el primero
+        primero = Producto.objects.get(pk=self.producto.pk)
+        segundo = Producto.objects.get(pk=self.producto.pk)
+        primero.precio = Decimal("12.00")
+        primero.guardar_cambios(primero.version, ["precio"])
+        segundo.precio = Decimal("15.00")
+        with self.assertRaises(ConflictoVersion):
+            segundo.guardar_cambios(segundo.version, ["precio"])
+        guardado = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((guardado.precio, guardado.version), (Decimal("12.00"), primero.version))
+
+    def test_conflicto_con_un_movimiento_de_stock(self):
+        version = self.producto.version
+        self.producto.mover_stock(-3)
+        self.producto.nombre = "Tornillo viejo"
+        with self.assertRaises(ConflictoVersion):
+            self.producto.guardar_cambios(version, ["nombre"])
+        guardado = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((guardado.nombre, guardado.stock), ("Tornillo", 7))
+
+
+class Coleccion:
+    def __init__(self):
+        self.ids = []
+
+    def publicar(self, eventos):
+        self.ids.extend(evento.pk for evento in eventos)
+
+
+class PublicarEventosTests(TestCase):
+    def crear(self, *ids):
+        for pk in ids:
+            Evento.objects.create(pk=pk, tipo="prueba", clave=str(pk), datos={})
+
+    def test_sink_nuevo_con_eventos_purgados(self):
+        # Los primeros 100000 ya se purgaron
+        self.crear(100001, 100002, 100003)
+        sink = Coleccion()
+        publicar({"nuevo": sink})
+        self.assertEqual(sink.ids, [100001, 100002, 100003])
+        offset = OffsetEventos.objects.get(sink="nuevo")
+        self.assertEqual((offset.ultimo_id, offset.huecos), (100003, {}))
+
+    def test_hueco_grande_es_un_rango(self):
+        self.crear(1, 500000)
+        sink = Coleccion()
+        publicar({"sink": sink})
+        offset = OffsetEventos.objects.get(sink="sink")
+        # Se frena en el hueco mientras no pase ESPERA_HUECO
+        self.assertEqual(sink.ids, [1])
+        self.assertEqual(list(offset.huecos), ["2-499999"])
+
+        with override_settings(EVENTOS={**settings.EVENTOS, "ESPERA_HUECO": 0}):
+            publicar({"sink": sink})
+            self.assertEqual(sink.ids, [1, 500000])
+            # Un commit tardio en el medio del rango llega fuera de orden
+            self.crear(1234)
+            publicar({"sink": sink})
+        self.assertEqual(sink.ids, [1, 500000, 1234])
+        offset.refresh_from_db()
+        self.assertEqual((offset.ultimo_id, sorted(offset.huecos)), (500000, ["1235-499999", "2-1233"]))
+
+    def test_hueco_viejo_se_olvida(self):
+        self.crear(1, 3)
+        sink = Coleccion()
+        with override_settings(EVENTOS={**settings.EVENTOS, "ESPERA_HUECO": 0}):
+            publicar({"sink": sink})
+            publicar({"sink": sink})
+        self.assertEqual(sink.ids, [1, 3])
+        self.assertEqual(list(OffsetEventos.objects.get(sink="sink").huecos), ["2-2"])
+        with override_settings(EVENTOS={**settings.EVENTOS, "OLVIDAR_HUECO": 0}):
+            publicar({"sink": sink})
+        self.assertEqual(OffsetEventos.objects.get(sink="sink").huecos, {})
@@ -6,10 +6,16 @@ app_name = 'productos'
 urlpatterns = [
     path('', views.ProductoListView.as_view(), name='producto_list'),
     path('nuevo/', views.ProductoCreateView.as_view(), name='producto_create'),
+    path('autocompletar/', views.ProductoAutocompletarView.as_view(), name='producto_autocompletar'),
+    path('escanear/', views.ProductoEscanearView.as_view(), name='producto_escanear'),
     path('<int:pk>/', views.ProductoDetailView.as_view(), name='producto_detail'),
     path('<int:pk>/editar/', views.ProductoUpdateView.as_view(), name='producto_update'),
     path('<int:pk>/eliminar/', views.ProductoDeleteView.as_view(), name='producto_delete'),
     path('<int:pk>/movimiento/', views.MovimientoStockCreateView.as_view(), name='movimiento_create'),
     path('<int:pk>/ajustar-stock/', views.AjusteStockView.as_view(), name='ajustar_stock'),
+    path('<int:pk>/transferir/', views.TransferenciaStockView.as_view(), name='transferir_stock'),
     path('stock-bajo/', views.StockBajoListView.as_view(), name='stock_bajo_list'),
+    path('conteos/nuevo/', views.ConteoCreateView.as_view(), name='conteo_create'),
+    path('conteos/<int:pk>/', views.ConteoDetailView.as_view(), name='conteo_detail'),
+    path('conteos/<int:pk>/aplicar/', views.ConteoAplicarView.as_view(), name='conteo_aplicar'),
 ]
\ No newline at end of file
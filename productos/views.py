@@ -1,14 +1,27 @@
 from django.shortcuts import render
+from django.core.paginator import Paginator
+from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, FormView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
-from django.db.models import Q, F
+from django.db.models import Q, F, Max, Count
+from django.db import transaction
 from django.utils import timezone
-from .models import Producto, MovimientoStock
-from .forms import ProductoForm, MovimientoStockForm, AjusteStockForm
+from .models import Producto, MovimientoStock, ConteoInventario, ConflictoVersion, StockInsuficiente, Deposito
+from .forms import ProductoForm, MovimientoStockForm, AjusteStockForm, ConteoInventarioForm, TransferenciaStockForm
+from .alertas import registrar_cambio_stock
+from .perfilado import perfilar
+from .indice_sku import indice as indice_sku
+from . import conteo as conteo_inventario
+from . import depositos
+from . import eventos
+from auditoria import registro as auditoria
+import io
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models.deletion import ProtectedError
+from django.http import JsonResponse
+from inventario.mixins import AutocompletarMixin, CondicionalMixin, LecturaReplicaMixin, PermisoAsyncMixin
 
 
 class StockPermissionMixin(UserPassesTestMixin):
@@ -35,7 +48,7 @@ class StockPermissionMixin(UserPassesTestMixin):
 
 
 
-class ProductoListView(LoginRequiredMixin, StockPermissionMixin,ListView):
+class ProductoListView(LoginRequiredMixin, StockPermissionMixin, LecturaReplicaMixin, CondicionalMixin, ListView):
     model = Producto
     template_name = "productos/producto_list.html"
     context_object_name = "productos"
@@ -63,15 +76,67 @@ class ProductoListView(LoginRequiredMixin, StockPermissionMixin,ListView):
         context['q'] = self.request.GET.get('q', '')
         return context
 
-class ProductoDetailView(LoginRequiredMixin, StockPermissionMixin,DetailView):
+    def get_etag_partes(self, request, *args, **kwargs):
+        # con la ultima modificacion y la cantidad alcanza para notar altas, cambios y bajas
+        resumen = self.get_queryset().aggregate(
+            ultima=Max("fecha_actualizacion"), cantidad=Count("id")
+        )
+        return [resumen["ultima"], resumen["cantidad"]]
+
+class ProductoAutocompletarView(AutocompletarMixin, LecturaReplicaMixin, View):
+    # La usa tambien el form de ventas, por eso entra el grupo ventas
+    grupos = ("stock", "ventas", "administradores")
+    campos = ("id", "sku", "nombre", "precio", "stock")
+
+    def get_queryset(self, q):
+        return Producto.objects.filter(Q(nombre__icontains=q) | Q(sku__istartswith=q)).order_by("nombre")
+
+
+class ProductoEscanearView(PermisoAsyncMixin, View):
+    """
+    Busqueda exacta por SKU para los lectores de codigo de barras.
+
+    ``?sku=...`` devuelve id, nombre, precio y stock desde el indice en memoria
+    del proceso (productos.indice_sku), sin consultar el producto ni renderizar
+    el detalle. 404 si no hay un producto con ese SKU.
+    """
+    grupos = ("stock", "ventas", "administradores")
+
+    async def get(self, request):
+        sku = request.GET.get("sku", "").strip()
+        producto = await indice_sku.abuscar(sku) if sku else None
+        if producto is None:
+            return JsonResponse({"error": "No existe", "sku": sku}, status=404)
+        pk, nombre, precio, stock = producto
+        return JsonResponse({"id": pk, "sku": sku, "nombre": nombre, "precio": precio, "stock": stock})
+
+    def sin_permiso(self, request):
+        return JsonResponse({"error": "Sin permiso"}, status=403)
+
+
+class ProductoDetailView(LoginRequiredMixin, StockPermissionMixin, CondicionalMixin, DetailView):
     model = Producto
     template_name = "productos/producto_detail.html"
     context_object_name = "producto"
     login_url = 'account_login'
 
+    def get_last_modified(self, request, *args, **kwargs):
+        # Los movimientos y ajustes guardan el producto, asi que esto tambien cambia con ellos
+        if not hasattr(self, "_fecha_actualizacion"):
+            self._fecha_actualizacion = (
+                Producto.objects.filter(pk=kwargs["pk"])
+                .values_list("fecha_actualizacion", flat=True)
+                .first()
+            )
+        return self._fecha_actualizacion
+
+    def get_etag_partes(self, request, *args, **kwargs):
+        return [self.get_last_modified(request, *args, **kwargs)]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["movimientos"] = self.object.movimientos.all()[:10]
+        context["stocks"] = self.object.stocks.select_related("deposito").filter(cantidad__gt=0)
         context["form_ajuste"] = AjusteStockForm
         return context
     
@@ -83,17 +148,20 @@ class ProductoCreateView(LoginRequiredMixin, StockPermissionMixin,CreateView):
     login_url = 'account_login'
 
     def form_valid(self, form):
-        response = super().form_valid(form)
-
-        if form.cleaned_data["stock"] > 0:
-            MovimientoStock.objects.create(
-                producto=self.object,
-                tipo="entrada",
-                cantidad=form.cleaned_data["stock"],
-                motivo="Stock inicial",
-                fecha=timezone.now(),
-                usuario=self.request.user.username if self.request.user.is_authenticated else "Sistema"
-            )
+        with transaction.atomic():
+            response = super().form_valid(form)
+
+            if form.cleaned_data["stock"] > 0:
+                movimiento = MovimientoStock.objects.create(
+                    producto=self.object,
+                    tipo="entrada",
+                    cantidad=form.cleaned_data["stock"],
+                    motivo="Stock inicial",
+                    fecha=timezone.now(),
+                    usuario=self.request.user.username if self.request.user.is_authenticated else "Sistema"
+                )
+                eventos.movimientos([movimiento])
+            auditoria.registrar(self.request.user, "creado", self.object, auditoria.cambios(form))
 
         messages.success(self.request, "Producto creado exitosamente")
 
@@ -107,9 +175,38 @@ class ProductoUpdateView(LoginRequiredMixin, StockPermissionMixin,UpdateView):
     login_url = 'account_login'
 
     def form_valid(self, form):
-        response = super().form_valid(form)
+        # Solo se escriben los campos que el usuario cambio y solo si nadie
+        # toco el producto desde que abrio el formulario (version)
+        self.object = form.instance
+        campos = [c for c in form.changed_data if c in form._meta.fields]
+        version = form.cleaned_data["version"]
+        if version is None:
+            version = self.object.version
+
+        if campos:
+            try:
+                self.object.guardar_cambios(version, campos)
+            except ConflictoVersion:
+                return self.conflicto(form)
+            auditoria.registrar(self.request.user, "editado", self.object, auditoria.cambios(form, campos))
+
         messages.success(self.request, "Producto actualizado exitosamente")
-        return response
+        return redirect(self.get_success_url())
+
+    def conflicto(self, form):
+        # Volvemos a mostrar lo que cargo el usuario sobre los datos actuales;
+        # con la version nueva, si vuelve a guardar pisa conscientemente
+        self.object = Producto.objects.get(pk=self.object.pk)
+        datos = form.data.copy()
+        datos["version"] = self.object.version
+        form = self.get_form_class()(datos, self.request.FILES, instance=self.object)
+        form.is_valid()
+        form.add_error(
+            None,
+            "Otro usuario modifico este producto mientras lo editabas "
+            f"(stock actual: {self.object.stock}). Revisá los datos y volvé a guardar.",
+        )
+        return self.render_to_response(self.get_context_data(form=form), status=409)
 
 
 class ProductoDeleteView(LoginRequiredMixin, StockPermissionMixin, DeleteView):
@@ -121,9 +218,11 @@ class ProductoDeleteView(LoginRequiredMixin, StockPermissionMixin, DeleteView):
     def form_valid(self, form):
         # Django llega acá cuando se hace POST al formulario de confirmación
         self.object = self.get_object()
+        pk = self.object.pk
         try:
             # Intentamos borrar
             self.object.delete()
+            auditoria.registrar(self.request.user, "borrado", self.object, pk=pk)
             messages.success(
                 self.request,
                 "Producto eliminado exitosamente."
@@ -156,23 +255,29 @@ class MovimientoStockCreateView(LoginRequiredMixin, StockPermissionMixin,CreateV
         context["producto"] = get_object_or_404(Producto, pk=self.kwargs["pk"])
         return context 
 
+    @perfilar("movimiento_stock")
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def form_valid(self, form):
         movimiento = form.save(commit=False)
         movimiento.producto = get_object_or_404(Producto, pk=self.kwargs["pk"])
         movimiento.usuario= self.request.user.username if self.request.user.is_authenticated else "Sistema"
 
-        
-        if movimiento.tipo == "entrada":
-            movimiento.producto.stock += movimiento.cantidad
-        elif movimiento.tipo == "salida":
-           if movimiento.producto.stock >= movimiento.cantidad:
-               movimiento.producto.stock -= movimiento.cantidad
-           else:
-               form.add_error("cantidad", "No hay stock suficiente")
-               return self.form_invalid(form)
-
-        movimiento.producto.save()
-        movimiento.save()
+        # El stock se mueve con un UPDATE atomico (stock = stock +/- cantidad),
+        # asi no se pisan ventas o movimientos simultaneos
+        cantidad = {"entrada": movimiento.cantidad, "salida": -movimiento.cantidad}.get(movimiento.tipo, 0)
+        try:
+            with transaction.atomic():
+                stock_anterior = movimiento.producto.stock
+                if cantidad:
+                    stock_anterior = movimiento.producto.mover_stock(cantidad, movimiento.deposito)
+                movimiento.save()
+                eventos.movimientos([movimiento])
+        except StockInsuficiente:
+            form.add_error("cantidad", "No hay stock suficiente")
+            return self.form_invalid(form)
+        registrar_cambio_stock(movimiento.producto, stock_anterior)
 
         messages.success(self.request, "Movimiento de stock registrado exitosamente")
         return redirect("productos:producto_detail", pk=movimiento.producto.pk)
@@ -193,26 +298,42 @@ class AjusteStockView(LoginRequiredMixin, StockPermissionMixin,FormView):
         context["producto"] = get_object_or_404(Producto, pk=self.kwargs["pk"])
         return context 
     
+    @perfilar("ajuste_stock")
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def form_valid(self, form):
         producto = get_object_or_404(Producto, pk=self.kwargs["pk"])
+        deposito = form.cleaned_data["deposito"]
         nueva_cantidad = form.cleaned_data["cantidad"]
         motivo = form.cleaned_data["motivo"] or "Ajuste de stock"
 
-        diferencia = nueva_cantidad - producto.stock
+        version = form.cleaned_data["version"]
+        if version is None:
+            version = producto.version
+
+        diferencia = nueva_cantidad - producto.stock_en(deposito)
 
         if diferencia != 0:
             tipo = "entrada" if diferencia > 0 else "salida"
-            MovimientoStock.objects.create(
-                producto=producto,
-                tipo=tipo,
-                cantidad=abs(diferencia),
-                motivo=motivo,
-                fecha=timezone.now(),
-                usuario=self.request.user.username if self.request.user.is_authenticated else "Sistema"
-            )
-             
-            producto.stock = nueva_cantidad
-            producto.save()
+            try:
+                with transaction.atomic():
+                    # Si entre que se abrio el form y ahora hubo una venta, el
+                    # ajuste se calculo sobre un stock viejo: no lo aplicamos
+                    stock_anterior = producto.mover_stock(diferencia, deposito, version=version)
+                    movimiento = MovimientoStock.objects.create(
+                        producto=producto,
+                        deposito=deposito,
+                        tipo=tipo,
+                        cantidad=abs(diferencia),
+                        motivo=motivo,
+                        fecha=timezone.now(),
+                        usuario=self.request.user.username if self.request.user.is_authenticated else "Sistema"
+                    )
+                    eventos.movimientos([movimiento])
+            except (ConflictoVersion, StockInsuficiente):
+                return self.conflicto(form)
+            registrar_cambio_stock(producto, stock_anterior)
 
             messages.success(self.request, "Stock actualizado exitosamente")
         else:
@@ -220,11 +341,143 @@ class AjusteStockView(LoginRequiredMixin, StockPermissionMixin,FormView):
 
         return redirect("productos:producto_detail", pk=producto.pk)
 
-class StockBajoListView(LoginRequiredMixin, StockPermissionMixin,ListView):
+    def conflicto(self, form):
+        producto = get_object_or_404(Producto, pk=self.kwargs["pk"])
+        deposito = form.cleaned_data["deposito"]
+        datos = form.data.copy()
+        datos["version"] = producto.version
+        form = self.get_form_class()(datos, producto=producto)
+        form.is_valid()
+        form.add_error(
+            None,
+            f"El stock cambio mientras hacias el ajuste (ahora es {producto.stock_en(deposito)} "
+            f"en {deposito}). Revisá la cantidad y volvé a confirmar.",
+        )
+        return self.render_to_response(self.get_context_data(form=form), status=409)
+
+
+class TransferenciaStockView(LoginRequiredMixin, StockPermissionMixin, FormView):
+    form_class = TransferenciaStockForm
+    template_name = "productos/transferencia_form.html"
+    login_url = 'account_login'
+
+    def get_producto(self):
+        if not hasattr(self, "producto"):
+            self.producto = get_object_or_404(Producto, pk=self.kwargs["pk"])
+        return self.producto
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["producto"] = self.get_producto()
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["producto"] = self.get_producto()
+        context["stocks"] = self.get_producto().stocks.select_related("deposito")
+        return context
+
+    def form_valid(self, form):
+        producto = self.get_producto()
+        try:
+            depositos.transferir(
+                producto,
+                form.cleaned_data["origen"],
+                form.cleaned_data["destino"],
+                form.cleaned_data["cantidad"],
+                usuario=self.request.user.username,
+                motivo=form.cleaned_data["motivo"],
+            )
+        except StockInsuficiente:
+            form.add_error("cantidad", f"No hay suficiente stock en {form.cleaned_data['origen']}")
+            return self.form_invalid(form)
+
+        messages.success(self.request, "Transferencia registrada exitosamente")
+        return redirect("productos:producto_detail", pk=producto.pk)
+
+
+class StockBajoListView(LoginRequiredMixin, StockPermissionMixin, LecturaReplicaMixin, ListView):
     model = Producto
     template_name = "productos/stock_bajo_list.html"
     context_object_name = "productos"
     login_url = 'account_login'
 
+    def get_deposito(self):
+        deposito = self.request.GET.get("deposito")
+        if deposito and deposito.isdigit():
+            return Deposito.objects.filter(pk=deposito).first()
+        return None
+
     def get_queryset(self):
-        return Producto.objects.filter(stock__lt=F("stock_minimo")).order_by("stock")
+        self.deposito = self.get_deposito()
+        if self.deposito is None:
+            # Todos los depositos: alcanza con el total que ya guarda el producto
+            return Producto.objects.filter(stock__lt=F("stock_minimo")).order_by("stock")
+        # Un deposito: se lee su stock por el indice (deposito, cantidad), sin sumar nada
+        return (
+            Producto.objects
+            .filter(stocks__deposito=self.deposito, stocks__cantidad__lt=F("stock_minimo"))
+            .annotate(stock_deposito=F("stocks__cantidad"))
+            .order_by("stock_deposito")
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["depositos"] = Deposito.objects.filter(activo=True)
+        context["deposito"] = self.deposito
+        return context
+
+
+class ConteoCreateView(LoginRequiredMixin, StockPermissionMixin, FormView):
+    form_class = ConteoInventarioForm
+    template_name = "productos/conteo_form.html"
+    login_url = 'account_login'
+
+    def form_valid(self, form):
+        lineas = []
+        if form.cleaned_data["archivo"]:
+            lineas = io.TextIOWrapper(form.cleaned_data["archivo"].file, encoding="utf-8-sig")
+        try:
+            cantidades = conteo_inventario.leer_cantidades(lineas)
+            cantidades.update(conteo_inventario.leer_cantidades(form.cleaned_data["lecturas"].splitlines()))
+        except (ValueError, UnicodeDecodeError) as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
+
+        conteo = conteo_inventario.crear_conteo(
+            cantidades,
+            usuario=self.request.user.username,
+            motivo=form.cleaned_data["motivo"],
+            deposito=form.cleaned_data["deposito"],
+        )
+        messages.success(self.request, "Conteo cargado, revisá las diferencias antes de aplicarlo")
+        return redirect("productos:conteo_detail", pk=conteo.pk)
+
+
+class ConteoDetailView(LoginRequiredMixin, StockPermissionMixin, DetailView):
+    model = ConteoInventario
+    template_name = "productos/conteo_detail.html"
+    context_object_name = "conteo"
+    login_url = 'account_login'
+    paginate_by = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = Paginator(conteo_inventario.diferencias(self.object), self.paginate_by)
+        context["page_obj"] = paginator.get_page(self.request.GET.get("page"))
+        context["desconocidos"] = self.object.skus_desconocidos.splitlines()
+        return context
+
+
+class ConteoAplicarView(LoginRequiredMixin, StockPermissionMixin, View):
+    login_url = 'account_login'
+
+    def post(self, request, pk):
+        conteo = get_object_or_404(ConteoInventario, pk=pk)
+        try:
+            cambios = conteo_inventario.aplicar_conteo(conteo, usuario=request.user.username)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f"Conteo aplicado: se actualizó el stock de {cambios} producto(s)")
+        return redirect("productos:conteo_detail", pk=pk)
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import VentaProductoDia, VentaClienteMes
+
+
+@admin.register(VentaProductoDia)
+class VentaProductoDiaAdmin(admin.ModelAdmin):
+    list_display = ("dia", "producto", "unidades", "importe")
+    date_hierarchy = "dia"
+
+
+@admin.register(VentaClienteMes)
+class VentaClienteMesAdmin(admin.ModelAdmin):
+    list_display = ("mes", "cliente", "ventas", "importe")
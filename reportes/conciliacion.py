@@ -0,0 +1,221 @@
+"""
+Conciliacion: verifica que los valores guardados coincidan con los que se
+pueden recalcular (comando ``conciliar``).
+
+- ``subtotales``: ``ItemVenta.subtotal`` = cantidad x precio unitario.
+- ``totales``: ``Venta.total`` = suma de subtotales - lo acreditado en
+  devoluciones.
+- ``stock``: ``Producto.stock`` = suma de ``StockDeposito``. Los productos
+  fraccionados quedan afuera: sus totales van atrasados a proposito hasta que
+  ``rebalancear_stock`` los consolida.
+- ``libro``: ``Producto.stock`` = entradas de ``MovimientoStock`` menos
+  salidas menos unidades vendidas (las ventas no generan movimientos). Solo
+  informa: los productos cargados sin el movimiento de stock inicial (admin,
+  fixtures) difieren y no hay forma de saber cual de los dos numeros esta bien.
+
+Cada chequeo recorre su tabla por rangos de id. Cada rango son unas pocas
+consultas agrupadas (GROUP BY) sobre el rango, nunca una por fila, y los
+rangos se reparten entre varios hilos con su propia conexion. Las diferencias
+se pueden reparar en el mismo rango: se bloquean las filas y se recalcula antes
+de escribir, asi no se pisa una venta o devolucion que entro mientras tanto.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Max, Min, Sum, When
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from inventario.expresiones import SegunId
+from productos import eventos
+from productos.models import MovimientoStock, MovimientoStockArchivado, Producto, StockDeposito
+from ventas.models import Devolucion
+from .cubos import FUENTES
+
+
+def _sumas(queryset, clave, campo):
+    # {clave: suma de campo} con un GROUP BY
+    return dict(
+        queryset.values(clave).annotate(suma=Sum(campo)).order_by().values_list(clave, "suma")
+    )
+
+
+class Chequeo:
+    nombre = None
+    model = None
+    # Los que solo informan no tienen reparar()
+    reparable = True
+
+    def __str__(self):
+        return f"{self.nombre} ({self.model._meta.db_table})"
+
+    def rango(self):
+        ids = self.model.objects.aggregate(desde=Min("pk"), hasta=Max("pk"))
+        return ids["desde"], ids["hasta"]
+
+    def diferencias(self, desde, hasta):
+        """[(id, guardado, esperado)] de las filas con ``desde <= id < hasta`` que no coinciden."""
+        raise NotImplementedError
+
+    def reparar(self, ids):
+        raise NotImplementedError
+
+
+class Subtotales(Chequeo):
+    nombre = "subtotales"
+
+    def __init__(self, items):
+        self.model = items
+
+    def _esperado(self):
+        return Round(F("cantidad") * F("precio_unitario"), 2)
+
+    def diferencias(self, desde, hasta):
+        return list(
+            self.model.objects.filter(pk__gte=desde, pk__lt=hasta)
+            .annotate(esperado=self._esperado())
+            .exclude(subtotal=F("esperado"))
+            .values_list("pk", "subtotal", "esperado")
+        )
+
+    def reparar(self, ids):
+        self.model.objects.filter(pk__in=ids).update(subtotal=self._esperado())
+
+
+class Totales(Chequeo):
+    nombre = "totales"
+
+    def __init__(self, ventas, items):
+        self.model = ventas
+        self.items = items
+
+    def _esperados(self, ventas):
+        # Tres consultas agrupadas por rango; juntar items y devoluciones en un
+        # solo JOIN multiplicaria las filas
+        vendido = _sumas(self.items.objects.filter(venta_id__in=ventas), "venta_id", "subtotal")
+        devuelto = _sumas(Devolucion.objects.filter(venta_id__in=ventas), "venta_id", "total")
+        return {
+            pk: vendido.get(pk, 0) - devuelto.get(pk, 0)
+            for pk in ventas.values_list("pk", flat=True)
+        }
+
+    def diferencias(self, desde, hasta):
+        ventas = self.model.objects.filter(pk__gte=desde, pk__lt=hasta)
+        esperados = self._esperados(ventas)
+        return [
+            (pk, total, esperados[pk])
+            for pk, total in ventas.values_list("pk", "total")
+            if total != esperados[pk]
+        ]
+
+    def reparar(self, ids):
+        with transaction.atomic():
+            # Con las ventas bloqueadas no entra una devolucion a mitad de camino
+            ventas = self.model.objects.filter(pk__in=ids)
+            list(ventas.select_for_update().order_by("pk").values_list("pk", flat=True))
+            esperados = self._esperados(ventas)
+            if esperados:
+                ventas.update(total=SegunId("pk", esperados, DecimalField(max_digits=10, decimal_places=2)))
+
+
+class Stock(Chequeo):
+    nombre = "stock"
+    model = Producto
+
+    def _esperados(self, productos):
+        en_depositos = _sumas(StockDeposito.objects.filter(producto__in=productos), "producto_id", "cantidad")
+        return {pk: en_depositos.get(pk, 0) for pk in productos.values_list("pk", flat=True)}
+
+    def diferencias(self, desde, hasta):
+        productos = Producto.objects.filter(pk__gte=desde, pk__lt=hasta, fracciones=0)
+        esperados = self._esperados(productos)
+        return [
+            (pk, stock, esperados[pk])
+            for pk, stock in productos.values_list("pk", "stock")
+            if stock != esperados[pk]
+        ]
+
+    def reparar(self, ids):
+        with transaction.atomic():
+            # Mismo orden de bloqueo que una venta: depositos y despues producto
+            list(
+                StockDeposito.objects.select_for_update()
+                .filter(producto_id__in=ids)
+                .order_by("producto_id", "deposito_id")
+                .values_list("pk", flat=True)
+            )
+            productos = Producto.objects.filter(pk__in=ids, fracciones=0)
+            list(productos.select_for_update().order_by("pk").values_list("pk", flat=True))
+            esperados = self._esperados(productos)
+            if not esperados:
+                return
+            productos.update(
+                stock=SegunId("pk", esperados, IntegerField()),
+                version=F("version") + 1,
+                fecha_actualizacion=timezone.now(),
+            )
+            eventos.registrar(
+                ("producto.actualizado", pk, {"id": pk, "stock": stock, "version": version})
+                for pk, stock, version in productos.values_list("pk", "stock", "version")
+            )
+
+
+class Libro(Chequeo):
+    nombre = "libro"
+    model = Producto
+    reparable = False
+
+    def diferencias(self, desde, hasta):
+        productos = Producto.objects.filter(pk__gte=desde, pk__lt=hasta, fracciones=0)
+        esperado = defaultdict(int)
+        for movimientos in (MovimientoStock, MovimientoStockArchivado):
+            filas = movimientos.objects.filter(producto__in=productos)
+            for pk, suma in _sumas(filas, "producto_id", Case(
+                When(tipo="salida", then=-F("cantidad")),
+                default=F("cantidad"),
+            )).items():
+                esperado[pk] += suma
+        for _, items in FUENTES:
+            for pk, suma in _sumas(items.objects.filter(producto__in=productos), "producto_id", "cantidad").items():
+                esperado[pk] -= suma
+        return [
+            (pk, stock, esperado[pk])
+            for pk, stock in productos.values_list("pk", "stock")
+            if stock != esperado[pk]
+        ]
+
+
+# En este orden: los totales se calculan con los subtotales ya reparados
+CHEQUEOS = [
+    *(Subtotales(items) for _, items in FUENTES),
+    *(Totales(ventas, items) for ventas, items in FUENTES),
+    Stock(),
+    Libro(),
+]
+
+
+def _revisar_rango(chequeo, desde, hasta, reparar):
+    try:
+        diferencias = chequeo.diferencias(desde, hasta)
+        if diferencias and reparar and chequeo.reparable:
+            chequeo.reparar([pk for pk, _, _ in diferencias])
+        return diferencias
+    finally:
+        # Cada hilo abre su conexion; se cierra al terminar el rango
+        connection.close()
+
+
+def conciliar(chequeo, lote=50000, hilos=4, reparar=False):
+    """Corre ``chequeo`` en rangos de ``lote`` ids repartidos en ``hilos``.
+
+    Devuelve la lista de diferencias (id, guardado, esperado) encontradas; con
+    ``reparar`` quedan corregidas en la base.
+    """
+    desde, hasta = chequeo.rango()
+    if desde is None:
+        return []
+    rangos = [(inicio, min(inicio + lote, hasta + 1)) for inicio in range(desde, hasta + 1, lote)]
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resultados = pool.map(lambda rango: _revisar_rango(chequeo, *rango, reparar), rangos)
+        return [diferencia for diferencias in resultados for diferencia in diferencias]
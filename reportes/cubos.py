@@ -0,0 +1,271 @@
+"""
+Agregados precalculados de ventas.
+
+``acumular_venta`` se llama dentro de la misma transaccion que guarda la
+venta, asi los agregados quedan al dia cuando se hace commit y los reportes
+leen tablas chicas en vez de recorrer ``ventas_itemventa`` completo.
+``reconstruir`` los vuelve a calcular desde cero (carga inicial o
+reparacion).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, DateField, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, Greatest, TruncDate, TruncMonth
+from django.utils import timezone
+
+from inventario.expresiones import SegunId
+from ventas.models import ItemVenta, ItemVentaArchivado, Venta, VentaArchivada
+from .models import ResumenCliente, VentaClienteMes, VentaClienteProducto, VentaProductoDia
+
+
+def _sumar(model, claves, valores, maximos=None):
+    # Incremento atomico con F(); si la fila todavia no existe la creamos.
+    # Si otra transaccion la crea al mismo tiempo reintentamos el update.
+    # ``maximos`` son campos que se quedan con el mayor valor (ej. ultima compra).
+    maximos = maximos or {}
+    cambios = {campo: F(campo) + valor for campo, valor in valores.items()}
+    cambios.update({campo: Greatest(Coalesce(F(campo), valor), valor) for campo, valor in maximos.items()})
+    if model.objects.filter(**claves).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**claves, **valores, **maximos)
+    except IntegrityError:
+        model.objects.filter(**claves).update(**cambios)
+
+
+def _sumar_por_producto(model, claves, por_producto):
+    # Lo mismo que _sumar para varias filas que solo cambian en el producto
+    # ({producto_id: {campo: valor}}), con las mismas consultas sean 2 o 500:
+    # se bloquean en orden de producto (como las ventas de a una), un UPDATE
+    # con CASE para las que existen y un INSERT para las que faltan
+    if len(por_producto) == 1:
+        (producto_id, valores), = por_producto.items()
+        _sumar(model, {**claves, "producto_id": producto_id}, valores)
+        return
+    filas = model.objects.filter(**claves, producto_id__in=por_producto)
+    existentes = set(filas.select_for_update().order_by("producto_id").values_list("producto_id", flat=True))
+    if existentes:
+        campos = next(iter(por_producto.values()))
+        filas.update(**{
+            campo: F(campo) + SegunId(
+                "producto_id",
+                {producto_id: valores[campo] for producto_id, valores in por_producto.items() if producto_id in existentes},
+                model._meta.get_field(campo),
+            )
+            for campo in campos
+        })
+    faltan = {producto_id: valores for producto_id, valores in por_producto.items() if producto_id not in existentes}
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                model(**claves, producto_id=producto_id, **valores) for producto_id, valores in faltan.items()
+            )
+    except IntegrityError:
+        # Otra transaccion creo alguna al mismo tiempo: de a una
+        for producto_id, valores in sorted(faltan.items()):
+            _sumar(model, {**claves, "producto_id": producto_id}, valores)
+
+
+def acumular_venta(venta, items, signo=1, ventas=None):
+    """Suma (o resta con ``signo=-1``) una venta y sus items a los agregados.
+
+    ``items`` son los ``ItemVenta`` de la venta (o las lineas devueltas),
+    se agrupan por producto para hacer un solo update por tabla del cubo.
+    ``ventas`` es cuanto cambia la cantidad de ventas del cliente: por
+    defecto ``signo``, una devolucion parcial pasa 0.
+    """
+    dia = timezone.localdate(venta.fecha)
+    mes = dia.replace(day=1)
+    ventas = signo if ventas is None else ventas
+
+    por_producto = defaultdict(lambda: [0, Decimal("0")])
+    importe_total = Decimal("0")
+    for item in items:
+        acumulado = por_producto[item.producto_id]
+        acumulado[0] += item.cantidad
+        acumulado[1] += item.subtotal
+        importe_total += item.subtotal
+    valores = {
+        producto_id: {"unidades": signo * unidades, "importe": signo * importe}
+        for producto_id, (unidades, importe) in por_producto.items()
+    }
+
+    if valores:
+        _sumar_por_producto(VentaClienteProducto, {"cliente_id": venta.cliente_id}, valores)
+    _sumar(
+        VentaClienteMes,
+        {"cliente_id": venta.cliente_id, "mes": mes},
+        {"ventas": ventas, "importe": signo * importe_total},
+    )
+    _sumar(
+        ResumenCliente,
+        {"cliente_id": venta.cliente_id},
+        {"cantidad_ventas": ventas, "total_comprado": signo * importe_total},
+        maximos={"ultima_compra": venta.fecha} if signo > 0 else None,
+    )
+
+    # Producto y dia es la fila que comparten todas las ventas de un producto
+    # en promocion: va al final (y en orden de producto, para no cruzar
+    # bloqueos entre ventas) asi queda tomada solo hasta el commit. Aun con el
+    # stock fraccionado las ventas del mismo producto se encolan aca (ver
+    # medir_contencion en el README)
+    if valores:
+        _sumar_por_producto(VentaProductoDia, {"dia": dia}, valores)
+
+
+# Ventas calientes y archivadas (ver archivar_historial): los agregados cubren las dos
+FUENTES = [(Venta, ItemVenta), (VentaArchivada, ItemVentaArchivado)]
+
+# Lo vendido menos lo devuelto de cada linea (Venta.total ya es neto)
+UNIDADES_NETAS = Sum(F("cantidad") - F("cantidad_devuelta"))
+IMPORTE_NETO = Sum(F("subtotal") - F("cantidad_devuelta") * F("precio_unitario"))
+
+
+def _combinar(consultas, claves, maximos=()):
+    # Junta los grupos de varias consultas agregadas sumando los valores
+    # (o quedandose con el mayor para los campos de ``maximos``)
+    acumulado = {}
+    for consulta in consultas:
+        for fila in consulta.iterator(chunk_size=2000):
+            clave = tuple(fila[c] for c in claves)
+            previo = acumulado.get(clave)
+            if previo is None:
+                acumulado[clave] = fila
+                continue
+            for campo, valor in fila.items():
+                if campo in claves:
+                    continue
+                previo[campo] = max(previo[campo], valor) if campo in maximos else previo[campo] + valor
+    return acumulado.values()
+
+
+def reconstruir(apps=global_apps, using=DEFAULT_DB_ALIAS):
+    """Recalcula todos los agregados a partir de las ventas guardadas.
+
+    ``apps`` y ``using`` son para llamarlo desde una migracion, con los
+    modelos historicos y la base que se esta migrando.
+    """
+    fuentes = [
+        (apps.get_model("ventas", ventas), apps.get_model("ventas", items))
+        for ventas, items in (("Venta", "ItemVenta"), ("VentaArchivada", "ItemVentaArchivado"))
+    ]
+    por_dia, por_mes, por_producto_cliente, resumen = (
+        apps.get_model("reportes", nombre)
+        for nombre in ("VentaProductoDia", "VentaClienteMes", "VentaClienteProducto", "ResumenCliente")
+    )
+    with transaction.atomic(using=using):
+        for model in (por_dia, por_mes, por_producto_cliente, resumen):
+            model.objects.using(using).all().delete()
+
+        por_producto = _combinar(
+            (
+                items.objects.using(using)
+                .annotate(dia=TruncDate("venta__fecha"))
+                .values("producto_id", "dia")
+                .annotate(unidades=UNIDADES_NETAS, importe=IMPORTE_NETO)
+                .order_by()
+                for _, items in fuentes
+            ),
+            ("producto_id", "dia"),
+        )
+        por_dia.objects.using(using).bulk_create(
+            (por_dia(**fila) for fila in por_producto), batch_size=2000,
+        )
+
+        por_cliente = _combinar(
+            (
+                ventas.objects.using(using)
+                .annotate(mes=TruncMonth("fecha", output_field=DateField()))
+                .values("cliente_id", "mes")
+                .annotate(ventas=Count("id", filter=Q(anulada=False)), importe=Sum("total"))
+                .order_by()
+                for ventas, _ in fuentes
+            ),
+            ("cliente_id", "mes"),
+        )
+        por_mes.objects.using(using).bulk_create(
+            (por_mes(**fila) for fila in por_cliente), batch_size=2000,
+        )
+
+        por_cliente_producto = _combinar(
+            (
+                items.objects.using(using)
+                .values("producto_id", cliente_id=F("venta__cliente_id"))
+                .annotate(unidades=UNIDADES_NETAS, importe=IMPORTE_NETO)
+                .order_by()
+                for _, items in fuentes
+            ),
+            ("producto_id", "cliente_id"),
+        )
+        por_producto_cliente.objects.using(using).bulk_create(
+            (por_producto_cliente(**fila) for fila in por_cliente_producto), batch_size=2000,
+        )
+
+        resumenes = _combinar(
+            (
+                ventas.objects.using(using)
+                .values("cliente_id")
+                .annotate(
+                    cantidad_ventas=Count("id", filter=Q(anulada=False)),
+                    total_comprado=Sum("total"),
+                    ultima_compra=Max("fecha"),
+                )
+                .order_by()
+                for ventas, _ in fuentes
+            ),
+            ("cliente_id",),
+            maximos=("ultima_compra",),
+        )
+        resumen.objects.using(using).bulk_create(
+            (resumen(**fila) for fila in resumenes), batch_size=2000,
+        )
+
+
+def ventas_por_dia(desde=None, hasta=None):
+    queryset = VentaProductoDia.objects.all()
+    if desde:
+        queryset = queryset.filter(dia__gte=desde)
+    if hasta:
+        queryset = queryset.filter(dia__lte=hasta)
+    return queryset.values("dia").annotate(
+        unidades=Sum("unidades"), importe=Sum("importe")
+    ).order_by("dia")
+
+
+def top_productos(n=10, desde=None, hasta=None):
+    queryset = VentaProductoDia.objects.all()
+    if desde:
+        queryset = queryset.filter(dia__gte=desde)
+    if hasta:
+        queryset = queryset.filter(dia__lte=hasta)
+    return (
+        queryset
+        .values("producto_id", "producto__nombre")
+        .annotate(unidades=Sum("unidades"), importe=Sum("importe"))
+        .order_by("-importe")[:n]
+    )
+
+
+def resumen_cliente(cliente, top_n=5):
+    """Resumen del cliente y sus productos mas comprados, en dos lecturas por indice."""
+    resumen = ResumenCliente.objects.filter(cliente=cliente).first()
+    top = (
+        VentaClienteProducto.objects
+        .filter(cliente=cliente)
+        .select_related("producto")
+        .order_by("-importe")[:top_n]
+    )
+    return resumen, list(top)
+
+
+def ventas_por_cliente_mes(desde=None, hasta=None):
+    queryset = VentaClienteMes.objects.select_related("cliente")
+    if desde:
+        queryset = queryset.filter(mes__gte=desde.replace(day=1))
+    if hasta:
+        queryset = queryset.filter(mes__lte=hasta)
+    return queryset.order_by("-mes", "-importe")
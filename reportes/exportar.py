@@ -0,0 +1,175 @@
+"""
+Exportacion en streaming del historial de movimientos de stock y ventas.
+
+Las filas salen de ``values_list(...).iterator(chunk_size=...)`` (en
+Postgres es un cursor del lado del servidor), se pasan a CSV o JSON lines
+y opcionalmente se comprimen con gzip a medida que se generan. Nunca se
+arma la exportacion completa en memoria, sirve igual para diez filas que
+para decenas de millones. ``aexportar`` es la version async que usan las
+vistas de descarga; los comandos ``exportar_movimientos`` /
+``exportar_ventas`` usan ``exportar``.
+"""
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from productos.models import MovimientoStock, MovimientoStockArchivado
+from ventas.models import ItemVenta, ItemVentaArchivado
+
+CHUNK_SIZE = 2000
+TAMANO_BLOQUE = 64 * 1024
+
+CAMPOS_MOVIMIENTOS = [
+    "id", "fecha", "producto_id", "producto__sku", "producto__nombre",
+    "deposito_id", "tipo", "cantidad", "motivo", "usuario",
+]
+
+CAMPOS_VENTAS = [
+    "venta_id", "venta__codigo", "venta__fecha", "venta__cliente_id", "venta__deposito_id", "venta__total",
+    "id", "producto_id", "producto__sku", "cantidad", "precio_unitario", "subtotal",
+    "cantidad_devuelta", "venta__anulada",
+]
+
+
+def _rango_fechas(campo, desde=None, hasta=None):
+    # Comparamos contra datetimes para que la BD pueda usar el indice de fecha
+    filtros = {}
+    if desde:
+        filtros[f"{campo}__gte"] = timezone.make_aware(datetime.combine(desde, time.min))
+    if hasta:
+        filtros[f"{campo}__lt"] = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return filtros
+
+
+def _consultas(modelos, campos, orden, campo_fecha, desde, hasta, producto):
+    # Primero el archivo (lo mas viejo) y despues las tablas calientes
+    consultas = []
+    for model in modelos:
+        queryset = model.objects.filter(**_rango_fechas(campo_fecha, desde, hasta))
+        if producto:
+            queryset = queryset.filter(producto_id=producto)
+        consultas.append(queryset.order_by(*orden).values_list(*campos))
+    return consultas
+
+
+def consultas_movimientos(desde=None, hasta=None, producto=None, archivo=False):
+    modelos = [MovimientoStockArchivado, MovimientoStock] if archivo else [MovimientoStock]
+    return _consultas(modelos, CAMPOS_MOVIMIENTOS, ["id"], "fecha", desde, hasta, producto)
+
+
+def consultas_ventas(desde=None, hasta=None, producto=None, archivo=False):
+    # Una fila por item, con los datos de la cabecera de la venta repetidos
+    modelos = [ItemVentaArchivado, ItemVenta] if archivo else [ItemVenta]
+    return _consultas(modelos, CAMPOS_VENTAS, ["venta_id", "id"], "venta__fecha", desde, hasta, producto)
+
+
+def filas_movimientos(chunk_size=CHUNK_SIZE, **filtros):
+    return chain.from_iterable(q.iterator(chunk_size=chunk_size) for q in consultas_movimientos(**filtros))
+
+
+def filas_ventas(chunk_size=CHUNK_SIZE, **filtros):
+    return chain.from_iterable(q.iterator(chunk_size=chunk_size) for q in consultas_ventas(**filtros))
+
+
+class _Eco:
+    # "Archivo" que devuelve lo que le escriben, para usar csv.writer en streaming
+    def write(self, valor):
+        return valor
+
+
+def formato_csv(campos):
+    # Devuelve (encabezado, funcion que pasa una fila a texto)
+    writer = csv.writer(_Eco())
+    return writer.writerow(campos), writer.writerow
+
+
+def formato_jsonl(campos):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return "", lambda fila: encoder.encode(dict(zip(campos, fila))) + "\n"
+
+
+class Empaquetador:
+    """Junta lineas en bloques de ~64KB y, si se pide, los comprime con gzip.
+
+    Asi no se manda un chunk HTTP por fila. Lo usan tanto la exportacion
+    sync como la async, que solo cambian en como leen las filas.
+    """
+
+    def __init__(self, gzip=False, tamano=TAMANO_BLOQUE):
+        self.tamano = tamano
+        self.buffer = []
+        self.acumulado = 0
+        # wbits=31 genera formato gzip (cabecera + crc) en vez de zlib pelado
+        self.compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def _salida(self, datos):
+        return self.compresor.compress(datos) if self.compresor else datos
+
+    def agregar(self, linea):
+        datos = linea.encode("utf-8")
+        self.buffer.append(datos)
+        self.acumulado += len(datos)
+        if self.acumulado < self.tamano:
+            return b""
+        bloque = b"".join(self.buffer)
+        self.buffer = []
+        self.acumulado = 0
+        return self._salida(bloque)
+
+    def cerrar(self):
+        datos = self._salida(b"".join(self.buffer))
+        self.buffer = []
+        if self.compresor:
+            datos += self.compresor.flush()
+        return datos
+
+
+EXPORTACIONES = {
+    "movimientos": (CAMPOS_MOVIMIENTOS, consultas_movimientos),
+    "ventas": (CAMPOS_VENTAS, consultas_ventas),
+}
+
+FORMATOS = {
+    "csv": (formato_csv, "text/csv"),
+    "jsonl": (formato_jsonl, "application/x-ndjson"),
+}
+
+
+def exportar(tipo, formato="csv", gzip=False, chunk_size=CHUNK_SIZE, **filtros):
+    """Devuelve un iterador de bytes con la exportacion pedida."""
+    campos, consultas = EXPORTACIONES[tipo]
+    encabezado, linea = FORMATOS[formato][0](campos)
+    empaquetador = Empaquetador(gzip)
+    # El encabezado (si hay) entra al primer bloque, sale junto con las filas
+    empaquetador.agregar(encabezado)
+    for queryset in consultas(**filtros):
+        for fila in queryset.iterator(chunk_size=chunk_size):
+            datos = empaquetador.agregar(linea(fila))
+            if datos:
+                yield datos
+    yield empaquetador.cerrar()
+
+
+async def aexportar(tipo, formato="csv", gzip=False, chunk_size=CHUNK_SIZE, **filtros):
+    """Igual que ``exportar`` pero es un iterador async (ORM async con aiterator).
+
+    Bajo ASGI la respuesta se manda mientras se leen las filas, sin ocupar un
+    hilo por descarga ni juntar todo en memoria como pasa con un iterador sync.
+    """
+    campos, consultas = EXPORTACIONES[tipo]
+    encabezado, linea = FORMATOS[formato][0](campos)
+    empaquetador = Empaquetador(gzip)
+    # El encabezado (si hay) entra al primer bloque, sale junto con las filas
+    empaquetador.agregar(encabezado)
+    for queryset in consultas(**filtros):
+        # values_list().aiterator() arma el cursor en el hilo async y Django lo
+        # rechaza; con values() si funciona y las claves vienen en el orden de campos
+        async for fila in queryset.values(*campos).aiterator(chunk_size=chunk_size):
+            datos = empaquetador.agregar(linea(tuple(fila.values())))
+            if datos:
+                yield datos
+    yield empaquetador.cerrar()
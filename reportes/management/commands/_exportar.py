@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventario.replica import iterar_en_replica
+from reportes.exportar import FORMATOS, exportar
+
+
+class ExportarCommand(BaseCommand):
+    # Base comun de exportar_movimientos y exportar_ventas
+    tipo = None
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv")
+        parser.add_argument("--desde", help="Fecha inicial YYYY-MM-DD")
+        parser.add_argument("--hasta", help="Fecha final YYYY-MM-DD (inclusive)")
+        parser.add_argument("--producto", type=int, help="Id del producto")
+        parser.add_argument("--gzip", action="store_true", help="Comprime la salida con gzip")
+        parser.add_argument("--salida", help="Archivo destino (por defecto stdout)")
+        parser.add_argument("--archivo", action="store_true", help="Incluye el historial archivado")
+        parser.add_argument("--replica", action="store_true", help="Lee de la base replica si hay una configurada")
+
+    def _fecha(self, valor):
+        if not valor:
+            return None
+        fecha = parse_date(valor)
+        if fecha is None:
+            raise CommandError(f"Fecha invalida: {valor}")
+        return fecha
+
+    def handle(self, *args, **options):
+        contenido = exportar(
+            self.tipo,
+            options["formato"],
+            gzip=options["gzip"],
+            desde=self._fecha(options["desde"]),
+            hasta=self._fecha(options["hasta"]),
+            producto=options["producto"],
+            archivo=options["archivo"],
+        )
+        if options["replica"]:
+            contenido = iterar_en_replica(contenido)
+        if options["salida"]:
+            with open(options["salida"], "wb") as destino:
+                for bloque in contenido:
+                    destino.write(bloque)
+        else:
+            for bloque in contenido:
+                sys.stdout.buffer.write(bloque)
+            sys.stdout.buffer.flush()
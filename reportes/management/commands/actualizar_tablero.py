@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reportes.tablero import actualizar
+
+
+class Command(BaseCommand):
+    help = "Recalcula los indicadores de la pagina de inicio"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Queda corriendo y recalcula por intervalo",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=settings.TABLERO.get("INTERVALO", 60),
+            help="Segundos entre recalculos cuando se usa --loop",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            tablero = actualizar()
+            self.stdout.write(f"Tablero actualizado: {tablero.ventas} venta(s), ${tablero.importe}")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.conciliacion import CHEQUEOS, conciliar
+
+POR_DEFECTO = ["subtotales", "totales", "stock"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica subtotales y totales de ventas y el stock de los productos "
+        "contra lo que se puede recalcular, por rangos de id y en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chequeo",
+            action="append",
+            choices=sorted({chequeo.nombre for chequeo in CHEQUEOS}),
+            help=f"Que revisar (se puede repetir). Por defecto: {', '.join(POR_DEFECTO)}",
+        )
+        parser.add_argument("--reparar", action="store_true", help="Corrige las diferencias encontradas")
+        parser.add_argument("--lote", type=int, default=50000, help="Ids por rango")
+        parser.add_argument("--hilos", type=int, default=4, help="Rangos que se revisan a la vez")
+        parser.add_argument("--mostrar", type=int, default=10, help="Diferencias que se listan por chequeo")
+
+    def handle(self, *args, **options):
+        nombres = options["chequeo"] or POR_DEFECTO
+        pendientes = 0
+        for chequeo in CHEQUEOS:
+            if chequeo.nombre not in nombres:
+                continue
+            diferencias = conciliar(
+                chequeo, lote=options["lote"], hilos=options["hilos"], reparar=options["reparar"]
+            )
+            reparadas = options["reparar"] and chequeo.reparable
+            estado = "reparadas" if reparadas else "diferencias"
+            self.stdout.write(f"{chequeo}: {len(diferencias)} {estado}")
+            for pk, guardado, esperado in diferencias[:options["mostrar"]]:
+                self.stdout.write(f"  id {pk}: guardado {guardado}, esperado {esperado}")
+            if not reparadas:
+                pendientes += len(diferencias)
+
+        # Distinto de cero para que un chequeo programado avise
+        if pendientes:
+            raise CommandError(f"Quedan {pendientes} diferencia(s) sin reparar")
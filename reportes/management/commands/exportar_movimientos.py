@@ -0,0 +1,6 @@
+from ._exportar import ExportarCommand
+
+
+class Command(ExportarCommand):
+    help = "Exporta en streaming el historial de movimientos de stock (CSV o JSON lines)"
+    tipo = "movimientos"
@@ -0,0 +1,6 @@
+from ._exportar import ExportarCommand
+
+
+class Command(ExportarCommand):
+    help = "Exporta en streaming las ventas con sus items (CSV o JSON lines)"
+    tipo = "ventas"
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from reportes.cubos import reconstruir
+from reportes.models import VentaClienteMes, VentaProductoDia
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los agregados de ventas de la app reportes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        reconstruir(using=using)
+        self.stdout.write(
+            f"Agregados reconstruidos: {VentaProductoDia.objects.using(using).count()} producto/dia, "
+            f"{VentaClienteMes.objects.using(using).count()} cliente/mes"
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('productos', '0004_notificacion_alertastock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaClienteMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(verbose_name='Mes')),
+                ('ventas', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_por_mes', to='clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Venta por cliente y mes',
+                'verbose_name_plural': 'Ventas por cliente y mes',
+                'indexes': [models.Index(fields=['mes', 'cliente'], name='reportes_ve_mes_8430ab_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'mes'), name='reportes_cliente_mes_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaProductoDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('unidades', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_por_dia', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta por producto y dia',
+                'verbose_name_plural': 'Ventas por producto y dia',
+                'indexes': [models.Index(fields=['dia', 'producto'], name='reportes_ve_dia_41eb7f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'dia'), name='reportes_producto_dia_unico')],
+            },
+        ),
+    ]
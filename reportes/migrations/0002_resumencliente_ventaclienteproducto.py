@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('productos', '0004_notificacion_alertastock'),
+        ('reportes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='clientes.cliente')),
+                ('cantidad_ventas', models.IntegerField(default=0)),
+                ('total_comprado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ultima_compra', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de cliente',
+                'verbose_name_plural': 'Resumenes de clientes',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaClienteProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unidades', models.IntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productos_comprados', to='clientes.cliente')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta por cliente y producto',
+                'verbose_name_plural': 'Ventas por cliente y producto',
+                'indexes': [models.Index(fields=['cliente', '-importe'], name='reportes_ve_cliente_c8cd6d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'producto'), name='reportes_cliente_producto_unico')],
+            },
+        ),
+    ]
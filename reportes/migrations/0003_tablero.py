@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:01
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0002_resumencliente_ventaclienteproducto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tablero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('ventas', models.IntegerField(default=0, verbose_name='Ventas del dia')),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Facturado del dia')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades vendidas')),
+                ('stock_bajo', models.IntegerField(default=0, verbose_name='Productos bajo el minimo')),
+                ('top_productos', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Mas vendidos')),
+                ('fecha', models.DateTimeField(verbose_name='Calculado')),
+            ],
+            options={
+                'verbose_name': 'Tablero',
+                'verbose_name_plural': 'Tablero',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def llenar_agregados(apps, schema_editor):
+    # Las tablas de agregados se crean vacias: con una base que ya tiene ventas
+    # el grafico, los reportes y el tablero quedarian en cero hasta correr
+    # reconstruir_reportes a mano
+    from reportes.cubos import reconstruir
+
+    reconstruir(apps, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0003_tablero'),
+        ('ventas', '0007_devoluciones'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_agregados, migrations.RunPython.noop),
+    ]
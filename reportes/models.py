@@ -0,0 +1,104 @@
+from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from clientes.models import Cliente
+from productos.models import Producto
+
+
+class VentaProductoDia(models.Model):
+    """Unidades e importe vendidos de un producto en un dia."""
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="ventas_por_dia")
+    dia = models.DateField("Dia")
+    unidades = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta por producto y dia'
+        verbose_name_plural = 'Ventas por producto y dia'
+        constraints = [
+            models.UniqueConstraint(fields=["producto", "dia"], name="reportes_producto_dia_unico"),
+        ]
+        indexes = [models.Index(fields=["dia", "producto"])]
+
+    def __str__(self):
+        return f"{self.producto} {self.dia}: {self.unidades} u. ${self.importe}"
+
+
+class VentaClienteMes(models.Model):
+    """Cantidad de ventas e importe de un cliente en un mes (dia 1 del mes)."""
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="ventas_por_mes")
+    mes = models.DateField("Mes")
+    ventas = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta por cliente y mes'
+        verbose_name_plural = 'Ventas por cliente y mes'
+        constraints = [
+            models.UniqueConstraint(fields=["cliente", "mes"], name="reportes_cliente_mes_unico"),
+        ]
+        indexes = [models.Index(fields=["mes", "cliente"])]
+
+    def __str__(self):
+        return f"{self.cliente} {self.mes:%m/%Y}: {self.ventas} ventas ${self.importe}"
+
+
+class ResumenCliente(models.Model):
+    """Totales historicos de un cliente, para no recorrer todas sus ventas."""
+
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name="resumen")
+    cantidad_ventas = models.IntegerField(default=0)
+    total_comprado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ultima_compra = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Resumen de cliente'
+        verbose_name_plural = 'Resumenes de clientes'
+
+    def __str__(self):
+        return f"{self.cliente}: {self.cantidad_ventas} ventas ${self.total_comprado}"
+
+
+class VentaClienteProducto(models.Model):
+    """Unidades e importe que compro un cliente de cada producto."""
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="productos_comprados")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name="+")
+    unidades = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Venta por cliente y producto'
+        verbose_name_plural = 'Ventas por cliente y producto'
+        constraints = [
+            models.UniqueConstraint(fields=["cliente", "producto"], name="reportes_cliente_producto_unico"),
+        ]
+        indexes = [models.Index(fields=["cliente", "-importe"])]
+
+    def __str__(self):
+        return f"{self.cliente} - {self.producto}: {self.unidades} u."
+
+
+class Tablero(models.Model):
+    """Indicadores del inicio, calculados cada tanto por ``actualizar_tablero``.
+
+    Hay una sola fila: la pagina de inicio la lee (o la toma del cache) en vez
+    de agregar ventas y stock en cada visita.
+    """
+
+    dia = models.DateField("Dia")
+    ventas = models.IntegerField("Ventas del dia", default=0)
+    importe = models.DecimalField("Facturado del dia", max_digits=14, decimal_places=2, default=0)
+    unidades = models.IntegerField("Unidades vendidas", default=0)
+    stock_bajo = models.IntegerField("Productos bajo el minimo", default=0)
+    # [{"producto_id", "nombre", "unidades", "importe"}] del dia, de mayor a menor importe
+    top_productos = models.JSONField("Mas vendidos", default=list, encoder=DjangoJSONEncoder)
+    fecha = models.DateTimeField("Calculado")
+
+    class Meta:
+        verbose_name = 'Tablero'
+        verbose_name_plural = 'Tablero'
+
+    def __str__(self):
+        return f"Tablero {self.dia} ({self.fecha:%H:%M:%S})"
@@ -0,0 +1,72 @@
+"""
+Indicadores de la pagina de inicio: ventas y facturado del dia, productos
+bajo el stock minimo y los mas vendidos del dia.
+
+``actualizar`` los calcula (desde los agregados de ``cubos``, no desde las
+ventas) y los guarda en la unica fila de ``Tablero``; lo corre el comando
+``actualizar_tablero --loop``. ``leer`` es lo que usa la vista: primero el
+cache del proceso y si no una lectura de esa fila por clave primaria, asi da
+lo mismo cuantos usuarios entren a la vez al empezar el turno.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from productos.models import Producto
+from ventas.models import Venta
+from .cubos import top_productos
+from .models import Tablero, VentaProductoDia
+
+CLAVE_CACHE = "reportes:tablero"
+
+
+def config(clave, defecto):
+    return getattr(settings, "TABLERO", {}).get(clave, defecto)
+
+
+def calcular():
+    hoy = timezone.localdate()
+    desde = timezone.make_aware(datetime.combine(hoy, time.min))
+    del_dia = VentaProductoDia.objects.filter(dia=hoy).aggregate(unidades=Sum("unidades"), importe=Sum("importe"))
+    return {
+        "dia": hoy,
+        # Rango sobre el indice de fecha (fecha__date no lo usa)
+        "ventas": Venta.objects.filter(fecha__gte=desde, fecha__lt=desde + timedelta(days=1), anulada=False).count(),
+        "importe": del_dia["importe"] or 0,
+        "unidades": del_dia["unidades"] or 0,
+        "stock_bajo": Producto.objects.filter(stock__lt=F("stock_minimo")).count(),
+        "top_productos": [
+            {
+                "producto_id": fila["producto_id"],
+                "nombre": fila["producto__nombre"],
+                "unidades": fila["unidades"],
+                "importe": fila["importe"],
+            }
+            for fila in top_productos(config("TOP", 5), desde=hoy, hasta=hoy)
+        ],
+        "fecha": timezone.now(),
+    }
+
+
+def actualizar():
+    """Recalcula los indicadores y reemplaza la fila del tablero."""
+    tablero, _ = Tablero.objects.update_or_create(pk=1, defaults=calcular())
+    cache.set(CLAVE_CACHE, tablero, config("CACHE", 15))
+    return tablero
+
+
+def leer():
+    """El tablero guardado; si todavia no se calculo nunca, lo calcula ahora."""
+    tablero = cache.get(CLAVE_CACHE)
+    if tablero is None:
+        tablero = Tablero.objects.filter(pk=1).first() or actualizar()
+        cache.set(CLAVE_CACHE, tablero, config("CACHE", 15))
+    return tablero
+
+
+def atrasado(tablero):
+    # Si el comando dejo de correr la pagina lo avisa en vez de mostrar datos viejos como actuales
+    return timezone.now() - tablero.fecha > timedelta(seconds=config("INTERVALO", 60) * 3)
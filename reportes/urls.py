@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+app_name = 'reportes'
+
+urlpatterns = [
+    path('ventas/', views.ReporteVentasView.as_view(), name='reporte_ventas'),
+    path('ventas/csv/', views.ReporteVentasCSVView.as_view(), name='reporte_ventas_csv'),
+    path('exportar/movimientos/', views.ExportarMovimientosView.as_view(), name='exportar_movimientos'),
+    path('exportar/ventas/', views.ExportarVentasView.as_view(), name='exportar_ventas'),
+]
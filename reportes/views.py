@@ -0,0 +1,121 @@
+import csv
+from django.core.handlers.asgi import ASGIRequest
+
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views import View
+from django.views.generic import TemplateView
+from django.contrib.auth.mixins import LoginRequiredMixin
+
+from inventario.mixins import LecturaReplicaMixin, PermisoAsyncMixin
+from inventario.replica import aiterar_en_replica, iterar_en_replica, leyendo_replica
+from ventas.views import VentasPermissionMixin
+from . import cubos, exportar
+
+
+class ReporteVentasView(LoginRequiredMixin, VentasPermissionMixin, LecturaReplicaMixin, TemplateView):
+    # Todo sale de las tablas precalculadas de reportes, nunca de ventas_itemventa
+    template_name = "reportes/reporte_ventas.html"
+    login_url = 'account_login'
+    top_n = 10
+
+    def get_filtros(self):
+        desde = parse_date(self.request.GET.get("desde") or "")
+        hasta = parse_date(self.request.GET.get("hasta") or "")
+        return desde, hasta
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        desde, hasta = self.get_filtros()
+        context["desde"] = desde
+        context["hasta"] = hasta
+        context["por_dia"] = cubos.ventas_por_dia(desde, hasta)
+        context["top_productos"] = cubos.top_productos(self.top_n, desde, hasta)
+        context["por_cliente"] = cubos.ventas_por_cliente_mes(desde, hasta)[:50]
+        return context
+
+
+class ReporteVentasCSVView(ReporteVentasView):
+    """Exporta uno de los reportes (?reporte=dia|productos|clientes) en CSV."""
+
+    def get(self, request, *args, **kwargs):
+        desde, hasta = self.get_filtros()
+        reporte = request.GET.get("reporte", "dia")
+
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="reporte_{reporte}.csv"'
+        writer = csv.writer(response)
+
+        if reporte == "productos":
+            writer.writerow(["producto_id", "producto", "unidades", "importe"])
+            for fila in cubos.top_productos(self.top_n, desde, hasta):
+                writer.writerow([fila["producto_id"], fila["producto__nombre"], fila["unidades"], fila["importe"]])
+        elif reporte == "clientes":
+            writer.writerow(["mes", "cliente_id", "cliente", "ventas", "importe"])
+            for fila in cubos.ventas_por_cliente_mes(desde, hasta).iterator():
+                writer.writerow([fila.mes.strftime("%Y-%m"), fila.cliente_id, str(fila.cliente), fila.ventas, fila.importe])
+        else:
+            writer.writerow(["dia", "unidades", "importe"])
+            for fila in cubos.ventas_por_dia(desde, hasta):
+                writer.writerow([fila["dia"].isoformat(), fila["unidades"], fila["importe"]])
+
+        return response
+
+
+class ExportarMixin:
+    """
+    Descarga en streaming de un historial completo.
+
+    Filtros por GET: desde, hasta (YYYY-MM-DD), producto (id),
+    formato (csv | jsonl), gzip=1 para comprimir al vuelo y archivo=1
+    para incluir tambien el historial archivado.
+
+    Es una vista async: bajo uvicorn la descarga no ocupa un hilo mientras
+    espera a la BD o a un cliente lento. Bajo WSGI (runserver) se manda el
+    generador sync: Django leeria uno async entero en memoria antes de
+    mandar el primer byte.
+    """
+    tipo = None
+
+    async def get(self, request, *args, **kwargs):
+        formato = request.GET.get("formato", "csv")
+        if formato not in exportar.FORMATOS:
+            return HttpResponseBadRequest("Formato no soportado")
+        comprimido = request.GET.get("gzip") == "1"
+        producto = request.GET.get("producto") or None
+        if producto and not producto.isdigit():
+            return HttpResponseBadRequest("Producto invalido")
+
+        asgi = isinstance(request, ASGIRequest)
+        contenido = (exportar.aexportar if asgi else exportar.exportar)(
+            self.tipo,
+            formato,
+            gzip=comprimido,
+            desde=parse_date(request.GET.get("desde") or ""),
+            hasta=parse_date(request.GET.get("hasta") or ""),
+            producto=producto,
+            archivo=request.GET.get("archivo") == "1",
+        )
+        if leyendo_replica():
+            contenido = (aiterar_en_replica if asgi else iterar_en_replica)(contenido)
+        _, content_type = exportar.FORMATOS[formato]
+        nombre = f"{self.tipo}.{formato}" + (".gz" if comprimido else "")
+
+        response = StreamingHttpResponse(
+            contenido,
+            content_type="application/gzip" if comprimido else content_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return response
+
+
+class ExportarMovimientosView(PermisoAsyncMixin, LecturaReplicaMixin, ExportarMixin, View):
+    tipo = "movimientos"
+    grupos = ("stock", "administradores")
+    mensaje_sin_permiso = "Lamentablemente caiste en ventas, no tenés permiso para acceder aqui"
+
+
+class ExportarVentasView(PermisoAsyncMixin, LecturaReplicaMixin, ExportarMixin, View):
+    tipo = "ventas"
+    grupos = ("ventas", "administradores")
+    mensaje_sin_permiso = "Sos de stock, no tenés permiso para acceder a Ventas/Clientes...."
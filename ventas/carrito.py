@@ -0,0 +1,191 @@
+"""
+Ventas con muchas lineas (mayoristas) y el guardado por conjuntos.
+
+El formset de ``VentaCreateView`` valida cada linea con su propio form (una
+consulta por producto) y re-dibuja todos los widgets; para pedidos de cientos
+de lineas ``VentaCarritoView`` recibe las lineas como texto:
+
+- JSON: ``[{"producto": "TOR-1", "cantidad": 3, "precio_unitario": "10.50"}, ...]``
+- CSV: ``producto,cantidad[,precio_unitario]`` por linea (con o sin encabezado).
+
+``producto`` es el SKU o el id; sin precio se usa el del producto. ``validar``
+busca todos los productos en una consulta y el stock del deposito en otra.
+
+``guardar_venta`` es el guardado de las dos pantallas: los items con un
+``bulk_create`` y el stock con ``depositos.mover_varios``, asi una venta de
+1000 lineas lleva las mismas consultas que una de 3.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from auditoria import registro as auditoria
+from productos import eventos
+from productos.alertas import registrar_cambios_stock
+from productos.depositos import mover_varios, stock_por_producto
+from productos.models import Deposito, Producto
+from reportes.cubos import acumular_venta
+from .models import ItemVenta, Venta
+
+CENTAVOS = Decimal("0.01")
+
+
+def _no_entra(model, campo, valor):
+    # Los mismos validadores que el DecimalField del formset (max_digits=10):
+    # un importe que no entra en la columna es un error de la linea, no un 500
+    try:
+        model._meta.get_field(campo).run_validators(valor)
+    except ValidationError:
+        return True
+    return False
+
+
+class CarritoInvalido(Exception):
+    """Las lineas no se pueden leer o no alcanzan; ``args[0]`` es la lista de errores."""
+
+
+def _filas_json(texto):
+    try:
+        datos = json.loads(texto)
+    except ValueError as error:
+        raise CarritoInvalido([f"JSON invalido: {error}"])
+    if isinstance(datos, dict):
+        datos = datos.get("lineas", [])
+    if not isinstance(datos, list) or not all(isinstance(fila, dict) for fila in datos):
+        raise CarritoInvalido(["El JSON tiene que ser una lista de lineas"])
+    for fila in datos:
+        yield (
+            fila.get("producto", fila.get("sku", fila.get("producto_id"))),
+            fila.get("cantidad"),
+            fila.get("precio_unitario", fila.get("precio")),
+        )
+
+
+def _filas_csv(texto):
+    for numero, fila in enumerate(csv.reader(io.StringIO(texto))):
+        fila = [valor.strip() for valor in fila]
+        if not any(fila):
+            continue
+        # El encabezado es opcional
+        if numero == 0 and fila[0].lower() in ("producto", "sku", "producto_id"):
+            continue
+        yield (fila[0], fila[1] if len(fila) > 1 else None, fila[2] if len(fila) > 2 and fila[2] else None)
+
+
+def leer_lineas(texto):
+    """Convierte el JSON o CSV en [(producto, cantidad, precio o None)] sin ir a la base."""
+    texto = texto.strip()
+    filas = _filas_json(texto) if texto[:1] in ("[", "{") else _filas_csv(texto)
+    lineas, errores = [], []
+    for numero, (producto, cantidad, precio) in enumerate(filas, start=1):
+        try:
+            # int() trunca 2.7 y acepta true: en JSON solo enteros
+            if isinstance(cantidad, bool) or (isinstance(cantidad, float) and not cantidad.is_integer()):
+                raise ValueError
+            cantidad = int(cantidad)
+            if cantidad <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errores.append(f"Linea {numero}: cantidad invalida ({cantidad})")
+            continue
+        if precio is not None:
+            try:
+                precio = Decimal(str(precio)).quantize(CENTAVOS)
+                if precio < 0 or _no_entra(ItemVenta, "precio_unitario", precio):
+                    raise InvalidOperation
+            except InvalidOperation:
+                errores.append(f"Linea {numero}: precio invalido ({precio})")
+                continue
+        if producto in (None, ""):
+            errores.append(f"Linea {numero}: falta el producto")
+            continue
+        lineas.append((str(producto).strip(), cantidad, precio))
+    if errores:
+        raise CarritoInvalido(errores)
+    if not lineas:
+        raise CarritoInvalido(["No hay lineas para vender"])
+    return lineas
+
+
+def validar(lineas, deposito):
+    """Resuelve productos y precios y controla el stock del deposito.
+
+    Son dos consultas (tres si hay productos fraccionados) para cualquier
+    cantidad de lineas. Devuelve [(producto, cantidad, precio, subtotal)] con
+    los subtotales en Decimal; ``guardar_venta`` los suma en una pasada.
+    """
+    claves = {clave for clave, _, _ in lineas}
+    ids = [int(clave) for clave in claves if clave.isdigit()]
+    productos = Producto.objects.filter(Q(sku__in=claves) | Q(pk__in=ids))
+    por_sku, por_id = {}, {}
+    for producto in productos:
+        por_id[producto.pk] = producto
+        if producto.sku:
+            por_sku[producto.sku] = producto
+
+    resueltas, errores, pedido = [], [], {}
+    for numero, (clave, cantidad, precio) in enumerate(lineas, start=1):
+        # El SKU tiene prioridad: un SKU numerico no se confunde con un id
+        producto = por_sku.get(clave) or (por_id.get(int(clave)) if clave.isdigit() else None)
+        if producto is None:
+            errores.append(f"Linea {numero}: no existe el producto {clave}")
+            continue
+        precio = producto.precio if precio is None else precio
+        subtotal = cantidad * precio
+        if _no_entra(ItemVenta, "subtotal", subtotal):
+            errores.append(f"Linea {numero}: el subtotal ({subtotal}) es demasiado grande")
+            continue
+        pedido[producto.pk] = pedido.get(producto.pk, 0) + cantidad
+        resueltas.append((producto, cantidad, precio, subtotal))
+
+    disponible = stock_por_producto(deposito, list(por_id.values()))
+    for pk, cantidad in pedido.items():
+        if disponible.get(pk, 0) < cantidad:
+            errores.append(
+                f"No hay stock suficiente para {por_id[pk].nombre} en {deposito}: "
+                f"se piden {cantidad}, hay {disponible.get(pk, 0)}"
+            )
+    total = sum((subtotal for _, _, _, subtotal in resueltas), Decimal("0"))
+    if not errores and _no_entra(Venta, "total", total):
+        errores.append(f"El total de la venta ({total}) es demasiado grande")
+    if errores:
+        raise CarritoInvalido(errores)
+    return resueltas
+
+
+def guardar_venta(venta, lineas, usuario):
+    """Guarda ``venta`` (sin guardar todavia) con ``lineas`` [(producto, cantidad, precio, subtotal)].
+
+    Todo en una transaccion: la venta, los items, el stock del deposito de la
+    venta, las alertas, los agregados de reportes y el evento. Si entre la
+    validacion y el guardado otra venta se llevo el stock levanta
+    ``StockInsuficiente`` y no queda nada guardado.
+    """
+    with transaction.atomic():
+        venta.total = sum((subtotal for _, _, _, subtotal in lineas), Decimal("0"))
+        venta.save()
+        items = ItemVenta.objects.bulk_create(
+            ItemVenta(
+                venta=venta,
+                producto=producto,
+                cantidad=cantidad,
+                precio_unitario=precio,
+                subtotal=subtotal,
+            )
+            for producto, cantidad, precio, subtotal in lineas
+        )
+        pedido = {}
+        for item in items:
+            pedido[item.producto_id] = pedido.get(item.producto_id, 0) - item.cantidad
+        registrar_cambios_stock(mover_varios(venta.deposito or Deposito.get_principal(), pedido))
+        # Agregados de reportes, quedan al dia junto con el commit de la venta
+        acumular_venta(venta, items)
+        # El evento para otros sistemas se confirma (o se deshace) con la venta
+        eventos.venta_creada(venta, items)
+        auditoria.registrar(usuario, "creado", venta, {"total": venta.total, "items": len(items)})
+    return venta
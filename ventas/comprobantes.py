@@ -0,0 +1,162 @@
+"""
+Generadores del comprobante en PDF de una venta.
+
+``settings.COMPROBANTE_PDF["BACKEND"]`` elige la clase:
+
+- ``HtmlComprobante``: renderiza ``ventas/venta_pdf.html`` y lo pasa por
+  xhtml2pdf. Para cambiar el diseño alcanza con tocar la plantilla, pero
+  parsear y acomodar el HTML es lo que mas CPU se lleva.
+- ``ReportlabComprobante``: dibuja el mismo comprobante directo con el
+  canvas de reportlab (que ya viene con xhtml2pdf), sin HTML de por medio.
+
+``generar`` no toca la base: recibe la venta con el cliente y los items con
+el producto ya cargados, asi la vista async lo corre en otro hilo. Las
+librerias de PDF se importan adentro, al generar el primero.
+"""
+import io
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.formats import localize
+from django.utils.module_loading import import_string
+
+FORMATO_FECHA = "%d/%m/%Y %H:%M"
+
+
+class BaseComprobante:
+    def generar(self, venta, items, usuario=None):
+        """Devuelve los bytes del PDF, o None si no se pudo generar."""
+        raise NotImplementedError
+
+    def devuelto(self, venta, items):
+        # Las lineas quedan como se vendieron y el total es neto de devoluciones
+        return sum(item.subtotal for item in items) - venta.total
+
+
+class HtmlComprobante(BaseComprobante):
+    template_name = "ventas/venta_pdf.html"
+
+    def generar(self, venta, items, usuario=None):
+        from xhtml2pdf import pisa
+
+        html = render_to_string(self.template_name, {
+            "venta": venta,
+            "items": items,
+            "devuelto": self.devuelto(venta, items),
+            "usuario": usuario,
+        })
+        buffer = io.BytesIO()
+        resultado = pisa.CreatePDF(html, dest=buffer)
+        return None if resultado.err else buffer.getvalue()
+
+
+class ReportlabComprobante(BaseComprobante):
+    # Medidas en puntos, A4 con 2 cm de margen
+    MARGEN = 56.7
+    ALTO_FILA = 16
+    # Ancho de cada columna: producto se queda con lo que sobra
+    COLUMNAS = (("Producto", None), ("Cantidad", 60), ("Precio unit.", 85), ("Subtotal", 85))
+
+    def generar(self, venta, items, usuario=None):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen.canvas import Canvas
+
+        self.ancho_pagina, self.alto_pagina = A4
+        buffer = io.BytesIO()
+        c = Canvas(buffer, pagesize=A4)
+        c.setTitle(f"Comprobante de venta {venta.codigo}")
+
+        ancho_util = self.ancho_pagina - 2 * self.MARGEN
+        fijas = sum(ancho for _, ancho in self.COLUMNAS if ancho)
+        self.anchos = [ancho or ancho_util - fijas for _, ancho in self.COLUMNAS]
+
+        y = self.encabezado(c, venta)
+        y = self.fila(c, y, [titulo for titulo, _ in self.COLUMNAS], titulo=True)
+        for item in items:
+            # Tiene que entrar la fila y, en la ultima pagina, los totales y el pie
+            if y - self.ALTO_FILA < self.MARGEN + 3 * self.ALTO_FILA:
+                c.showPage()
+                y = self.alto_pagina - self.MARGEN
+                y = self.fila(c, y, [titulo for titulo, _ in self.COLUMNAS], titulo=True)
+            y = self.fila(c, y, [
+                item.producto.nombre,
+                localize(item.cantidad),
+                f"${localize(item.precio_unitario)}",
+                f"${localize(item.subtotal)}",
+            ])
+        devuelto = self.devuelto(venta, items)
+        if devuelto:
+            y = self.total(c, y, "DEVUELTO", f"-${localize(devuelto)}")
+        y = self.total(c, y, "TOTAL", f"${localize(venta.total)}")
+
+        c.setFont("Helvetica", 8)
+        c.setFillGray(0.47)
+        ahora = timezone.localtime().strftime(FORMATO_FECHA)
+        c.drawString(self.MARGEN, y - 20, f"Generado el {ahora} por {usuario or 'sistema'}")
+        c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    def encabezado(self, c, venta):
+        y = self.alto_pagina - self.MARGEN - 14
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(self.MARGEN, y, f"Comprobante de venta {venta.codigo}")
+        c.setFont("Helvetica", 9)
+        c.setFillGray(0.33)
+        c.drawString(self.MARGEN, y - 18, f"Fecha: {timezone.localtime(venta.fecha).strftime(FORMATO_FECHA)}")
+        c.drawString(self.MARGEN, y - 30, f"Cliente: {venta.cliente.nombre} {venta.cliente.apellido}")
+        c.setFillGray(0)
+        if venta.anulada:
+            c.setFont("Helvetica-Bold", 9)
+            c.drawString(self.MARGEN, y - 42, "VENTA ANULADA")
+            y -= 12
+        return y - 44
+
+    def fila(self, c, y, textos, titulo=False):
+        fuente = "Helvetica-Bold" if titulo else "Helvetica"
+        abajo = y - self.ALTO_FILA
+        x = self.MARGEN
+        c.setStrokeGray(0.8)
+        for i, (texto, ancho) in enumerate(zip(textos, self.anchos)):
+            if titulo:
+                c.setFillGray(0.94)
+                c.rect(x, abajo, ancho, self.ALTO_FILA, stroke=1, fill=1)
+                c.setFillGray(0)
+            else:
+                c.rect(x, abajo, ancho, self.ALTO_FILA, stroke=1, fill=0)
+            c.setFont(fuente, 9)
+            texto = self.recortar(texto, fuente, ancho - 8)
+            # La primera columna a la izquierda, los numeros a la derecha
+            if i == 0:
+                c.drawString(x + 4, abajo + 5, texto)
+            else:
+                c.drawRightString(x + ancho - 4, abajo + 5, texto)
+            x += ancho
+        return abajo
+
+    def total(self, c, y, etiqueta, valor):
+        # Como el colspan de la plantilla: la etiqueta ocupa las tres primeras columnas
+        abajo = y - self.ALTO_FILA
+        ancho = sum(self.anchos[:-1])
+        c.setFillGray(0.94)
+        c.rect(self.MARGEN, abajo, ancho, self.ALTO_FILA, stroke=1, fill=1)
+        c.rect(self.MARGEN + ancho, abajo, self.anchos[-1], self.ALTO_FILA, stroke=1, fill=1)
+        c.setFillGray(0)
+        c.setFont("Helvetica-Bold", 9)
+        c.drawRightString(self.MARGEN + ancho - 4, abajo + 5, etiqueta)
+        c.drawRightString(self.ancho_pagina - self.MARGEN - 4, abajo + 5, valor)
+        return abajo
+
+    def recortar(self, texto, fuente, ancho):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        if stringWidth(texto, fuente, 9) <= ancho:
+            return texto
+        while texto and stringWidth(texto + "...", fuente, 9) > ancho:
+            texto = texto[:-1]
+        return texto + "..."
+
+
+def get_comprobante():
+    return import_string(settings.COMPROBANTE_PDF["BACKEND"])()
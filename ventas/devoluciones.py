@@ -0,0 +1,115 @@
+"""
+Devoluciones y anulaciones de ventas.
+
+``devolver`` registra una ``Devolucion`` con sus lineas y, en la misma
+transaccion, vuelve a sumar el stock, inserta los ``MovimientoStock`` de
+entrada, descuenta lo acreditado de ``Venta.total`` y de los agregados de
+reportes. Todo se hace por conjuntos (``depositos.mover_varios`` y
+``bulk_create``), asi anular una venta de 500 lineas lleva las mismas
+consultas que devolver una.
+
+``anular`` devuelve todo lo que quedaba de la venta y la marca como anulada:
+deja de contar como venta del cliente.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, IntegerField
+from django.utils import timezone
+
+from inventario.expresiones import SegunId
+from productos import eventos
+from productos.depositos import mover_varios
+from productos.models import Deposito, MovimientoStock
+from reportes.cubos import acumular_venta
+from .models import Devolucion, ItemDevolucion, Venta
+
+
+class DevolucionInvalida(Exception):
+    """La devolucion pide mas de lo que queda por devolver (o la venta esta anulada)."""
+
+
+def devolver(venta, cantidades, usuario, motivo="", deposito=None, anulacion=False):
+    """Devuelve ``cantidades`` ({item_venta_id: cantidad}) de ``venta``.
+
+    La mercaderia entra en ``deposito`` (por defecto el de la venta). Levanta
+    ``DevolucionInvalida`` si alguna linea no es de la venta o pide mas de lo
+    que queda por devolver. Devuelve la ``Devolucion`` creada.
+    """
+    cantidades = {int(pk): cantidad for pk, cantidad in cantidades.items() if cantidad}
+    with transaction.atomic():
+        # Dos devoluciones de la misma venta no se pisan: la segunda espera aca
+        venta = Venta.objects.select_for_update().get(pk=venta.pk)
+        if venta.anulada:
+            raise DevolucionInvalida("La venta ya esta anulada")
+
+        lineas = {item.pk: item for item in venta.items.all()}
+        if anulacion:
+            cantidades = {pk: item.cantidad_pendiente for pk, item in lineas.items() if item.cantidad_pendiente}
+        for pk, cantidad in cantidades.items():
+            item = lineas.get(pk)
+            if item is None:
+                raise DevolucionInvalida(f"La linea {pk} no es de la venta {venta.codigo}")
+            if cantidad < 0 or cantidad > item.cantidad_pendiente:
+                raise DevolucionInvalida(
+                    f"De {item.producto} se pueden devolver hasta {item.cantidad_pendiente} unidades"
+                )
+        if not cantidades and not anulacion:
+            raise DevolucionInvalida("No hay nada para devolver")
+
+        ahora = timezone.now()
+        deposito = deposito or venta.deposito or Deposito.get_principal()
+        devueltos = [
+            ItemDevolucion(
+                item_venta_id=pk,
+                producto_id=lineas[pk].producto_id,
+                cantidad=cantidad,
+                subtotal=cantidad * lineas[pk].precio_unitario,
+            )
+            for pk, cantidad in sorted(cantidades.items())
+        ]
+        total = sum((item.subtotal for item in devueltos), Decimal("0"))
+        devolucion = Devolucion.objects.create(
+            venta=venta, deposito=deposito, usuario=usuario, motivo=motivo,
+            anulacion=anulacion, total=total,
+        )
+        for item in devueltos:
+            item.devolucion = devolucion
+        ItemDevolucion.objects.bulk_create(devueltos)
+
+        if devueltos:
+            por_producto = {}
+            for item in devueltos:
+                por_producto[item.producto_id] = por_producto.get(item.producto_id, 0) + item.cantidad
+            # Una devolucion solo suma stock: no puede dejar un producto bajo
+            # el minimo, no hay alertas que registrar
+            mover_varios(deposito, por_producto)
+            movimientos = MovimientoStock.objects.bulk_create(
+                MovimientoStock(
+                    producto_id=producto_id,
+                    deposito=deposito,
+                    tipo="entrada",
+                    cantidad=cantidad,
+                    motivo=motivo or f"Devolucion de la venta {venta.codigo}",
+                    fecha=ahora,
+                    usuario=usuario,
+                )
+                for producto_id, cantidad in sorted(por_producto.items())
+            )
+            eventos.movimientos(movimientos)
+            venta.items.filter(pk__in=cantidades).update(
+                cantidad_devuelta=F("cantidad_devuelta") + SegunId("pk", cantidades, IntegerField())
+            )
+
+        # El total de la venta queda neto de lo acreditado
+        Venta.objects.filter(pk=venta.pk).update(total=F("total") - total, anulada=anulacion)
+        # Los reportes restan lo devuelto en el dia de la venta original; la
+        # venta solo deja de contar para el cliente si se anula
+        acumular_venta(venta, devueltos, signo=-1, ventas=-1 if anulacion else 0)
+        eventos.devolucion(devolucion, devueltos)
+    return devolucion
+
+
+def anular(venta, usuario, motivo="", deposito=None):
+    """Anula la venta: devuelve todo lo que quedaba sin devolver."""
+    return devolver(venta, {}, usuario, motivo=motivo, deposito=deposito, anulacion=True)
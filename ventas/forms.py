@@ -1,13 +1,51 @@
 from django import forms
 from django.forms import inlineformset_factory
 
-from .models import Venta, ItemVenta
+from productos.forms import deposito_field
+from . import carrito
+from .models import Venta, ItemVenta, VentaArchivada
 
 
 class VentaForm(forms.ModelForm):
+    deposito = deposito_field(help_text="Depósito del que sale la mercadería.")
+
     class Meta:
         model = Venta
-        fields = ["codigo", "cliente"]   # fecha y total se manejan desde el sistema
+        fields = ["codigo", "cliente", "deposito"]   # fecha y total se manejan desde el sistema
+
+    def clean_codigo(self):
+        # El unique de Venta no ve las ventas archivadas, el codigo tampoco puede repetirse ahi
+        codigo = self.cleaned_data.get("codigo")
+        if codigo and VentaArchivada.objects.filter(codigo=codigo).exists():
+            raise forms.ValidationError("Ya existe una venta archivada con este código.")
+        return codigo
+
+
+class CarritoForm(VentaForm):
+    """Venta con las lineas en un texto JSON o CSV (ver ``ventas.carrito``)."""
+
+    lineas = forms.CharField(
+        label="Líneas",
+        required=False,
+        widget=forms.Textarea(attrs={"rows": 12, "placeholder": "TOR-1,10\nTOR-2,5,99.90"}),
+        help_text="CSV (producto,cantidad[,precio]) o JSON. Producto es el SKU o el id; sin precio se usa el del producto.",
+    )
+    archivo = forms.FileField(label="O un archivo", required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        archivo = cleaned_data.get("archivo")
+        texto = archivo.read().decode("utf-8-sig", errors="replace") if archivo else cleaned_data.get("lineas", "")
+        if not texto.strip():
+            raise forms.ValidationError("Pegá las líneas o subí un archivo.")
+        deposito = cleaned_data.get("deposito")
+        if deposito is None:
+            return cleaned_data
+        try:
+            cleaned_data["items"] = carrito.validar(carrito.leer_lineas(texto), deposito)
+        except carrito.CarritoInvalido as error:
+            raise forms.ValidationError(error.args[0])
+        return cleaned_data
 
 
 class ItemVentaForm(forms.ModelForm):
@@ -31,3 +69,30 @@ ItemVentaFormSet = inlineformset_factory(
     extra=3,          # cantidad de filas vacías por defecto
     can_delete=True   # permitir marcar items para borrar en edición
 )
+
+
+class DevolucionForm(forms.Form):
+    """Una cantidad a devolver por cada linea de la venta que tenga algo pendiente."""
+
+    deposito = deposito_field(help_text="Depósito al que vuelve la mercadería.")
+    motivo = forms.CharField(max_length=200, required=False)
+
+    def __init__(self, *args, items=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = [item for item in items if item.cantidad_pendiente]
+        for item in self.items:
+            self.fields[f"item_{item.pk}"] = forms.IntegerField(
+                label=f"{item.producto} (vendidas {item.cantidad}, devueltas {item.cantidad_devuelta})",
+                min_value=0,
+                max_value=item.cantidad_pendiente,
+                initial=0,
+            )
+
+    def cantidades(self):
+        return {item.pk: self.cleaned_data[f"item_{item.pk}"] for item in self.items}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and not any(self.cantidades().values()):
+            raise forms.ValidationError("Indicá al menos una cantidad a devolver.")
+        return cleaned_data
@@ -0,0 +1,93 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from productos.models import MovimientoStock, MovimientoStockArchivado
+from ventas.models import ItemVenta, ItemVentaArchivado, Venta, VentaArchivada
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las ventas y los movimientos de stock de periodos cerrados a las "
+        "tablas de archivo, por lotes y con una transaccion corta por lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--antes",
+            help="Archiva todo lo anterior a esta fecha (YYYY-MM-DD). "
+                 "Por defecto, lo anterior al mes de hace --meses meses.",
+        )
+        parser.add_argument("--meses", type=int, default=12)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def get_corte(self, options):
+        if options["antes"]:
+            fecha = parse_date(options["antes"])
+            if fecha is None:
+                raise CommandError(f"Fecha invalida: {options['antes']}")
+        else:
+            # Primer dia del mes, asi solo se archivan meses completos
+            hoy = timezone.localdate()
+            meses = hoy.year * 12 + hoy.month - 1 - options["meses"]
+            fecha = hoy.replace(year=meses // 12, month=meses % 12 + 1, day=1)
+        return timezone.make_aware(datetime.combine(fecha, time.min))
+
+    def handle(self, *args, **options):
+        corte = self.get_corte(options)
+        lote = options["batch_size"]
+
+        ventas = self.mover_lotes(self.mover_ventas, corte, lote)
+        movimientos = self.mover_lotes(self.mover_movimientos, corte, lote)
+        self.stdout.write(
+            f"Archivadas {ventas} ventas y {movimientos} movimientos anteriores a {corte:%d/%m/%Y}"
+        )
+
+    def mover_lotes(self, mover, corte, lote):
+        total = 0
+        while True:
+            # Una transaccion por lote: si se corta a mitad de camino lo ya
+            # movido queda consistente y se puede volver a correr
+            with transaction.atomic():
+                movidos = mover(corte, lote)
+            if not movidos:
+                return total
+            total += movidos
+
+    def mover_ventas(self, corte, lote):
+        ids = list(
+            Venta.objects.filter(fecha__lt=corte)
+            .order_by("id")
+            .values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+
+        VentaArchivada.objects.bulk_create(
+            VentaArchivada(**fila) for fila in Venta.objects.filter(id__in=ids).values()
+        )
+        ItemVentaArchivado.objects.bulk_create(
+            ItemVentaArchivado(**fila) for fila in ItemVenta.objects.filter(venta_id__in=ids).values()
+        )
+        ItemVenta.objects.filter(venta_id__in=ids).delete()
+        Venta.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+    def mover_movimientos(self, corte, lote):
+        ids = list(
+            MovimientoStock.objects.filter(fecha__lt=corte)
+            .order_by("id")
+            .values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+
+        MovimientoStockArchivado.objects.bulk_create(
+            MovimientoStockArchivado(**fila)
+            for fila in MovimientoStock.objects.filter(id__in=ids).values()
+        )
+        MovimientoStock.objects.filter(id__in=ids).delete()
+        return len(ids)
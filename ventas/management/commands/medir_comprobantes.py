@@ -0,0 +1,62 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from clientes.models import Cliente
+from productos.models import Producto
+from ventas.models import ItemVenta, Venta
+
+BACKENDS = (
+    "ventas.comprobantes.HtmlComprobante",
+    "ventas.comprobantes.ReportlabComprobante",
+)
+
+
+def venta_de_prueba(lineas):
+    # Objetos en memoria, sin guardar: se mide solo el armado del PDF
+    cliente = Cliente(nombre="Ana Maria", apellido="Gonzalez Etchegaray")
+    venta = Venta(codigo="V-PRUEBA", cliente=cliente, fecha=timezone.now())
+    items = []
+    for i in range(lineas):
+        producto = Producto(nombre=f"Tornillo autoperforante zincado 8 x {i + 1}/2 pulgada")
+        precio = Decimal("123.45") + i
+        cantidad = i % 7 + 1
+        items.append(ItemVenta(producto=producto, cantidad=cantidad, precio_unitario=precio, subtotal=precio * cantidad))
+    venta.total = sum(item.subtotal for item in items)
+    return venta, items
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara los generadores de comprobantes en PDF: tiempo y tamaño con "
+        "ventas de 1, 50 y 500 items (o las que se pidan)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, nargs="+", default=[1, 50, 500])
+        parser.add_argument("--repeticiones", type=int, default=5, help="Se informa la mediana")
+        parser.add_argument("--backend", action="append", help="Clase a medir (por defecto, todas)")
+
+    def handle(self, *args, **options):
+        repeticiones = max(options["repeticiones"], 1)
+        self.stdout.write(f"{'items':>6}  {'backend':<22} {'ms':>9} {'KB':>8}")
+        for lineas in options["items"]:
+            venta, items = venta_de_prueba(lineas)
+            for path in options["backend"] or BACKENDS:
+                comprobante = import_string(path)()
+                # La primera corrida importa las librerias y llena caches de fuentes
+                pdf = comprobante.generar(venta, items, "medicion")
+                if pdf is None:
+                    raise CommandError(f"{path} no pudo generar el PDF")
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    comprobante.generar(venta, items, "medicion")
+                    tiempos.append(time.perf_counter() - inicio)
+                mediana = sorted(tiempos)[len(tiempos) // 2]
+                self.stdout.write(
+                    f"{lineas:>6}  {path.rsplit('.', 1)[-1]:<22} {mediana * 1000:>9.1f} {len(pdf) / 1024:>8.1f}"
+                )
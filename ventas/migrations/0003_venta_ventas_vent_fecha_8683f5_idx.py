@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('ventas', '0002_venta_ventas_vent_cliente_bb093c_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha'], name='ventas_vent_fecha_8683f5_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('productos', '0006_movimientostockarchivado'),
+        ('ventas', '0003_venta_ventas_vent_fecha_8683f5_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('codigo', models.CharField(max_length=20, unique=True)),
+                ('fecha', models.DateTimeField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ventas_archivadas', to='clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Venta archivada',
+                'verbose_name_plural': 'Ventas archivadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemVentaArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='ventas.ventaarchivada')),
+            ],
+            options={
+                'verbose_name': 'Item de venta archivado',
+                'verbose_name_plural': 'Items de venta archivados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['cliente', '-fecha'], name='ventas_vent_cliente_8f47b7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['fecha'], name='ventas_vent_fecha_554775_idx'),
+        ),
+    ]
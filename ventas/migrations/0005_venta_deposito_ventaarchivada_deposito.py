@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_deposito_conteoinventario_deposito_and_more'),
+        ('ventas', '0004_ventaarchivada_itemventaarchivado_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='deposito',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ventas', to='productos.deposito'),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='deposito',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.deposito'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def asignar_deposito_principal(apps, schema_editor):
+    Deposito = apps.get_model("productos", "Deposito")
+    Venta = apps.get_model("ventas", "Venta")
+    db = schema_editor.connection.alias
+    principal = Deposito.objects.using(db).filter(principal=True).first()
+    if principal:
+        Venta.objects.using(db).filter(deposito__isnull=True).update(deposito=principal)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_deposito_principal'),
+        ('ventas', '0005_venta_deposito_ventaarchivada_deposito'),
+    ]
+
+    operations = [
+        migrations.RunPython(asignar_deposito_principal, migrations.RunPython.noop),
+    ]
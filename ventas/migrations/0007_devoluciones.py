@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0012_stockfraccion'),
+        ('ventas', '0006_venta_deposito_principal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemventa',
+            name='cantidad_devuelta',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='itemventaarchivado',
+            name='cantidad_devuelta',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='anulada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='ventaarchivada',
+            name='anulada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='Devolucion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.CharField(max_length=50, verbose_name='Usuario')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('anulacion', models.BooleanField(default=False)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('deposito', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.deposito')),
+                ('venta', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='devoluciones', to='ventas.venta')),
+            ],
+            options={
+                'verbose_name': 'Devolucion',
+                'verbose_name_plural': 'Devoluciones',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemDevolucion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('devolucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='ventas.devolucion')),
+                ('item_venta', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='devoluciones', to='ventas.itemventa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='productos.producto')),
+            ],
+        ),
+    ]
@@ -1,14 +1,25 @@
 
 from django.db import models
 from clientes.models import Cliente
-from productos.models import Producto
+from productos.models import Deposito, Producto
 
 
 class Venta(models.Model):
     codigo = models.CharField(max_length=20, unique=True)
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name="ventas")
+    # Deposito del que sale la mercaderia (null en ventas anteriores a los depositos)
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="ventas", null=True)
     fecha = models.DateTimeField(auto_now_add=True)
+    # Neto de devoluciones: cada devolucion le resta lo acreditado
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    anulada = models.BooleanField(default=False)
+
+    class Meta:
+        # historial de compras del cliente, de la mas nueva a la mas vieja
+        indexes = [
+            models.Index(fields=["cliente", "-fecha"]),
+            models.Index(fields=["fecha"]),
+        ]
 
     def __str__(self):
         return f"Venta {self.codigo} - {self.cliente}"
@@ -20,8 +31,96 @@ class ItemVenta(models.Model):
     cantidad = models.PositiveIntegerField()
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Suma de las devoluciones de esta linea: se puede devolver hasta cantidad - cantidad_devuelta
+    cantidad_devuelta = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.producto} x {self.cantidad} (Venta {self.venta.codigo})"
+
+    @property
+    def cantidad_pendiente(self):
+        return self.cantidad - self.cantidad_devuelta
+
+
+class VentaArchivada(models.Model):
+    """Venta de un periodo cerrado, movida por el comando archivar_historial.
+
+    Conserva el mismo id que tenia en Venta.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    codigo = models.CharField(max_length=20, unique=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name="ventas_archivadas")
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="+", null=True)
+    fecha = models.DateTimeField()
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    anulada = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = 'Venta archivada'
+        verbose_name_plural = 'Ventas archivadas'
+        indexes = [
+            models.Index(fields=["cliente", "-fecha"]),
+            models.Index(fields=["fecha"]),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.codigo} - {self.cliente} (archivada)"
+
+
+class ItemVentaArchivado(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    venta = models.ForeignKey(VentaArchivada, on_delete=models.CASCADE, related_name="items")
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name="+")
+    cantidad = models.PositiveIntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cantidad_devuelta = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Item de venta archivado'
+        verbose_name_plural = 'Items de venta archivados'
 
     def __str__(self):
         return f"{self.producto} x {self.cantidad} (Venta {self.venta.codigo})"
 
 
+class Devolucion(models.Model):
+    """Devolucion (parcial o total) de una venta, ver ventas.devoluciones.
+
+    ``venta`` no tiene FK en la base: cuando archivar_historial mueve la
+    venta, la devolucion queda apuntando al mismo id en VentaArchivada.
+    """
+    venta = models.ForeignKey(
+        Venta, on_delete=models.DO_NOTHING, db_constraint=False, related_name="devoluciones"
+    )
+    # Deposito al que vuelve la mercaderia
+    deposito = models.ForeignKey(Deposito, on_delete=models.PROTECT, related_name="+")
+    fecha = models.DateTimeField(auto_now_add=True)
+    usuario = models.CharField("Usuario", max_length=50)
+    motivo = models.CharField("Motivo", max_length=200, blank=True)
+    # La anulacion devuelve todo lo que quedaba y la venta deja de contar en los reportes
+    anulacion = models.BooleanField(default=False)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Devolucion'
+        verbose_name_plural = 'Devoluciones'
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        tipo = "Anulacion" if self.anulacion else "Devolucion"
+        return f"{tipo} #{self.pk} de la venta {self.venta_id}"
+
+
+class ItemDevolucion(models.Model):
+    devolucion = models.ForeignKey(Devolucion, on_delete=models.CASCADE, related_name="items")
+    item_venta = models.ForeignKey(
+        ItemVenta, on_delete=models.DO_NOTHING, db_constraint=False, related_name="devoluciones"
+    )
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name="+")
+    cantidad = models.PositiveIntegerField()
+    # cantidad * precio_unitario de la linea vendida
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.producto} x {self.cantidad} (Devolucion #{self.devolucion_id})"
@@ -1,3 +1,214 @@
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from clientes.models import Cliente
+from productos.models import Deposito, Producto, StockDeposito, StockInsuficiente
+from reportes.cubos import reconstruir
+from reportes.models import ResumenCliente, VentaClienteMes, VentaClienteProducto, VentaProductoDia
+from .carrito import CarritoInvalido, guardar_venta, leer_lineas, validar
+from .devoluciones import DevolucionInvalida, anular, devolver
+from .models import Venta
+
+
+def crear_productos(n, desde=0, stock=100):
+    return [
+        Producto.objects.create(
+            nombre=f"Tornillo {i}", descripcion="Tornillo", sku=f"TOR-{i}",
+            precio=Decimal("10.00"), stock=stock, stock_minimo=1,
+        )
+        for i in range(desde, desde + n)
+    ]
+
+
+def agregados():
+    # Lo que tienen las tablas de reportes, para comparar con reconstruir()
+    return {
+        model.__name__: sorted(
+            tuple(fila.values())
+            for fila in model.objects.values(*[f.attname for f in model._meta.concrete_fields if not f.primary_key])
+        )
+        for model in (VentaProductoDia, VentaClienteMes, VentaClienteProducto, ResumenCliente)
+    }
+
+
+class VentasTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(
+            nombre="Ana", apellido="Perez", numero_documento="20123456",
+            email="ana@example.com", telefono="1", direccion="Calle 1",
+        )
+        cls.deposito = Deposito.get_principal()
+        cls.numero = 0
+
+    def vender(self, productos, cantidad=2):
+        type(self).numero += 1
+        venta = Venta(codigo=f"V-{self.numero}", cliente=self.cliente, deposito=self.deposito)
+        lineas = validar([(p.sku, cantidad, None) for p in productos], self.deposito)
+        return guardar_venta(venta, lineas, "test")
+
+    def assertAgregadosReconstruidos(self):
+        incrementales = agregados()
+        reconstruir()
+        self.assertEqual(incrementales, agregados())
+
+
+class LeerLineasTests(TestCase):
+    def test_json(self):
+        lineas = leer_lineas('[{"producto": "TOR-1", "cantidad": 3, "precio_unitario": "10.5"}, {"sku": 7, "cantidad": 2.0}]')
+        self.assertEqual(lineas, [("TOR-1", 3, Decimal("10.50")), ("7", 2, None)])
+
+    def test_json_con_lineas(self):
+        self.assertEqual(leer_lineas('{"lineas": [{"producto": "A", "cantidad": 1}]}'), [("A", 1, None)])
+
+    def test_csv_con_y_sin_encabezado(self):
+        esperado = [("TOR-1", 3, Decimal("2.00")), ("TOR-2", 1, None)]
+        self.assertEqual(leer_lineas("producto,cantidad,precio\nTOR-1,3,2\n\nTOR-2,1"), esperado)
+        self.assertEqual(leer_lineas("TOR-1, 3, 2\nTOR-2,1,"), esperado)
+
+    def test_cantidades_invalidas(self):
+        for cantidad in ("2.7", "true", "0", "-1", '"x"', "null"):
+            with self.subTest(cantidad=cantidad), self.assertRaises(CarritoInvalido):
+                leer_lineas(f'[{{"producto": "A", "cantidad": {cantidad}}}]')
+
+    def test_junta_todos_los_errores(self):
+        with self.assertRaises(CarritoInvalido) as error:
+            leer_lineas("A,x\nB,1,-2\n,1\nC,1")
+        self.assertEqual(len(error.exception.args[0]), 3)
+
+    def test_precio_que_no_entra_en_la_columna(self):
+        with self.assertRaises(CarritoInvalido) as error:
+            leer_lineas("A,1,99999999999\nB,1,1e40\nC,1,99999999.99")
+        self.assertEqual(len(error.exception.args[0]), 2)
+
+    def test_vacio(self):
+        for texto in ("[]", "producto,cantidad\n", "{nada"):
+            with self.subTest(texto=texto), self.assertRaises(CarritoInvalido):
+                leer_lineas(texto)
+
+
+class ValidarTests(VentasTestCase):
+    def test_resuelve_por_sku_y_por_id(self):
+        a, b = crear_productos(2)
+        resueltas = validar([(a.sku, 2, None), (str(b.pk), 1, Decimal("7.50"))], self.deposito)
+        self.assertEqual(resueltas, [(a, 2, Decimal("10.00"), Decimal("20.00")), (b, 1, Decimal("7.50"), Decimal("7.50"))])
+
+    def test_sku_numerico_antes_que_id(self):
+        a, b = crear_productos(2)
+        b.sku = str(a.pk)
+        b.save()
+        (producto, _, _, _), = validar([(str(a.pk), 1, None)], self.deposito)
+        self.assertEqual(producto, b)
+
+    def test_stock_de_lineas_repetidas(self):
+        producto, = crear_productos(1, stock=5)
+        with self.assertRaises(CarritoInvalido) as error:
+            validar([(producto.sku, 3, None), (producto.sku, 3, None), ("NO-EXISTE", 1, None)], self.deposito)
+        self.assertEqual(len(error.exception.args[0]), 2)
+
+    def test_subtotal_y_total_que_no_entran(self):
+        a, b = crear_productos(2, stock=10**6)
+        precio = Decimal("99999999.99")
+        with self.assertRaises(CarritoInvalido) as error:
+            validar([(a.sku, 2, precio)], self.deposito)
+        self.assertIn("subtotal", error.exception.args[0][0])
+        with self.assertRaises(CarritoInvalido) as error:
+            validar([(a.sku, 1, precio), (b.sku, 1, precio)], self.deposito)
+        self.assertIn("total", error.exception.args[0][0])
+
+    def test_consultas_no_dependen_de_las_lineas(self):
+        productos = crear_productos(30)
+        with self.assertNumQueries(2):
+            validar([(p.sku, 1, None) for p in productos[:2]], self.deposito)
+        with self.assertNumQueries(2):
+            validar([(p.sku, 1, None) for p in productos], self.deposito)
+
+
+class GuardarVentaTests(VentasTestCase):
+    def test_guarda_items_stock_y_agregados(self):
+        productos = crear_productos(3)
+        venta = self.vender(productos, cantidad=4)
+        self.assertEqual(venta.total, Decimal("120.00"))
+        self.assertEqual(venta.items.count(), 3)
+        for producto in productos:
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock, 96)
+            self.assertEqual(StockDeposito.objects.get(producto=producto, deposito=self.deposito).cantidad, 96)
+        self.assertAgregadosReconstruidos()
+
+    def test_sin_stock_no_guarda_nada(self):
+        producto, = crear_productos(1, stock=5)
+        lineas = validar([(producto.sku, 5, None)], self.deposito)
+        # Otra venta se lleva el stock entre la validacion y el guardado
+        self.vender([producto], cantidad=3)
+        with self.assertRaises(StockInsuficiente):
+            guardar_venta(Venta(codigo="V-X", cliente=self.cliente, deposito=self.deposito), lineas, "test")
+        self.assertFalse(Venta.objects.filter(codigo="V-X").exists())
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, 2)
+
+    def test_consultas_no_dependen_de_las_lineas(self):
+        self.vender(crear_productos(2, desde=100))
+        consultas = []
+        for productos in (crear_productos(2), crear_productos(20, desde=2)):
+            lineas = validar([(p.sku, 1, None) for p in productos], self.deposito)
+            type(self).numero += 1
+            with CaptureQueriesContext(connection) as capturadas:
+                guardar_venta(Venta(codigo=f"V-{self.numero}", cliente=self.cliente, deposito=self.deposito), lineas, "test")
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class DevolucionTests(VentasTestCase):
+    def test_devolucion_parcial(self):
+        productos = crear_productos(2)
+        venta = self.vender(productos, cantidad=4)
+        item = venta.items.get(producto=productos[0])
+        devolucion = devolver(venta, {item.pk: 3}, "test")
+        self.assertEqual(devolucion.total, Decimal("30.00"))
+        venta.refresh_from_db()
+        self.assertEqual(venta.total, Decimal("50.00"))
+        self.assertFalse(venta.anulada)
+        productos[0].refresh_from_db()
+        self.assertEqual(productos[0].stock, 99)
+        with self.assertRaises(DevolucionInvalida):
+            devolver(venta, {item.pk: 2}, "test")
+        self.assertAgregadosReconstruidos()
+
+    def test_anular(self):
+        productos = crear_productos(3)
+        venta = self.vender(productos, cantidad=4)
+        devolver(venta, {venta.items.first().pk: 1}, "test")
+        devolucion = anular(venta, "test")
+        self.assertEqual(devolucion.total, Decimal("110.00"))
+        venta.refresh_from_db()
+        self.assertTrue(venta.anulada)
+        self.assertEqual(venta.total, Decimal("0.00"))
+        self.assertEqual(sorted(Producto.objects.filter(pk__in=[p.pk for p in productos]).values_list("stock", flat=True)), [100] * 3)
+        with self.assertRaises(DevolucionInvalida):
+            anular(venta, "test")
+        self.assertEqual(ResumenCliente.objects.get(cliente=self.cliente).cantidad_ventas, 0)
+        self.assertAgregadosReconstruidos()
+
+    def test_linea_de_otra_venta(self):
+        venta = self.vender(crear_productos(1))
+        otra = self.vender(crear_productos(1, desde=1))
+        with self.assertRaises(DevolucionInvalida):
+            devolver(venta, {otra.items.get().pk: 1}, "test")
 
-# Create your tests here.
+    def test_consultas_no_dependen_de_las_lineas(self):
+        ventas = [self.vender(crear_productos(2)), self.vender(crear_productos(20, desde=2))]
+        for funcion in (
+            lambda venta: devolver(venta, {item.pk: 1 for item in venta.items.all()}, "test"),
+            lambda venta: anular(venta, "test"),
+        ):
+            consultas = []
+            for venta in ventas:
+                with CaptureQueriesContext(connection) as capturadas:
+                    funcion(venta)
+                consultas.append(len(capturadas))
+            self.assertEqual(consultas[0], consultas[1])
+        self.assertAgregadosReconstruidos()
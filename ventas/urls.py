@@ -1,11 +1,14 @@
 from django.urls import path
-from .views import VentaCreateView, VentaListView, VentaDetailView,VentaPDFView
+from .views import VentaCreateView, VentaCarritoView, VentaListView, VentaDetailView,VentaPDFView, DevolucionCreateView, VentaAnularView
 
 app_name = "ventas"
 
 urlpatterns = [
     path("", VentaListView.as_view(), name="venta_list"),
     path("nueva/", VentaCreateView.as_view(), name="venta_create"),
+    path("nueva/carrito/", VentaCarritoView.as_view(), name="venta_carrito"),
     path("<int:pk>/", VentaDetailView.as_view(), name="venta_detail"),
     path('<int:pk>/pdf/', VentaPDFView.as_view(), name='venta_pdf'),
+    path("<int:pk>/devolver/", DevolucionCreateView.as_view(), name="devolucion_create"),
+    path("<int:pk>/anular/", VentaAnularView.as_view(), name="venta_anular"),
 ]
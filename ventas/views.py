@@ -1,21 +1,30 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
-from django.db import transaction
+from django.conf import settings
 from django.contrib import messages
 from django.db.models import Q
-from django.db.models import Sum         
+from django.db.models import Max, Count
 import json  
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from xhtml2pdf import pisa
-
-
-
-from .models import Venta, ItemVenta
-from .forms import VentaForm, ItemVentaFormSet
-from productos.models import Producto
-from django.views.generic import ListView, DetailView
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+
+from .carrito import guardar_venta
+from .comprobantes import get_comprobante
+from .devoluciones import DevolucionInvalida, anular, devolver
+from .models import Devolucion, Venta, VentaArchivada
+from .forms import CarritoForm, DevolucionForm, VentaForm, ItemVentaFormSet
+from productos.models import Producto, StockInsuficiente
+from auditoria import registro as auditoria
+from productos.depositos import stock_por_producto
+from productos.perfilado import perfilar
+from reportes.cubos import ventas_por_dia
+from django.views.generic import ListView, DetailView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from inventario.mixins import CondicionalMixin, LecturaReplicaMixin, PermisoAsyncMixin, calcular_etag
 
 class VentasPermissionMixin(UserPassesTestMixin):
    
@@ -34,7 +43,25 @@ class VentasPermissionMixin(UserPassesTestMixin):
             return redirect('home')
         return super().handle_no_permission()
 
-class VentaListView(LoginRequiredMixin, VentasPermissionMixin,ListView):
+
+class ArchivoMixin:
+    # Por defecto solo se consultan las ventas "calientes"; con ?archivo=1 se
+    # consultan las que movio el comando archivar_historial
+    def usa_archivo(self):
+        return self.request.GET.get("archivo") == "1"
+
+    def get_queryset(self):
+        if self.usa_archivo():
+            return VentaArchivada.objects.order_by(*(getattr(self, "ordering", None) or ()))
+        return super().get_queryset()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["archivo"] = self.usa_archivo()
+        return context
+
+
+class VentaListView(LoginRequiredMixin, VentasPermissionMixin, LecturaReplicaMixin, CondicionalMixin, ArchivoMixin, ListView):
     model = Venta
     template_name = "ventas/venta_list.html"
     context_object_name = "ventas"
@@ -59,20 +86,13 @@ class VentaListView(LoginRequiredMixin, VentasPermissionMixin,ListView):
         context = super().get_context_data(**kwargs)
         context["q"] = self.request.GET.get("q", "")
 
-            # datos para el gráfico de ventas por día
-        ventas_por_dia = (
-            Venta.objects
-            .values("fecha__date")
-            .order_by("fecha__date")
-            .annotate(total_dia=Sum("total"))
-        )
-
+            # datos para el gráfico de ventas por día (salen del agregado de reportes)
         labels = []
         data = []
 
-        for v in ventas_por_dia:
-            fecha = v["fecha__date"]
-            total = v["total_dia"] or 0
+        for v in ventas_por_dia():
+            fecha = v["dia"]
+            total = v["importe"] or 0
             labels.append(fecha.strftime("%d/%m"))   
             data.append(float(total))
 
@@ -81,7 +101,32 @@ class VentaListView(LoginRequiredMixin, VentasPermissionMixin,ListView):
 
         return context
 
-class VentaDetailView(LoginRequiredMixin, VentasPermissionMixin,DetailView):
+    def get_etag_partes(self, request, *args, **kwargs):
+        # El grafico usa todas las ventas, asi que miramos la tabla completa;
+        # una devolucion cambia totales sin agregar ventas
+        resumen = Venta.objects.aggregate(ultima=Max("id"), cantidad=Count("id"))
+        devolucion = Devolucion.objects.aggregate(ultima=Max("id"))["ultima"]
+        return [resumen["ultima"], resumen["cantidad"], devolucion]
+
+
+class VentaCondicionalMixin(CondicionalMixin):
+    # Una venta guardada solo cambia con una devolucion, que le baja el total
+    # (o la anula): los dos van en el ETag
+    def _datos_venta(self, pk):
+        if not hasattr(self, "_venta_validadores"):
+            self._venta_validadores = (
+                self.get_queryset().filter(pk=pk).values_list("fecha", "total", "anulada").first()
+            )
+        return self._venta_validadores
+
+    def get_last_modified(self, request, *args, **kwargs):
+        datos = self._datos_venta(kwargs["pk"])
+        return datos[0] if datos else None
+
+    def get_etag_partes(self, request, *args, **kwargs):
+        return self._datos_venta(kwargs["pk"])
+
+class VentaDetailView(LoginRequiredMixin, VentasPermissionMixin, VentaCondicionalMixin, ArchivoMixin, DetailView):
     model = Venta
     template_name = "ventas/venta_detail.html"
     context_object_name = "venta"
@@ -89,45 +134,57 @@ class VentaDetailView(LoginRequiredMixin, VentasPermissionMixin,DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["items"] = self.object.items.all()
+        if not self.usa_archivo():
+            context["devoluciones"] = self.object.devoluciones.all()
         return context
-class VentaPDFView(LoginRequiredMixin, VentasPermissionMixin, DetailView):
-    model = Venta
-    template_name = "ventas/venta_pdf.html"
-    context_object_name = "venta"
-    login_url = 'account_login'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["items"] = self.object.items.all()
-        return context
 
-    def render_to_response(self, context, **response_kwargs):
-        # 1) Renderizamos la plantilla a HTML (string)
-        html_string = render_to_string(
-            self.template_name,
-            context,
-            request=self.request,
+class VentaPDFView(PermisoAsyncMixin, LecturaReplicaMixin, View):
+    """
+    Comprobante en PDF, como vista async.
+
+    Las consultas usan el ORM async y el generador de PDF (ventas.comprobantes,
+    puro CPU) corre en un hilo aparte, asi el event loop sigue atendiendo otras
+    conexiones mientras se arma el PDF. Igual que el detalle responde 304 si la
+    venta no cambio.
+    """
+    grupos = ("ventas", "administradores")
+    mensaje_sin_permiso = "Tampoco aca, acordate,  ni en Ventas y Clientes."
+
+    async def get(self, request, pk):
+        ventas = VentaArchivada.objects if request.GET.get("archivo") == "1" else Venta.objects
+        venta = await ventas.select_related("cliente").filter(pk=pk).afirst()
+        if venta is None:
+            raise Http404("No existe la venta")
+
+        # Una venta guardada solo cambia con una devolucion (total, anulada);
+        # el generador tambien va, si se cambia no sirve el PDF anterior
+        user = await request.auser()
+        etag = calcular_etag(
+            user, request, (venta.fecha, venta.total, venta.anulada, settings.COMPROBANTE_PDF["BACKEND"])
         )
-
-        # 2) Armamos la respuesta HTTP de tipo PDF
-        filename = f"venta_{self.object.codigo}.pdf"
-        response = HttpResponse(content_type="application/pdf")
-        response["Content-Disposition"] = f'inline; filename="{filename}"'
-
-        
-        pisa_status = pisa.CreatePDF(
-            html_string,
-            dest=response,
+        response = get_conditional_response(
+            request, etag=quote_etag(etag), last_modified=int(venta.fecha.timestamp())
         )
+        if response is not None:
+            return response
 
-        # Si hubo error, devolvemos un mensaje simple
-        if pisa_status.err:
+        items = [item async for item in venta.items.select_related("producto")]
+        comprobante = get_comprobante()
+        pdf = await sync_to_async(comprobante.generar, thread_sensitive=False)(
+            venta, items, user.get_username()
+        )
+        if pdf is None:
             return HttpResponse("Error al generar el PDF de la venta", status=500)
 
+        response = HttpResponse(pdf, content_type="application/pdf")
+        response["Content-Disposition"] = f'inline; filename="venta_{venta.codigo}.pdf"'
+        response["ETag"] = quote_etag(etag)
+        response["Last-Modified"] = http_date(venta.fecha.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
-
 class VentaCreateView(LoginRequiredMixin, VentasPermissionMixin, View):
     template_name = "ventas/venta_form.html"
     login_url = 'account_login'
@@ -140,6 +197,7 @@ class VentaCreateView(LoginRequiredMixin, VentasPermissionMixin, View):
             "items_formset": items_formset,
         })
 
+    @perfilar("venta")
     def post(self, request):
         venta_form = VentaForm(request.POST)
         items_formset = ItemVentaFormSet(request.POST)
@@ -151,55 +209,141 @@ class VentaCreateView(LoginRequiredMixin, VentasPermissionMixin, View):
                 "items_formset": items_formset,
             })
 
-        #  validar stock y calcular total (sin guardar nada)
-        total = 0
-
-        for form in items_formset:
-            if form.cleaned_data and not form.cleaned_data.get("DELETE", False):
-                producto = form.cleaned_data["producto"]
-                cantidad = form.cleaned_data["cantidad"]
-                precio_unitario = form.cleaned_data["precio_unitario"]
-
-                # Verificamos stock antes de tocar la BD
-                if producto.stock < cantidad:
-                    messages.error(
-                        request,
-                        f"No hay stock suficiente para {producto.nombre}. "
-                        f"Stock disponible: {producto.stock}"
-                    )
-                    return render(request, self.template_name, {
-                        "venta_form": venta_form,
-                        "items_formset": items_formset,
-                    })
-
-                total += cantidad * precio_unitario
-
-        #  ahora sí guardamos todo dentro de una transacción
-        with transaction.atomic():
-            # Creamos la venta con el total calculado
-            venta = venta_form.save(commit=False)
-            venta.total = total
-            venta.save()
-
-            # Creamos items y descontamos stock
-            for form in items_formset:
-                if form.cleaned_data and not form.cleaned_data.get("DELETE", False):
-                    producto = form.cleaned_data["producto"]
-                    cantidad = form.cleaned_data["cantidad"]
-                    precio_unitario = form.cleaned_data["precio_unitario"]
-                    subtotal = cantidad * precio_unitario
-
-                    ItemVenta.objects.create(
-                        venta=venta,
-                        producto=producto,
-                        cantidad=cantidad,
-                        precio_unitario=precio_unitario,
-                        subtotal=subtotal,
-                    )
-
-                    producto.stock -= cantidad
-                    producto.save()
+        #  validar stock (sin guardar nada)
+        deposito = venta_form.cleaned_data["deposito"]
+        lineas = [
+            form.cleaned_data for form in items_formset
+            if form.cleaned_data and not form.cleaned_data.get("DELETE", False)
+        ]
+        # El stock del deposito de todos los productos de la venta, en una consulta
+        disponible = stock_por_producto(deposito, [linea["producto"] for linea in lineas])
+
+        for linea in lineas:
+            producto = linea["producto"]
+            cantidad = linea["cantidad"]
+
+            # Verificamos stock antes de tocar la BD
+            if disponible.get(producto.pk, 0) < cantidad:
+                messages.error(
+                    request,
+                    f"No hay stock suficiente para {producto.nombre} en {deposito}. "
+                    f"Stock disponible: {disponible.get(producto.pk, 0)}"
+                )
+                return render(request, self.template_name, {
+                    "venta_form": venta_form,
+                    "items_formset": items_formset,
+                })
+
+        #  ahora sí guardamos todo dentro de una transacción, por conjuntos
+        venta = venta_form.save(commit=False)
+        try:
+            guardar_venta(
+                venta,
+                [
+                    (linea["producto"], linea["cantidad"], linea["precio_unitario"],
+                     linea["cantidad"] * linea["precio_unitario"])
+                    for linea in lineas
+                ],
+                request.user,
+            )
+        except StockInsuficiente as error:
+            # Otra venta se llevo el stock entre la validacion y el guardado
+            producto = error.args[0]
+            messages.error(
+                request,
+                f"No hay stock suficiente para {producto.nombre} en {deposito}. "
+                f"Stock disponible: {producto.stock_en(deposito)}"
+            )
+            return render(request, self.template_name, {
+                "venta_form": venta_form,
+                "items_formset": items_formset,
+            })
 
         messages.success(request, "Venta registrada exitosamente")
         return redirect("ventas:venta_detail", pk=venta.pk)
 
+
+class VentaCarritoView(LoginRequiredMixin, VentasPermissionMixin, FormView):
+    """Venta mayorista: las lineas llegan como CSV o JSON en vez de un form por linea."""
+    form_class = CarritoForm
+    template_name = "ventas/venta_carrito.html"
+    login_url = 'account_login'
+
+    @perfilar("venta_carrito")
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        venta = form.save(commit=False)
+        try:
+            guardar_venta(venta, form.cleaned_data["items"], self.request.user)
+        except StockInsuficiente as error:
+            # Otra venta se llevo el stock entre la validacion y el guardado
+            producto = error.args[0]
+            deposito = form.cleaned_data["deposito"]
+            form.add_error(
+                None,
+                f"No hay stock suficiente para {producto.nombre} en {deposito}. "
+                f"Stock disponible: {producto.stock_en(deposito)}",
+            )
+            return self.form_invalid(form)
+        messages.success(self.request, f"Venta registrada con {len(form.cleaned_data['items'])} líneas")
+        return redirect("ventas:venta_detail", pk=venta.pk)
+
+
+class DevolucionCreateView(LoginRequiredMixin, VentasPermissionMixin, FormView):
+    """Devolucion parcial: cuantas unidades vuelven de cada linea de la venta."""
+    form_class = DevolucionForm
+    template_name = "ventas/devolucion_form.html"
+    login_url = 'account_login'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.venta = get_object_or_404(Venta.objects.select_related("cliente"), pk=kwargs["pk"])
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["items"] = self.venta.items.select_related("producto")
+        if self.venta.deposito_id:
+            kwargs["initial"] = {"deposito": self.venta.deposito_id}
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["venta"] = self.venta
+        return context
+
+    def form_valid(self, form):
+        try:
+            devolucion = devolver(
+                self.venta,
+                form.cantidades(),
+                self.request.user.username,
+                motivo=form.cleaned_data["motivo"],
+                deposito=form.cleaned_data["deposito"],
+            )
+        except DevolucionInvalida as error:
+            # Otra devolucion de la misma venta entro entre medio
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
+        auditoria.registrar(
+            self.request.user, "editado", self.venta, {"devolucion": devolucion.pk, "total": devolucion.total}
+        )
+        messages.success(self.request, f"Devolución registrada: se acreditaron ${devolucion.total}")
+        return redirect("ventas:venta_detail", pk=self.venta.pk)
+
+
+class VentaAnularView(LoginRequiredMixin, VentasPermissionMixin, View):
+    """Anula la venta: devuelve al deposito todo lo que no se habia devuelto."""
+    login_url = 'account_login'
+
+    def post(self, request, pk):
+        venta = get_object_or_404(Venta, pk=pk)
+        try:
+            devolucion = anular(venta, request.user.username, motivo=request.POST.get("motivo", ""))
+        except DevolucionInvalida as error:
+            messages.error(request, str(error))
+        else:
+            auditoria.registrar(request.user, "editado", venta, {"anulada": True, "devolucion": devolucion.pk})
+            messages.success(request, f"La venta {venta.codigo} fue anulada")
+        return redirect("ventas:venta_detail", pk=venta.pk)